@@ -0,0 +1,210 @@
+"""
+Pluggable event bus backends for app.core.pubsub.
+
+    EventBus                 publish(event, payload)  — sync, thread-safe
+                             run()                    — consume + dispatch until cancelled
+
+    LocalEventBus            asyncio.Queue in this process. No network hop,
+                             no JSON round trip — handlers get the same dict.
+    RedisStreamsEventBus     XADD / XREADGROUP / XACK on electrohub:stream:{event}.
+                             Durable, load-balanced across backend replicas.
+    RedisPubSubEventBus      the original PUBLISH / SUBSCRIBE on
+                             electrohub:events:{event}. Kept for compatibility:
+                             the local bus still mirrors every event here.
+
+Handlers are registered once on a HandlerRegistry with a decorator and are
+shared by whichever backend is active:
+
+    @handlers.on("item_saved")
+    async def _on_item_saved(data: dict) -> None: ...
+
+publish() is called from sync route handlers, i.e. from FastAPI's
+threadpool, so every backend's publish() must be safe off the event loop.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+import structlog
+
+from app.core.redis_client import get_redis_client
+
+log = structlog.get_logger()
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class HandlerRegistry:
+    def __init__(self):
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+
+    def on(self, event: str) -> Callable[[Handler], Handler]:
+        def _register(fn: Handler) -> Handler:
+            self._handlers[event].append(fn)
+            return fn
+        return _register
+
+    @property
+    def events(self) -> list[str]:
+        return list(self._handlers)
+
+    async def dispatch(self, event: str, payload: dict) -> None:
+        from app.core.metrics import event_consumed
+        event_consumed.labels(channel=event).inc()
+        for handler in self._handlers.get(event, []):
+            try:
+                await handler(payload)
+            except Exception as exc:
+                log.error("event_handler_failed", channel=event,
+                          handler=handler.__name__, error=str(exc))
+
+
+class EventBus(ABC):
+    def __init__(self, registry: HandlerRegistry):
+        self.registry = registry
+
+    @abstractmethod
+    def publish(self, event: str, payload: dict) -> None:
+        ...
+
+    @abstractmethod
+    async def run(self) -> None:
+        ...
+
+
+# ── In-process ────────────────────────────────────────────────────────────── #
+
+class LocalEventBus(EventBus):
+    """
+    Bounded asyncio.Queue drained by run(). Publishing from a threadpool
+    thread hops onto the loop with call_soon_threadsafe; events published
+    before run() starts are held (up to `maxsize`) and handed over when it
+    does. Every event is also published to each of `mirrors` (publish only
+    — never consumed back), so out-of-process subscribers keep working.
+    """
+
+    def __init__(self, registry: HandlerRegistry, maxsize: int = 10_000,
+                 mirrors: list[EventBus] | None = None):
+        super().__init__(registry)
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._early: list[tuple[str, dict]] = []
+        self._lock = threading.Lock()
+        self._maxsize = maxsize
+        self._mirrors = mirrors or []
+
+    def publish(self, event: str, payload: dict) -> None:
+        for mirror in self._mirrors:
+            try:
+                mirror.publish(event, payload)
+            except Exception as exc:
+                log.error("event_mirror_failed", channel=event,
+                          mirror=type(mirror).__name__, error=str(exc))
+        with self._lock:
+            loop = self._loop
+            if loop is None:
+                if len(self._early) < self._maxsize:
+                    self._early.append((event, payload))
+                else:
+                    log.error("event_dropped", channel=event, reason="queue_full")
+                return
+        loop.call_soon_threadsafe(self._enqueue, event, payload)
+
+    def _enqueue(self, event: str, payload: dict) -> None:
+        try:
+            self._queue.put_nowait((event, payload))
+        except asyncio.QueueFull:
+            log.error("event_dropped", channel=event, reason="queue_full")
+
+    async def run(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self._maxsize)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            early, self._early = self._early, []
+        for event, payload in early:
+            self._enqueue(event, payload)
+        log.info("event_bus_started", backend="local", events=self.registry.events)
+        try:
+            while True:
+                event, payload = await self._queue.get()
+                await self.registry.dispatch(event, payload)
+        finally:
+            with self._lock:
+                self._loop = None
+
+
+# ── Redis Pub/Sub (original transport) ────────────────────────────────────── #
+
+class RedisPubSubEventBus(EventBus):
+    PREFIX = "electrohub:events:"
+
+    def publish(self, event: str, payload: dict) -> None:
+        get_redis_client().publish(f"{self.PREFIX}{event}", json.dumps(payload))
+
+    async def run(self) -> None:
+        from app.core.redis_subscriber import AsyncRedisSubscriber
+        channels = [f"{self.PREFIX}{e}" for e in self.registry.events]
+        await AsyncRedisSubscriber("event_bus", self._dispatch, channels=channels).run()
+
+    async def _dispatch(self, channel: str, data: str) -> None:
+        try:
+            await self.registry.dispatch(channel.split(":")[-1], json.loads(data))
+        except Exception as exc:
+            log.error("event_dispatch_failed", error=str(exc), channel=channel)
+
+
+# ── Redis Streams ─────────────────────────────────────────────────────────── #
+
+class RedisStreamsEventBus(EventBus):
+    """
+    One stream per event type, one consumer group per application. Every
+    backend replica joins the same group, so each event is handled once.
+    Consuming — acks, reclaiming entries a dead process left pending,
+    dead-lettering — is app.core.event_stream.StreamConsumer, copied from
+    services/shared/ like redis_subscriber.
+    """
+
+    def __init__(self, registry: HandlerRegistry, group: str = "backend"):
+        super().__init__(registry)
+        self._group = group
+
+    def publish(self, event: str, payload: dict) -> None:
+        from app.core.event_stream import publish_stream_event
+        publish_stream_event(event, payload)
+
+    async def run(self) -> None:
+        from app.core.event_stream import StreamConsumer
+        log.info("event_bus_started", backend="redis_streams", group=self._group)
+        await StreamConsumer(self._group, self.registry.events, self.registry.dispatch).run()
+
+
+def build_event_bus(registry: HandlerRegistry) -> EventBus:
+    """
+    EVENT_BUS_BACKEND:
+      local          (default) in-process queue
+      redis_streams  durable, cross-process
+      redis_pubsub   original behaviour
+
+    EVENT_BUS_MIRROR (local only): comma-separated transports that also
+    receive every event for out-of-process consumers — "streams" (read by
+    notification-service's consumer group), "pubsub" (existing Pub/Sub
+    subscribers), or "none". Default: "streams,pubsub".
+    """
+    backend = os.getenv("EVENT_BUS_BACKEND", "local")
+    if backend == "redis_streams":
+        return RedisStreamsEventBus(registry)
+    if backend == "redis_pubsub":
+        return RedisPubSubEventBus(registry)
+
+    transports = {
+        "streams": RedisStreamsEventBus,
+        "pubsub":  RedisPubSubEventBus,
+    }
+    wanted = [m.strip() for m in os.getenv("EVENT_BUS_MIRROR", "streams,pubsub").split(",")]
+    mirrors = [transports[m](registry) for m in wanted if m in transports]
+    return LocalEventBus(registry, mirrors=mirrors)
@@ -1,6 +1,7 @@
 import os
 from functools import lru_cache
 import redis
+import redis.asyncio
 
 
 @lru_cache
@@ -11,3 +12,15 @@ def get_redis_client() -> redis.Redis:
         db=0,
         decode_responses=True,
     )
+
+
+@lru_cache
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """For long-lived consumers on the event loop (blocking reads, subscriptions)."""
+    return redis.asyncio.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        db=0,
+        decode_responses=True,
+        health_check_interval=30,   # detect half-open subscriber connections
+    )
@@ -1,11 +1,45 @@
-import smtplib
 import os
 import logging
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from string import Template
+
+from app.core.smtp_pool import SmtpPool
 
 logger = logging.getLogger(__name__)
 
+# Templates are parsed once at import instead of rebuilt per email
+_CONTACT_HTML = Template(
+    '<html><body><h2>New Message from $from_name</h2>'
+    '<p><strong>Email:</strong> $from_email</p>$item_block<p>$message</p>'
+    '<a href="http://localhost:3000/messages">Reply via ElectroHub</a></body></html>'
+)
+_ITEM_BLOCK = Template("<p><strong>Item:</strong> $item_title</p>")
+_NOTIFICATION_HTML = Template(
+    "<html><body><h2>New Message</h2>"
+    "<p>$from_name sent you a message about $item_title: $subject</p></body></html>"
+)
+
+_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 4))
+_RATE_PER_SEC = float(os.getenv("SMTP_RATE_PER_SEC", 10))
+_MAX_PER_SESSION = int(os.getenv("SMTP_MAX_PER_SESSION", 100))
+
+# Routes create a fresh EmailService per request, so pools live at module
+# level, one per set of credentials
+_pools: dict[tuple, SmtpPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(server, port, user, password) -> SmtpPool:
+    key = (server, port, user, password)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = SmtpPool(server, port, user, password, size=_POOL_SIZE,
+                                   rate=_RATE_PER_SEC, max_per_session=_MAX_PER_SESSION)
+        return _pools[key]
+
+
 class EmailService:
     def __init__(self):
         self.smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
@@ -13,51 +47,48 @@ class EmailService:
         self.sender_email = os.getenv("SENDER_EMAIL", "electrohub@example.com")
         self.sender_password = os.getenv("SENDER_PASSWORD", "")
         self.use_mock = not self.sender_password
-    
+
+    def _send(self, to_email, subject, html_body):
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = subject
+        msg["From"] = self.sender_email
+        msg["To"] = to_email
+        msg.attach(MIMEText(html_body, "html"))
+        pool = _get_pool(self.smtp_server, self.smtp_port,
+                         self.sender_email, self.sender_password)
+        pool.send(msg)
+
     def send_contact_seller_email(self, to_email, from_email, from_name, subject, message, item_title=""):
         if self.use_mock:
             logger.info(f"📧 [MOCK] Email to {to_email}: {subject}")
             return True
-        
+
         try:
-            html_body = f"""<html><body><h2>New Message from {from_name}</h2><p><strong>Email:</strong> {from_email}</p>{f'<p><strong>Item:</strong> {item_title}</p>' if item_title else ''}<p>{message}</p><a href="http://localhost:3000/messages">Reply via ElectroHub</a></body></html>"""
-            
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = f"[ElectroHub] {subject}"
-            msg["From"] = self.sender_email
-            msg["To"] = to_email
-            msg.attach(MIMEText(html_body, "html"))
-            
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, to_email, msg.as_string())
-            
+            html_body = _CONTACT_HTML.substitute(
+                from_name=from_name,
+                from_email=from_email,
+                item_block=_ITEM_BLOCK.substitute(item_title=item_title) if item_title else "",
+                message=message,
+            )
+            self._send(to_email, f"[ElectroHub] {subject}", html_body)
+
             logger.info(f"✅ Email sent to {to_email}")
             return True
         except Exception as e:
             logger.error(f"❌ Email failed: {e}")
             return False
-    
+
     def send_message_notification(self, to_email, from_name, subject, item_title):
         if self.use_mock:
             logger.info(f"📧 [MOCK] Notification to {to_email}")
             return True
-        
+
         try:
-            html_body = f"<html><body><h2>New Message</h2><p>{from_name} sent you a message about {item_title}: {subject}</p></body></html>"
-            
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = "[ElectroHub] New Message"
-            msg["From"] = self.sender_email
-            msg["To"] = to_email
-            msg.attach(MIMEText(html_body, "html"))
-            
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, to_email, msg.as_string())
-            
+            html_body = _NOTIFICATION_HTML.substitute(
+                from_name=from_name, item_title=item_title, subject=subject,
+            )
+            self._send(to_email, "[ElectroHub] New Message", html_body)
+
             return True
         except Exception as e:
             logger.error(f"❌ Email failed: {e}")
@@ -6,5 +6,8 @@ export DB_PASSWORD="password"
 export DB_PORT="5432"
 
 cd "$(dirname "$0")"
+# Shared with the microservices — the Dockerfile copies it the same way
+cp ../services/shared/redis_subscriber.py ../services/shared/event_stream.py \
+   ../services/shared/smtp_pool.py app/core/
 pip install -r requirements.txt --user
 python3 -m uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
@@ -52,6 +52,46 @@ CREATE TABLE IF NOT EXISTS item_images (
     FOREIGN KEY (item_id) REFERENCES marketplace_items(item_id) ON DELETE CASCADE
 );
 
+-- Listing change feed
+-- NOTIFY electrohub_listings with the item_id whenever a listing is created,
+-- deleted, (de)activated, has a field shown in recommendations edited, or
+-- gets a new thumbnail. recommendation-service LISTENs and re-reads those
+-- rows. Counter bumps (views_count, saves_count) don't fire it.
+CREATE OR REPLACE FUNCTION notify_listing_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('electrohub_listings', OLD.item_id::text);
+    ELSE
+        PERFORM pg_notify('electrohub_listings', NEW.item_id::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_listing_insert_delete ON marketplace_items;
+CREATE TRIGGER trg_listing_insert_delete
+    AFTER INSERT OR DELETE ON marketplace_items
+    FOR EACH ROW EXECUTE FUNCTION notify_listing_change();
+
+DROP TRIGGER IF EXISTS trg_listing_update ON marketplace_items;
+CREATE TRIGGER trg_listing_update
+    AFTER UPDATE OF title, description, category, condition, price,
+                    city, state, seller_id, is_active ON marketplace_items
+    FOR EACH ROW
+    -- Only the columns recommendation-service keeps: an UPDATE that lists one
+    -- of them alongside a counter bump must not fire on the bump alone
+    WHEN ((OLD.title, OLD.description, OLD.category, OLD.condition, OLD.price,
+           OLD.city, OLD.state, OLD.seller_id, OLD.is_active)
+          IS DISTINCT FROM
+          (NEW.title, NEW.description, NEW.category, NEW.condition, NEW.price,
+           NEW.city, NEW.state, NEW.seller_id, NEW.is_active))
+    EXECUTE FUNCTION notify_listing_change();
+
+DROP TRIGGER IF EXISTS trg_listing_thumbnail ON item_images;
+CREATE TRIGGER trg_listing_thumbnail
+    AFTER INSERT OR UPDATE OR DELETE ON item_images
+    FOR EACH ROW EXECUTE FUNCTION notify_listing_change();
+
 -- User Interactions Table
 CREATE TABLE IF NOT EXISTS item_interactions (
     interaction_id BIGSERIAL PRIMARY KEY,
@@ -78,6 +118,155 @@ CREATE TABLE IF NOT EXISTS marketplace_messages (
     FOREIGN KEY (item_id) REFERENCES marketplace_items(item_id) ON DELETE CASCADE
 );
 
+-- Conversations Table
+-- One row per (item, pair of users), maintained by the triggers below from
+-- every writer of marketplace_messages. user_a / user_b are the pair in
+-- LEAST / GREATEST order; unread_a counts unread messages addressed to user_a.
+CREATE TABLE IF NOT EXISTS conversations (
+    item_id INT NOT NULL,
+    user_a VARCHAR(255) NOT NULL,
+    user_b VARCHAR(255) NOT NULL,
+    last_message_id BIGINT NOT NULL,
+    last_sender_id VARCHAR(255) NOT NULL,
+    last_message_text TEXT NOT NULL,
+    last_at TIMESTAMP NOT NULL,
+    unread_a INT NOT NULL DEFAULT 0,
+    unread_b INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (item_id, user_a, user_b),
+    CHECK (user_a <= user_b),
+    FOREIGN KEY (user_a) REFERENCES user_accounts(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (user_b) REFERENCES user_accounts(user_id) ON DELETE CASCADE,
+    FOREIGN KEY (item_id) REFERENCES marketplace_items(item_id) ON DELETE CASCADE
+);
+
+-- Statement-level so a multi-row INSERT (group commit) or a bulk mark-read
+-- touches each conversation row once.
+CREATE OR REPLACE FUNCTION conversations_on_message_insert() RETURNS trigger AS $$
+BEGIN
+    WITH agg AS (
+        SELECT item_id,
+               LEAST(sender_id, receiver_id)    AS user_a,
+               GREATEST(sender_id, receiver_id) AS user_b,
+               COUNT(*) FILTER (WHERE is_read IS NOT TRUE
+                                  AND receiver_id = LEAST(sender_id, receiver_id))    AS unread_a,
+               COUNT(*) FILTER (WHERE is_read IS NOT TRUE
+                                  AND receiver_id = GREATEST(sender_id, receiver_id)
+                                  AND sender_id <> receiver_id)                         AS unread_b,
+               (ARRAY_AGG(message_id ORDER BY sent_at DESC NULLS LAST, message_id DESC))[1] AS last_id
+        FROM new_rows
+        GROUP BY 1, 2, 3
+    )
+    INSERT INTO conversations AS c
+        (item_id, user_a, user_b, last_message_id, last_sender_id,
+         last_message_text, last_at, unread_a, unread_b)
+    SELECT a.item_id, a.user_a, a.user_b, m.message_id, m.sender_id,
+           m.message_text, COALESCE(m.sent_at, NOW()), a.unread_a, a.unread_b
+    FROM agg a
+    JOIN new_rows m ON m.message_id = a.last_id
+    ON CONFLICT (item_id, user_a, user_b) DO UPDATE SET
+        unread_a = c.unread_a + EXCLUDED.unread_a,
+        unread_b = c.unread_b + EXCLUDED.unread_b,
+        last_message_id   = CASE WHEN EXCLUDED.last_at >= c.last_at THEN EXCLUDED.last_message_id   ELSE c.last_message_id   END,
+        last_sender_id    = CASE WHEN EXCLUDED.last_at >= c.last_at THEN EXCLUDED.last_sender_id    ELSE c.last_sender_id    END,
+        last_message_text = CASE WHEN EXCLUDED.last_at >= c.last_at THEN EXCLUDED.last_message_text ELSE c.last_message_text END,
+        last_at           = GREATEST(c.last_at, EXCLUDED.last_at);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Mark-read (UPDATE) and deletes move the unread counters by the change in
+-- unread rows per conversation: -1 for each unread row before, +1 after.
+CREATE OR REPLACE FUNCTION conversations_on_message_update() RETURNS trigger AS $$
+BEGIN
+    WITH changed AS (
+        SELECT item_id, sender_id, receiver_id, -1 AS d FROM old_rows WHERE is_read IS NOT TRUE
+        UNION ALL
+        SELECT item_id, sender_id, receiver_id,  1      FROM new_rows WHERE is_read IS NOT TRUE
+    ), delta AS (
+        SELECT item_id,
+               LEAST(sender_id, receiver_id)    AS user_a,
+               GREATEST(sender_id, receiver_id) AS user_b,
+               COALESCE(SUM(d) FILTER (WHERE receiver_id = LEAST(sender_id, receiver_id)), 0) AS da,
+               COALESCE(SUM(d) FILTER (WHERE receiver_id = GREATEST(sender_id, receiver_id)
+                                         AND sender_id <> receiver_id), 0)                  AS db
+        FROM changed
+        GROUP BY 1, 2, 3
+    )
+    UPDATE conversations c
+    SET unread_a = GREATEST(c.unread_a + delta.da, 0),
+        unread_b = GREATEST(c.unread_b + delta.db, 0)
+    FROM delta
+    WHERE c.item_id = delta.item_id AND c.user_a = delta.user_a AND c.user_b = delta.user_b
+      AND (delta.da <> 0 OR delta.db <> 0);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION conversations_on_message_delete() RETURNS trigger AS $$
+BEGIN
+    WITH changed AS (
+        SELECT item_id, sender_id, receiver_id, -1 AS d FROM old_rows WHERE is_read IS NOT TRUE
+    ), delta AS (
+        SELECT item_id,
+               LEAST(sender_id, receiver_id)    AS user_a,
+               GREATEST(sender_id, receiver_id) AS user_b,
+               COALESCE(SUM(d) FILTER (WHERE receiver_id = LEAST(sender_id, receiver_id)), 0) AS da,
+               COALESCE(SUM(d) FILTER (WHERE receiver_id = GREATEST(sender_id, receiver_id)
+                                         AND sender_id <> receiver_id), 0)                  AS db
+        FROM changed
+        GROUP BY 1, 2, 3
+    )
+    UPDATE conversations c
+    SET unread_a = GREATEST(c.unread_a + delta.da, 0),
+        unread_b = GREATEST(c.unread_b + delta.db, 0)
+    FROM delta
+    WHERE c.item_id = delta.item_id AND c.user_a = delta.user_a AND c.user_b = delta.user_b
+      AND (delta.da <> 0 OR delta.db <> 0);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_conversations_insert ON marketplace_messages;
+CREATE TRIGGER trg_conversations_insert
+    AFTER INSERT ON marketplace_messages
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION conversations_on_message_insert();
+
+DROP TRIGGER IF EXISTS trg_conversations_update ON marketplace_messages;
+CREATE TRIGGER trg_conversations_update
+    AFTER UPDATE ON marketplace_messages
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION conversations_on_message_update();
+
+DROP TRIGGER IF EXISTS trg_conversations_delete ON marketplace_messages;
+CREATE TRIGGER trg_conversations_delete
+    AFTER DELETE ON marketplace_messages
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION conversations_on_message_delete();
+
+-- Backfill conversations for threads that predate the triggers. Idempotent:
+-- conversations that already have a row are left to the triggers.
+INSERT INTO conversations
+    (item_id, user_a, user_b, last_message_id, last_sender_id,
+     last_message_text, last_at, unread_a, unread_b)
+SELECT a.item_id, a.user_a, a.user_b, m.message_id, m.sender_id,
+       m.message_text, COALESCE(m.sent_at, NOW()), a.unread_a, a.unread_b
+FROM (
+    SELECT item_id,
+           LEAST(sender_id, receiver_id)    AS user_a,
+           GREATEST(sender_id, receiver_id) AS user_b,
+           COUNT(*) FILTER (WHERE is_read IS NOT TRUE
+                              AND receiver_id = LEAST(sender_id, receiver_id))    AS unread_a,
+           COUNT(*) FILTER (WHERE is_read IS NOT TRUE
+                              AND receiver_id = GREATEST(sender_id, receiver_id)
+                              AND sender_id <> receiver_id)                         AS unread_b,
+           (ARRAY_AGG(message_id ORDER BY sent_at DESC NULLS LAST, message_id DESC))[1] AS last_id
+    FROM marketplace_messages
+    GROUP BY item_id, LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id)
+) a
+JOIN marketplace_messages m ON m.message_id = a.last_id
+ON CONFLICT (item_id, user_a, user_b) DO NOTHING;
+
 -- Saved Items Table
 CREATE TABLE IF NOT EXISTS item_saved (
     save_id SERIAL PRIMARY KEY,
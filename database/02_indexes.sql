@@ -18,6 +18,14 @@ CREATE INDEX IF NOT EXISTS idx_item_created ON marketplace_items(created_at DESC
 CREATE INDEX IF NOT EXISTS idx_item_title_search 
 ON marketplace_items USING gin(to_tsvector('english', title));
 
+-- Full-text search on title + description for recommendation-service's
+-- hybrid search; the expression must match app.search.DOCUMENT exactly
+CREATE INDEX IF NOT EXISTS idx_item_text_search
+ON marketplace_items USING gin((
+    setweight(to_tsvector('english', title), 'A') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'B')
+)) WHERE is_active = true;
+
 -- Item Images Indexes
 CREATE INDEX IF NOT EXISTS idx_image_item ON item_images(item_id);
 CREATE INDEX IF NOT EXISTS idx_image_thumbnail ON item_images(item_id) WHERE is_thumbnail = true;
@@ -30,6 +38,18 @@ CREATE INDEX IF NOT EXISTS idx_interactions_type ON item_interactions(event_type
 -- Messages Indexes
 CREATE INDEX IF NOT EXISTS idx_message_receiver ON marketplace_messages(receiver_id, is_read);
 CREATE INDEX IF NOT EXISTS idx_message_sender ON marketplace_messages(sender_id);
+-- Conversation history: matches the LEAST/GREATEST predicate used by the
+-- messaging service, newest first, without the (a,b) OR (b,a) scan
+CREATE INDEX IF NOT EXISTS idx_message_conversation ON marketplace_messages(
+    item_id, LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id),
+    sent_at DESC, message_id DESC
+);
+
+-- Conversations Indexes (inbox per side, unread badge as index-only sums)
+CREATE INDEX IF NOT EXISTS idx_conversation_user_a ON conversations(user_a, last_at DESC, item_id DESC, user_b DESC);
+CREATE INDEX IF NOT EXISTS idx_conversation_user_b ON conversations(user_b, last_at DESC, item_id DESC, user_a DESC);
+CREATE INDEX IF NOT EXISTS idx_conversation_unread_a ON conversations(user_a) INCLUDE (unread_a) WHERE unread_a > 0;
+CREATE INDEX IF NOT EXISTS idx_conversation_unread_b ON conversations(user_b) INCLUDE (unread_b) WHERE unread_b > 0;
 
 -- Saved Items Indexes
 CREATE INDEX IF NOT EXISTS idx_saved_user ON item_saved(user_id);
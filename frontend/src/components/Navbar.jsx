@@ -1,24 +1,38 @@
 import React, { useState, useEffect, useContext } from "react";
 import { useNavigate } from "react-router-dom";
 import { AuthContext } from "../context/AuthContext";
-import api from "../services/api";
 
 const Navbar = ({ showBack = false }) => {
   const navigate = useNavigate();
-  const { user, logout } = useContext(AuthContext);
+  const { user, token, logout } = useContext(AuthContext);
   const [unread, setUnread] = useState(0);
 
+  // Unread badge is pushed by the messaging service — no polling.
+  // Reconnects a few seconds after the socket drops.
   useEffect(() => {
-    if (!user) return;
-    const fetchUnread = () => {
-      api.get("/messages/unread-count")
-        .then(r => setUnread(r.data.unread || 0))
-        .catch(() => {});
+    if (!user || !token) return;
+    let ws;
+    let retry;
+    let closed = false;
+
+    const connect = () => {
+      ws = new WebSocket(`ws://localhost/messages/ws/inbox?token=${token}`);
+      ws.onmessage = (e) => {
+        const data = JSON.parse(e.data);
+        if (data.type === "unread") setUnread(data.unread || 0);
+      };
+      ws.onclose = () => {
+        if (!closed) retry = setTimeout(connect, 5000);
+      };
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      ws?.close();
     };
-    fetchUnread();
-    const interval = setInterval(fetchUnread, 30000);
-    return () => clearInterval(interval);
-  }, [user]);
+  }, [user, token]);
 
   return (
     <nav className="navbar">
@@ -7,16 +7,22 @@ import { AuthContext } from "../context/AuthContext";
  * Usage: <Chat itemId={42} sellerId="user_000003" />
  *
  * WebSocket path: ws://localhost/messages/ws/{itemId}/{sellerId}?token={jwt}
- * On connect: server sends { type: "history", messages: [...] }
+ * On connect: server sends { type: "history", messages: [...newest first], next_cursor }
+ * Scroll-back: client sends { type: "load_older", before: next_cursor },
+ *              server replies { type: "older", messages, next_cursor }
  * On message: server broadcasts { type: "message", sender_id, text, sent_at }
+ * Client sends { type: "read" } when a message from the other side arrives
+ * while the chat is open, which clears the unread badge.
  */
 const Chat = ({ itemId, sellerId, sellerName }) => {
   const { token, user } = useContext(AuthContext);
   const [messages, setMessages]   = useState([]);
   const [input, setInput]         = useState("");
   const [status, setStatus]       = useState("connecting");
+  const [cursor, setCursor]       = useState(null);
   const wsRef   = useRef(null);
   const bottomRef = useRef(null);
+  const lastIdRef = useRef(null);
 
   useEffect(() => {
     if (!token || !itemId || !sellerId) return;
@@ -32,19 +38,37 @@ const Chat = ({ itemId, sellerId, sellerName }) => {
     ws.onmessage = (e) => {
       const data = JSON.parse(e.data);
       if (data.type === "history") {
-        setMessages(data.messages);
+        setMessages([...data.messages].reverse());
+        setCursor(data.next_cursor);
+      } else if (data.type === "older") {
+        setMessages((prev) => [...[...data.messages].reverse(), ...prev]);
+        setCursor(data.next_cursor);
       } else if (data.type === "message") {
         setMessages((prev) => [...prev, data]);
+        if (data.sender_id !== user?.user_id) {
+          ws.send(JSON.stringify({ type: "read" }));
+        }
       }
     };
 
     return () => ws.close();
   }, [token, itemId, sellerId]);
 
+  // Scroll only when a message lands at the end — not when an older page
+  // is prepended while the user is reading further up.
   useEffect(() => {
+    const lastId = messages[messages.length - 1]?.message_id;
+    if (lastId === lastIdRef.current) return;
+    lastIdRef.current = lastId;
     bottomRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages]);
 
+  const loadOlder = () => {
+    if (!cursor || wsRef.current?.readyState !== WebSocket.OPEN) return;
+    wsRef.current.send(JSON.stringify({ type: "load_older", before: cursor }));
+    setCursor(null);  // until the reply arrives
+  };
+
   const send = (e) => {
     e.preventDefault();
     if (!input.trim() || wsRef.current?.readyState !== WebSocket.OPEN) return;
@@ -67,6 +91,11 @@ const Chat = ({ itemId, sellerId, sellerName }) => {
       </div>
 
       <div style={styles.messageList}>
+        {cursor && (
+          <button style={styles.older} type="button" onClick={loadOlder}>
+            Load older messages
+          </button>
+        )}
         {messages.map((m, i) => {
           const mine = m.sender_id === user?.user_id;
           return (
@@ -112,6 +141,7 @@ const styles = {
   bubbleTime:  { fontSize:10, opacity:0.6, alignSelf:"flex-end" },
   form:        { display:"flex", borderTop:"1px solid #e5e7eb", padding:8, gap:8, background:"#f9fafb" },
   input:       { flex:1, padding:"8px 12px", borderRadius:6, border:"1px solid #d1d5db", fontSize:14, outline:"none" },
+  older:       { alignSelf:"center", padding:"4px 10px", background:"none", border:"1px solid #d1d5db", borderRadius:12, cursor:"pointer", fontSize:12, color:"#6b7280" },
   btn:         { padding:"8px 16px", background:"#6366f1", color:"#fff", border:"none", borderRadius:6, cursor:"pointer", fontSize:14, fontWeight:600 },
 };
 
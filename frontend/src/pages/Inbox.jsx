@@ -11,30 +11,7 @@ const Inbox = () => {
 
   useEffect(() => {
     api.get("/messages/inbox?limit=100")
-      .then(r => {
-        const msgs = r.data.messages || [];
-
-        // Group by (item_id, sender_id) — keep latest message per thread
-        const latest = new Map();
-        const unreadCount = new Map();
-
-        msgs.forEach(m => {
-          const key = `${m.item_id}::${m.sender_id}`;
-          const existing = latest.get(key);
-          if (!existing || new Date(m.sent_at) > new Date(existing.sent_at)) {
-            latest.set(key, m);
-          }
-          if (!m.is_read) {
-            unreadCount.set(key, (unreadCount.get(key) || 0) + 1);
-          }
-        });
-
-        const list = Array.from(latest.values())
-          .map(m => ({ ...m, unread: unreadCount.get(`${m.item_id}::${m.sender_id}`) || 0 }))
-          .sort((a, b) => new Date(b.sent_at) - new Date(a.sent_at));
-
-        setConvos(list);
-      })
+      .then(r => setConvos(r.data.conversations || []))
       .catch(() => setError("Could not load inbox."))
       .finally(() => setLoading(false));
   }, []);
@@ -56,14 +33,14 @@ const Inbox = () => {
         <ul className="conv-list">
           {convos.map(m => (
             <li
-              key={`${m.item_id}-${m.sender_id}`}
+              key={`${m.item_id}-${m.other_user_id}`}
               className={`conv-row ${m.unread > 0 ? "unread" : ""}`}
-              onClick={() => navigate(`/thread/${m.item_id}/${m.sender_id}`)}
+              onClick={() => navigate(`/thread/${m.item_id}/${m.other_user_id}`)}
             >
-              <div className="conv-avatar">{initials(m.sender_id)}</div>
+              <div className="conv-avatar">{initials(m.other_user_id)}</div>
               <div className="conv-info">
                 <div className="conv-top">
-                  <span className="conv-name">{m.sender_id}</span>
+                  <span className="conv-name">{m.other_user_id}</span>
                   <span className="conv-time">
                     {new Date(m.sent_at).toLocaleDateString([], { month: "short", day: "numeric" })}
                   </span>
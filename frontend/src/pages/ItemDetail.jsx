@@ -38,19 +38,8 @@ const ItemDetail = () => {
   useEffect(() => {
     if (!isMine || !item) return;
     api.get("/messages/inbox?limit=100")
-      .then(r => {
-        const msgs = r.data.messages || [];
-        const forItem = msgs.filter(m => m.item_id === item.item_id);
-        const latest = new Map();
-        forItem.forEach(m => {
-          const existing = latest.get(m.sender_id);
-          if (!existing || new Date(m.sent_at) > new Date(existing.sent_at)) {
-            latest.set(m.sender_id, m);
-          }
-        });
-        setBuyerConvos(Array.from(latest.values())
-          .sort((a, b) => new Date(b.sent_at) - new Date(a.sent_at)));
-      })
+      .then(r => setBuyerConvos((r.data.conversations || [])
+        .filter(c => c.item_id === item.item_id)))
       .catch(() => {});
   }, [isMine, item]);
 
@@ -139,15 +128,15 @@ const ItemDetail = () => {
                   </h4>
                   {buyerConvos.map(m => (
                     <div
-                      key={m.sender_id}
+                      key={m.other_user_id}
                       className="buyer-row"
-                      onClick={() => navigate(`/thread/${item.item_id}/${m.sender_id}`)}
+                      onClick={() => navigate(`/thread/${item.item_id}/${m.other_user_id}`)}
                     >
                       <div className="buyer-avatar">
-                        {m.sender_id.slice(-2).toUpperCase()}
+                        {m.other_user_id.slice(-2).toUpperCase()}
                       </div>
                       <div className="buyer-info">
-                        <span className="buyer-name">{m.sender_id}</span>
+                        <span className="buyer-name">{m.other_user_id}</span>
                         <p className="buyer-preview">
                           {m.text?.slice(0, 60)}{m.text?.length > 60 ? "…" : ""}
                         </p>
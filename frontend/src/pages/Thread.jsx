@@ -14,6 +14,10 @@ const Thread = () => {
       .catch(() => {});
   }, [itemId]);
 
+  useEffect(() => {
+    api.post(`/messages/conversation/${itemId}/${otherUserId}/read`).catch(() => {});
+  }, [itemId, otherUserId]);
+
   return (
     <div className="app-shell">
       <Navbar showBack />
@@ -10,6 +10,7 @@ from app.core.exceptions import ItemNotFoundException
 from app.grpc.user_client import verify_token
 
 from app.core.kafka_client import publish as kafka_publish
+from app.core.event_stream import publish_stream_event
 
 log = structlog.get_logger()
 router = APIRouter(prefix="/marketplace", tags=["marketplace"])
@@ -187,6 +188,8 @@ def save_item(
     ), {"id": item_id})
     db.commit()
 
+    publish_stream_event("item_saved", {"user_id": user_id, "item_id": item_id})
+
     row = db.execute(
         text("SELECT saves_count FROM marketplace_items WHERE item_id = :id"),
         {"id": item_id},
@@ -7,6 +7,7 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.exceptions import ElectroHubException, electrohub_exception_handler, unhandled_exception_handler
 from app.core.logging_config import configure_logging, request_logging_middleware
+from app.core.metrics import setup_metrics
 from app.api.marketplace import router as marketplace_router
 
 configure_logging()
@@ -31,6 +32,9 @@ async def lifespan(app: FastAPI):
         await grpc_task
     except asyncio.CancelledError:
         pass
+    # Send any item_viewed batches still lingering in the producer
+    from app.core.kafka_client import get_event_producer
+    await asyncio.get_running_loop().run_in_executor(None, get_event_producer().flush)
 
 
 app = FastAPI(title="ElectroHub — Listing Service", lifespan=lifespan)
@@ -43,6 +47,7 @@ app.add_middleware(CORSMiddleware,
     allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
 app.middleware("http")(request_logging_middleware)
+setup_metrics(app)
 app.include_router(marketplace_router)
 
 
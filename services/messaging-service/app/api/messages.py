@@ -5,6 +5,9 @@ Two parallel messaging paths:
   REST  POST /messages/contact/{item_id}  — fire-and-forget (backwards compat)
   WS    /messages/ws/{item_id}/{seller_id} — real-time bidirectional chat
 
+History is newest first with keyset cursors (app.core.history); the WS
+client asks for more with {"type": "load_older", "before": <cursor>}.
+
 WebSocket auth: token passed as ?token= query param (standard for WS).
 
 After every message:
@@ -12,17 +15,24 @@ After every message:
   2. Redis publish        (fan-out to all messaging-service instances)
   3. Kafka publish        (feeds analytics / Spark pipeline)
   4. RabbitMQ publish     (notification-service sends email if seller offline)
+                          — skipped when app.core.presence says the
+                          receiver has a chat socket open on any replica
+
+The WebSocket path never blocks the event loop: it persists through the
+group-commit writer on the pooled asyncpg engine (app.core.message_writer),
+fans out with the async Redis client, and hands Kafka / RabbitMQ
+publishing (which may block briefly on a full buffer or a broker outage)
+to the default executor without waiting for it.
 """
 
-import os
+import asyncio
 import json
 from datetime import datetime
 
 import structlog
 from fastapi import APIRouter, Header, Query, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
 
 from app.grpc.user_client import verify_token, get_user
 from app.grpc.listing_client import get_seller_info
@@ -30,25 +40,19 @@ from app.core.exceptions import (
     ValidationException, ItemNotFoundException,
     RateLimitException, AuthException,
 )
-from app.core.redis_client import get_redis_client
-from app.core.connection_manager import manager, redis_fanout_subscriber
+from app.core.database import SessionLocal as _Session, async_engine
+from app.core.message_writer import message_writer
+from app.core import history, unread
+from app.core.redis_client import get_redis_client, get_async_redis_client
+from app.core.connection_manager import manager
 from app.core.kafka_client import publish as kafka_publish
 from app.core.rabbitmq_client import publish_notification
+from app.core.presence import presence
+from app.core.metrics import notifications_suppressed
 
 log = structlog.get_logger()
 router = APIRouter(prefix="/messages", tags=["messages"])
 
-DB_URL = (
-    f"postgresql://{os.getenv('DB_USER','postgres')}:"
-    f"{os.getenv('DB_PASSWORD','password')}@"
-    f"{os.getenv('DB_HOST','postgres_shard0')}:"
-    f"{os.getenv('DB_PORT','5432')}/"
-    f"{os.getenv('DB_NAME','electrohub')}"
-)
-_engine = create_engine(DB_URL, pool_pre_ping=True)
-_Session = sessionmaker(bind=_engine)
-
-
 def _current_user(authorization: str | None) -> str:
     if not authorization or not authorization.startswith("Bearer "):
         raise AuthException("Authorization header required")
@@ -58,39 +62,55 @@ def _current_user(authorization: str | None) -> str:
     return user_id
 
 
+_INSERT_MESSAGE = text("""
+    INSERT INTO marketplace_messages
+        (sender_id, receiver_id, item_id, message_text, sent_at)
+    VALUES (:sender, :receiver, :item_id, :msg, NOW())
+    RETURNING message_id, sent_at
+""")
+
+
+def _as_message(row, sender_id: str, receiver_id: str, item_id: int, body: str) -> dict:
+    return {
+        "message_id": row[0],
+        "sender_id": sender_id,
+        "receiver_id": receiver_id,
+        "item_id": item_id,
+        "text": body,
+        "sent_at": str(row[1]),
+    }
+
+
 def _save_message(sender_id: str, receiver_id: str, item_id: int, body: str) -> dict:
     db = _Session()
     try:
-        row = db.execute(text("""
-            INSERT INTO marketplace_messages
-                (sender_id, receiver_id, item_id, message_text, sent_at)
-            VALUES (:sender, :receiver, :item_id, :msg, NOW())
-            RETURNING message_id, sent_at
-        """), {
+        row = db.execute(_INSERT_MESSAGE, {
             "sender": sender_id, "receiver": receiver_id,
             "item_id": item_id, "msg": body,
         }).fetchone()
         db.commit()
-        return {
-            "message_id": row[0],
-            "sender_id": sender_id,
-            "receiver_id": receiver_id,
-            "item_id": item_id,
-            "text": body,
-            "sent_at": str(row[1]),
-        }
+        return _as_message(row, sender_id, receiver_id, item_id, body)
     finally:
         db.close()
 
 
 def _after_message(msg: dict, seller_email: str = "", seller_name: str = "") -> None:
-    """Publish to Kafka + RabbitMQ after every message. Fire-and-forget."""
+    """Publish to Redis + Kafka + RabbitMQ after every message. Fire-and-forget."""
     conv_id = manager.conv_id(msg["item_id"], msg["sender_id"], msg["receiver_id"])
 
-    # Redis fan-out → real-time WebSocket delivery on all instances
-    get_redis_client().publish(
-        f"electrohub:chat:{conv_id}", json.dumps(msg)
-    )
+    # Recent-history cache + Redis fan-out → real-time WebSocket delivery on all instances
+    pipe = get_redis_client().pipeline(transaction=False)
+    history.remember(pipe, conv_id, msg)
+    pipe.publish(manager.channel(conv_id), json.dumps(msg))
+    pipe.execute()
+
+    _publish_events(msg, seller_email, seller_name)
+
+
+def _publish_events(msg: dict, seller_email: str = "", seller_name: str = "") -> None:
+    """Unread counter + Kafka + RabbitMQ. Sync and possibly briefly blocking — keep off the event loop."""
+    # Redis unread counter → pushed to the receiver's inbox socket
+    unread.on_message(msg)
 
     # Kafka → analytics / Spark pipeline
     kafka_publish("message_sent", {
@@ -101,6 +121,9 @@ def _after_message(msg: dict, seller_email: str = "", seller_name: str = "") ->
     }, key=msg["sender_id"])
 
     # RabbitMQ → persistent notification job (email if seller offline)
+    if presence.is_online(msg["receiver_id"]):
+        notifications_suppressed.labels(service="messaging").inc()
+        return
     publish_notification("message_received", {
         "seller_id": msg["receiver_id"],
         "buyer_id": msg["sender_id"],
@@ -113,6 +136,14 @@ def _after_message(msg: dict, seller_email: str = "", seller_name: str = "") ->
 
 # ── WebSocket endpoint ────────────────────────────────────────────────────── #
 
+def _log_failure(task: str):
+    """Done-callback for executor work nobody awaits, so its errors still get logged."""
+    def _done(future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            log.error("chat_background_task_failed", task=task, error=str(future.exception()))
+    return _done
+
+
 @router.websocket("/ws/{item_id}/{seller_id}")
 async def chat_ws(
     websocket: WebSocket,
@@ -134,61 +165,82 @@ async def chat_ws(
         return
 
     conv_id = manager.conv_id(item_id, caller_id, seller_id)
-    await manager.connect(websocket, conv_id)
+    await manager.connect(websocket, conv_id, caller_id)
     log.info("chat_ws_joined", conv_id=conv_id, user=caller_id)
 
-    # Send message history on connect
-    db = _Session()
+    loop = asyncio.get_running_loop()
+    redis = get_async_redis_client()
     try:
-        history = db.execute(text("""
-            SELECT message_id, sender_id, receiver_id, message_text, sent_at
-            FROM marketplace_messages
-            WHERE item_id = :iid
-              AND ((sender_id = :a AND receiver_id = :b)
-                OR (sender_id = :b AND receiver_id = :a))
-            ORDER BY sent_at ASC
-            LIMIT 50
-        """), {"iid": item_id, "a": caller_id, "b": seller_id}).fetchall()
-
-        await websocket.send_json({
-            "type": "history",
-            "messages": [
-                {"message_id": r[0], "sender_id": r[1], "receiver_id": r[2],
-                 "text": r[3], "sent_at": str(r[4])}
-                for r in history
-            ]
-        })
-    finally:
-        db.close()
+        # Newest page of history on connect — from the Redis cache when warm.
+        # Through the socket's queue so history can't interleave with a broadcast.
+        page = await history.latest(conv_id, item_id, caller_id, seller_id)
+        await manager.send(websocket, conv_id, {"type": "history", **page})
 
-    try:
         while True:
-            data = await websocket.receive_json()
-            text_body = data.get("text", "").strip()
+            data = await manager.receive(websocket)
+            if data.get("type") == "load_older":
+                try:
+                    page = await history.older(item_id, caller_id, seller_id, data.get("before"))
+                except history.InvalidCursor:
+                    continue
+                await manager.send(websocket, conv_id, {"type": "older", **page})
+                continue
+            if data.get("type") == "read":
+                # Client is viewing the thread — clear the caller's unread count
+                loop.run_in_executor(
+                    None, unread.mark_read, caller_id, [(item_id, seller_id)],
+                ).add_done_callback(_log_failure("mark_read"))
+                continue
+            text = data.get("text")
+            text_body = text.strip() if isinstance(text, str) else ""
             if not text_body:
                 continue
 
-            msg = _save_message(caller_id, seller_id, item_id, text_body)
+            # Group commit: concurrent chats share one INSERT + COMMIT
+            msg = await message_writer.save(caller_id, seller_id, item_id, text_body)
             msg["type"] = "message"
 
-            # Fan-out via Redis → all instances deliver to their local sockets
-            get_redis_client().publish(
-                f"electrohub:chat:{conv_id}", json.dumps(msg)
-            )
-
-            kafka_publish("message_sent", {
-                "buyer_id": caller_id, "seller_id": seller_id,
-                "item_id": item_id, "ts": msg["sent_at"],
-            }, key=caller_id)
+            # Recent-history cache + fan-out via Redis → all instances deliver
+            # to their local sockets. Awaited so this sender's messages are
+            # published in order.
+            async with redis.pipeline(transaction=False) as pipe:
+                history.remember(pipe, conv_id, msg)
+                pipe.publish(manager.channel(conv_id), json.dumps(msg))
+                await pipe.execute()
 
-            publish_notification("message_received", {
-                "seller_id": seller_id, "buyer_id": caller_id,
-                "item_id": item_id, "preview": text_body[:100],
-            })
+            # Kafka + RabbitMQ in the executor; the receive loop doesn't wait
+            loop.run_in_executor(None, _publish_events, msg).add_done_callback(
+                _log_failure("publish_events"))
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket, conv_id)
         log.info("chat_ws_left", conv_id=conv_id, user=caller_id)
+    finally:
+        # Drops this instance's Redis subscription once the last local socket leaves
+        await manager.disconnect(websocket, conv_id)
+
+
+@router.websocket("/ws/inbox")
+async def inbox_ws(websocket: WebSocket, token: str = Query(...)):
+    """
+    Per-user push channel: {"type": "unread", "unread": n, "conversation": {...}}
+    whenever the caller's unread counts change. Replaces badge polling.
+    """
+    valid, user_id = verify_token(token)
+    if not valid:
+        await websocket.close(code=4001, reason="Unauthorized")
+        return
+
+    inbox_id = manager.inbox_id(user_id)
+    await manager.connect(websocket, inbox_id, user_id)
+    try:
+        total = await asyncio.get_running_loop().run_in_executor(None, unread.total, user_id)
+        await manager.send(websocket, inbox_id, {"type": "unread", "unread": total})
+        while True:
+            await manager.receive(websocket)   # nothing expected; keeps the socket open
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await manager.disconnect(websocket, inbox_id)
 
 
 # ── REST endpoint (backwards compat / non-JS clients) ────────────────────── #
@@ -234,67 +286,134 @@ def contact_seller(
 
 @router.get("/unread-count")
 def get_unread_count(authorization: str | None = Header(default=None)):
+    """Served from the Redis counter; rebuilt from the conversations table on a miss."""
     user_id = _current_user(authorization)
-    db = _Session()
+    return {"unread": unread.total(user_id)}
+
+
+_INBOX_PAGE = """
+    SELECT * FROM (
+        (SELECT item_id, user_b AS other_user_id, last_message_id, last_sender_id,
+                last_message_text, last_at, unread_a AS unread
+         FROM conversations
+         WHERE user_a = :uid {after_a}
+         ORDER BY last_at DESC, item_id DESC, user_b DESC LIMIT :limit)
+        UNION ALL
+        (SELECT item_id, user_a, last_message_id, last_sender_id,
+                last_message_text, last_at, unread_b
+         FROM conversations
+         WHERE user_b = :uid AND user_a <> user_b {after_b}
+         ORDER BY last_at DESC, item_id DESC, user_a DESC LIMIT :limit)
+    ) c
+    ORDER BY last_at DESC, item_id DESC, other_user_id DESC
+    LIMIT :limit
+"""
+_INBOX_FIRST = text(_INBOX_PAGE.format(after_a="", after_b=""))
+_INBOX_NEXT = text(_INBOX_PAGE.format(
+    after_a="AND (last_at, item_id, user_b) < (:before_at, :before_item, :before_other)",
+    after_b="AND (last_at, item_id, user_a) < (:before_at, :before_item, :before_other)",
+))
+
+
+def _inbox_cursor(row) -> str:
+    """Opaque "<last_at>|<item_id>|<other_user_id>" of the last row on a page."""
+    return f"{row[5].isoformat()}|{row[0]}|{row[1]}"
+
+
+def _parse_inbox_cursor(cursor: str) -> dict:
     try:
-        row = db.execute(text(
-            "SELECT COUNT(*) FROM marketplace_messages WHERE receiver_id = :uid AND is_read = false"
-        ), {"uid": user_id}).fetchone()
-    finally:
-        db.close()
-    return {"unread": int(row[0])}
+        last_at, item_id, other = cursor.split("|", 2)
+        return {"before_at": datetime.fromisoformat(last_at),
+                "before_item": int(item_id), "before_other": other}
+    except ValueError:
+        raise ValidationException("Invalid cursor")
 
 
 @router.get("/inbox")
 def get_inbox(
-    skip: int = 0,
-    limit: int = 20,
+    limit: int = Query(20, ge=1, le=100),
+    before: str | None = None,
     authorization: str | None = Header(default=None),
 ):
+    """
+    One row per conversation, most recent first. Pass the returned
+    next_cursor as ?before= for the next page. The cursor is the full
+    (last_at, item_id, other_user_id) key, so conversations sharing a
+    last_at — every row of one group commit does — are never skipped.
+    """
     user_id = _current_user(authorization)
+    params = {"uid": user_id, "limit": limit + 1}
+    if before is not None:
+        params.update(_parse_inbox_cursor(before))
     db = _Session()
     try:
-        rows = db.execute(text("""
-            SELECT message_id, sender_id, receiver_id, item_id,
-                   message_text, sent_at, is_read
-            FROM marketplace_messages
-            WHERE receiver_id = :uid
-            ORDER BY sent_at DESC
-            LIMIT :limit OFFSET :skip
-        """), {"uid": user_id, "limit": limit, "skip": skip}).fetchall()
+        rows = db.execute(_INBOX_FIRST if before is None else _INBOX_NEXT, params).fetchall()
     finally:
         db.close()
 
-    return {"messages": [
-        {"message_id": r[0], "sender_id": r[1], "receiver_id": r[2],
-         "item_id": r[3], "text": r[4], "sent_at": str(r[5]), "is_read": r[6]}
-        for r in rows
-    ]}
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "conversations": [
+            {"item_id": r[0], "other_user_id": r[1], "last_message_id": r[2],
+             "last_sender_id": r[3], "text": r[4], "sent_at": str(r[5]), "unread": r[6]}
+            for r in rows
+        ],
+        "next_cursor": _inbox_cursor(rows[-1]) if more else None,
+    }
+
+
+class ReadConversation(BaseModel):
+    item_id: int
+    other_user_id: str
+
+
+class MarkReadRequest(BaseModel):
+    conversations: list[ReadConversation]
+
+
+@router.post("/read")
+def mark_read(body: MarkReadRequest, authorization: str | None = Header(default=None)):
+    """Mark several threads read in one UPDATE (e.g. "mark all as read")."""
+    if len(body.conversations) > 500:
+        raise ValidationException("At most 500 conversations per request")
+    caller_id = _current_user(authorization)
+    marked = unread.mark_read(
+        caller_id, [(c.item_id, c.other_user_id) for c in body.conversations])
+    return {"marked": marked}
+
+
+@router.post("/conversation/{item_id}/{other_user_id}/read")
+def mark_conversation_read(
+    item_id: int,
+    other_user_id: str,
+    authorization: str | None = Header(default=None),
+):
+    """Mark everything the other user sent in this thread as read."""
+    caller_id = _current_user(authorization)
+    return {"marked": unread.mark_read(caller_id, [(item_id, other_user_id)])}
 
 
 @router.get("/conversation/{item_id}/{other_user_id}")
 def get_conversation(
     item_id: int,
     other_user_id: str,
+    limit: int = Query(history.PAGE_SIZE, ge=1, le=200),
+    before: str | None = None,
     authorization: str | None = Header(default=None),
 ):
-    """Fetch full conversation history for a listing (REST fallback)."""
+    """
+    Conversation history for a listing (REST fallback), newest first.
+    Pass the returned next_cursor as ?before= to load older messages.
+    """
     caller_id = _current_user(authorization)
+    try:
+        stmt, params = history.page_query(item_id, caller_id, other_user_id, before, limit)
+    except history.InvalidCursor:
+        raise ValidationException("Invalid cursor")
     db = _Session()
     try:
-        rows = db.execute(text("""
-            SELECT message_id, sender_id, receiver_id, message_text, sent_at, is_read
-            FROM marketplace_messages
-            WHERE item_id = :iid
-              AND ((sender_id = :a AND receiver_id = :b)
-                OR (sender_id = :b AND receiver_id = :a))
-            ORDER BY sent_at ASC
-        """), {"iid": item_id, "a": caller_id, "b": other_user_id}).fetchall()
+        rows = db.execute(stmt, params).fetchall()
     finally:
         db.close()
-
-    return {"messages": [
-        {"message_id": r[0], "sender_id": r[1], "receiver_id": r[2],
-         "text": r[3], "sent_at": str(r[4]), "is_read": r[5]}
-        for r in rows
-    ]}
+    return history.page_from_rows(rows, limit)
@@ -10,54 +10,267 @@ Multi-instance fan-out via Redis Pub/Sub:
                                             │
                               ┌─────────────┘
                               │
-                    All messaging-service instances subscribe
+                    Instances holding a socket for conv_id subscribe
                     Instance A → delivers to buyer's socket
                     Instance B → delivers to seller's socket
 
 This ensures delivery even when buyer and seller are connected
 to different service replicas (essential for horizontal scaling).
+
+Subscriptions are per conversation and reference-counted by local
+sockets: the first connect() for a conv_id SUBSCRIBEs its channel, the
+last disconnect() UNSUBSCRIBEs it. A replica therefore only receives and
+decodes messages for conversations it actually serves — fan-out cost
+scales with its own connections, not with global chat volume.
+
+The inbox socket (/messages/ws/inbox) joins the pseudo-conversation
+inbox_id(user_id), so per-user pushes such as unread counts use the same
+channel / fan-out path.
+
+Every socket also registers its user in the presence registry
+(app.core.presence), which lets the send path skip offline-email jobs for
+users who are connected to any replica.
+
+Delivery to sockets:
+  Every socket has a bounded outbound queue and its own writer task.
+  broadcast_local() serialises once and only enqueues, so it never waits
+  on a network write. The Redis payload is already JSON, so fan-out
+  forwards it as-is. When a socket's queue is full (a slow mobile client),
+  WS_SLOW_CONSUMER_POLICY decides: "disconnect" (default, close with 1013
+  so the client reconnects and reloads history) or "drop" (skip the frame
+  for that socket only). Either way, other chats are unaffected.
+
+Wire formats (app.core.ws_codec):
+  Sockets that offer the "electrohub.msgpack.v1" subprotocol get binary
+  msgpack frames with short field tags; everyone else gets JSON text. A
+  broadcast is encoded at most once per format — the JSON text from Redis
+  is forwarded untouched, and msgpack is packed once for all binary peers
+  of the conversation. Binary peers also get coalescing: frames queued
+  within WS_COALESCE_MS are sent as one array frame (JSON clients keep one
+  object per frame for compatibility).
 """
 
 import asyncio
 import json
+import os
+import time
 from collections import defaultdict
 
 import structlog
 from fastapi import WebSocket
 
+from app.core import ws_codec
+from app.core.metrics import (
+    ws_connections, ws_queue_depth, ws_send_seconds, ws_slow_consumers,
+    ws_sent_bytes, ws_delivered_messages, ws_coalesced_messages,
+)
+from app.core.presence import presence
+from app.core.redis_subscriber import AsyncRedisSubscriber
+
 log = structlog.get_logger()
 
+CHANNEL_PREFIX = "electrohub:chat:"
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 64))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "disconnect")
+WS_COALESCE_MS = float(os.getenv("WS_COALESCE_MS", 5))
+WS_COALESCE_MAX = int(os.getenv("WS_COALESCE_MAX", 32))
+
+
+class _Frame:
+    """One outgoing message, encoded lazily and at most once per format."""
+
+    __slots__ = ("_text", "_message", "_packed")
+
+    def __init__(self, message: dict | str):
+        self._text = message if isinstance(message, str) else None
+        self._message = None if isinstance(message, str) else message
+        self._packed = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self._message)
+        return self._text
+
+    @property
+    def packed(self) -> bytes:
+        if self._packed is None:
+            if self._message is None:
+                self._message = json.loads(self._text)
+            self._packed = ws_codec.pack(self._message)
+        return self._packed
+
+
+class _Peer:
+    """One WebSocket plus its outbound queue and writer task."""
+
+    def __init__(self, ws: WebSocket, conv_id: str, user_id: str, binary: bool,
+                 manager: "ConversationManager"):
+        self.ws = ws
+        self.conv_id = conv_id
+        self.user_id = user_id
+        self.binary = binary
+        self._protocol = "msgpack" if binary else "json"
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self._manager = manager
+        self._task = asyncio.create_task(self._writer())
+
+    def offer(self, frame: _Frame) -> bool:
+        try:
+            self._queue.put_nowait(frame.packed if self.binary else frame.text)
+        except asyncio.QueueFull:
+            return False
+        ws_queue_depth.observe(self._queue.qsize())
+        return True
+
+    def close(self) -> None:
+        # A failed send evicts from inside the writer itself — let it return instead
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def _writer(self) -> None:
+        try:
+            while True:
+                data = await self._queue.get()
+                count = 1
+                if self.binary:
+                    batch = await self._coalesce(data)
+                    count = len(batch)
+                    data = batch[0] if count == 1 else ws_codec.pack_batch(batch)
+                    ws_coalesced_messages.observe(count)
+                t0 = time.perf_counter()
+                if self.binary:
+                    await self.ws.send_bytes(data)
+                else:
+                    await self.ws.send_text(data)
+                ws_send_seconds.observe(time.perf_counter() - t0)
+                ws_sent_bytes.labels(protocol=self._protocol).inc(len(data))
+                ws_delivered_messages.labels(protocol=self._protocol).inc(count)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            log.info("ws_send_failed", conv_id=self.conv_id, error=str(exc))
+            await self._manager._evict(self)
+
+    async def _coalesce(self, first: bytes) -> list[bytes]:
+        """Gather frames queued now or within WS_COALESCE_MS of the first."""
+        loop = asyncio.get_running_loop()
+        batch = [first]
+        deadline = loop.time() + WS_COALESCE_MS / 1000
+        while len(batch) < WS_COALESCE_MAX:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
 
 class ConversationManager:
     def __init__(self):
-        # conv_id → list of active WebSocket connections on THIS instance
-        self._connections: dict[str, list[WebSocket]] = defaultdict(list)
+        # conv_id → active connections on THIS instance
+        self._connections: dict[str, list[_Peer]] = defaultdict(list)
+        self._subscriber = AsyncRedisSubscriber("ws_fanout", self._on_fanout)
 
     def conv_id(self, item_id: int, user_a: str, user_b: str) -> str:
         """Stable ID regardless of who connects first."""
         return f"{item_id}_{min(user_a, user_b)}_{max(user_a, user_b)}"
 
-    async def connect(self, ws: WebSocket, conv_id: str) -> None:
-        await ws.accept()
-        self._connections[conv_id].append(ws)
+    def inbox_id(self, user_id: str) -> str:
+        """Per-user stream (unread badge), delivered like a conversation."""
+        return f"inbox:{user_id}"
+
+    def channel(self, conv_id: str) -> str:
+        return f"{CHANNEL_PREFIX}{conv_id}"
+
+    async def connect(self, ws: WebSocket, conv_id: str, user_id: str) -> None:
+        subprotocol = ws_codec.negotiate(ws.scope.get("subprotocols", []))
+        await ws.accept(subprotocol=subprotocol)
+        self._connections[conv_id].append(
+            _Peer(ws, conv_id, user_id, subprotocol is not None, self))
+        ws_connections.inc()
+        await presence.join(user_id)
+        if len(self._connections[conv_id]) == 1:
+            await self._subscriber.subscribe(self.channel(conv_id))
         log.info("ws_connected", conv_id=conv_id,
                  total=len(self._connections[conv_id]))
 
-    def disconnect(self, ws: WebSocket, conv_id: str) -> None:
-        self._connections[conv_id].remove(ws)
+    async def disconnect(self, ws: WebSocket, conv_id: str) -> None:
+        for peer in self._connections.get(conv_id, []):
+            if peer.ws is ws:
+                await self._evict(peer)
+                break
         log.info("ws_disconnected", conv_id=conv_id,
-                 total=len(self._connections[conv_id]))
+                 total=len(self._connections.get(conv_id, [])))
 
-    async def broadcast_local(self, conv_id: str, message: dict) -> None:
+    async def receive(self, ws: WebSocket) -> dict:
+        """
+        Next client frame in whichever format the socket negotiated. Frames
+        that don't decode to an object come back as {} so callers can
+        .get() fields without checking.
+        """
+        if ws_codec.negotiate(ws.scope.get("subprotocols", [])):
+            data = ws_codec.unpack(await ws.receive_bytes())
+        else:
+            data = await ws.receive_json()
+        if not isinstance(data, dict):
+            log.warning("ws_frame_ignored", reason="not an object", kind=type(data).__name__)
+            return {}
+        return data
+
+    async def send(self, ws: WebSocket, conv_id: str, message: dict) -> None:
+        """Queue a frame for one socket (e.g. history on connect), in order with broadcasts."""
+        for peer in self._connections.get(conv_id, []):
+            if peer.ws is ws:
+                await self._deliver(peer, _Frame(message))
+                return
+
+    async def broadcast_local(self, conv_id: str, message: dict | str) -> None:
         """Push to all sockets on this instance for this conversation."""
-        dead = []
-        for ws in self._connections.get(conv_id, []):
-            try:
-                await ws.send_json(message)
-            except Exception:
-                dead.append(ws)
-        for ws in dead:
-            self._connections[conv_id].remove(ws)
+        frame = _Frame(message)
+        for peer in list(self._connections.get(conv_id, [])):
+            await self._deliver(peer, frame)
+
+    async def run_fanout(self) -> None:
+        await self._subscriber.run()
+
+    async def _deliver(self, peer: _Peer, frame: _Frame) -> None:
+        if peer.offer(frame):
+            return
+        if WS_SLOW_CONSUMER_POLICY == "drop":
+            ws_slow_consumers.labels(action="drop").inc()
+            return
+        ws_slow_consumers.labels(action="disconnect").inc()
+        log.warning("ws_slow_consumer_disconnected", conv_id=peer.conv_id)
+        await self._evict(peer)
+        try:
+            await peer.ws.close(code=1013, reason="Too slow")
+        except Exception:
+            pass
+
+    async def _evict(self, peer: _Peer) -> None:
+        sockets = self._connections.get(peer.conv_id)
+        if sockets is None or peer not in sockets:
+            return
+        sockets.remove(peer)
+        ws_connections.dec()
+        emptied = not sockets
+        if emptied:
+            del self._connections[peer.conv_id]
+        peer.close()
+        await presence.leave(peer.user_id)
+        if emptied and peer.conv_id not in self._connections:   # no reconnect meanwhile
+            await self._subscriber.unsubscribe(self.channel(peer.conv_id))
+
+    async def _on_fanout(self, channel: str, data: str) -> None:
+        # Already JSON — forward without a decode/encode round trip
+        await self.broadcast_local(channel[len(CHANNEL_PREFIX):], data)
 
 
 manager = ConversationManager()
@@ -66,27 +279,8 @@ manager = ConversationManager()
 async def redis_fanout_subscriber() -> None:
     """
     Background asyncio task — subscribes to Redis and delivers messages
-    published by OTHER instances to local WebSocket connections.
+    published by any instance to local WebSocket connections.
+    Push-based: the subscriber awaits Redis instead of polling, and one
+    conversation always lands on the same worker so order is preserved.
     """
-    from app.core.redis_client import get_redis_client
-    redis = get_redis_client()
-    pubsub = redis.pubsub()
-    pubsub.psubscribe("electrohub:chat:*")   # pattern subscribe
-    log.info("ws_fanout_subscribed")
-
-    while True:
-        try:
-            msg = pubsub.get_message(ignore_subscribe_messages=True, timeout=0.05)
-            if msg and msg.get("type") == "pmessage":
-                channel = msg["channel"]
-                if isinstance(channel, bytes):
-                    channel = channel.decode()
-                conv_id = channel.split("electrohub:chat:")[-1]
-                data = json.loads(msg["data"])
-                await manager.broadcast_local(conv_id, data)
-        except asyncio.CancelledError:
-            pubsub.punsubscribe()
-            return
-        except Exception as exc:
-            log.error("fanout_error", error=str(exc))
-        await asyncio.sleep(0.01)
+    await manager.run_fanout()
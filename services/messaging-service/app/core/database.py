@@ -0,0 +1,29 @@
+import os
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+_DSN = (
+    f"{os.getenv('DB_USER','postgres')}:"
+    f"{os.getenv('DB_PASSWORD','password')}@"
+    f"{os.getenv('DB_HOST','postgres_shard0')}:"
+    f"{os.getenv('DB_PORT','5432')}/"
+    f"{os.getenv('DB_NAME','electrohub')}"
+)
+DB_URL = f"postgresql://{_DSN}"
+ASYNC_DB_URL = f"postgresql+asyncpg://{_DSN}"
+
+# Sync engine — REST routes, which FastAPI runs in its threadpool
+engine = create_engine(DB_URL, pool_pre_ping=True, pool_size=5, max_overflow=10)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine — the WebSocket chat path, which runs on the event loop.
+# Sized for many concurrent chats: a connection is only held for one query.
+async_engine = create_async_engine(
+    ASYNC_DB_URL,
+    pool_pre_ping=True,
+    pool_size=int(os.getenv("DB_ASYNC_POOL_SIZE", 20)),
+    max_overflow=int(os.getenv("DB_ASYNC_MAX_OVERFLOW", 20)),
+    pool_timeout=5,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
@@ -0,0 +1,146 @@
+"""
+Conversation history: newest-first keyset pages plus a Redis cache of the
+most recent messages per conversation.
+
+Pages are ordered by (sent_at, message_id) DESC and continue from an opaque
+cursor "<sent_at>|<message_id>" — the oldest message of the previous page —
+so every page is one range scan of idx_message_conversation, however deep
+the user scrolls. No OFFSET, no full-conversation reads.
+
+Recent-messages cache:
+
+    electrohub:history:{conv_id}        ZSET  member = message JSON, score = message_id
+    electrohub:history:{conv_id}:full   flag  "the ZSET holds the latest N"
+
+  - remember(): every new message is ZADDed and the set trimmed to N.
+    This happens even when the set is cold, so a message committed while
+    the cache is being filled can't be lost from it.
+  - latest(): with the flag set, connecting is a single ZREVRANGE. On a
+    miss the newest page comes from Postgres, is ZADDed (idempotent — the
+    member JSON is canonical) and the flag is set.
+
+Chat pages (latest / older) leave out is_read, whether cached or not: a
+cached member can't follow mark-read without being rewritten on every
+visit. The REST history endpoint reads Postgres and keeps it.
+"""
+
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.core.database import async_engine
+from app.core.redis_client import get_async_redis_client
+
+KEY_PREFIX = "electrohub:history:"
+PAGE_SIZE  = int(os.getenv("HISTORY_PAGE_SIZE", 50))
+CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", 50))
+CACHE_TTL  = int(os.getenv("HISTORY_CACHE_TTL_S", 3_600))
+
+_CONVERSATION = """
+    SELECT message_id, sender_id, receiver_id, message_text, sent_at, is_read
+    FROM marketplace_messages
+    WHERE item_id = :iid
+      AND LEAST(sender_id, receiver_id) = LEAST(:a, :b)
+      AND GREATEST(sender_id, receiver_id) = GREATEST(:a, :b)
+"""
+_FIRST_PAGE = text(_CONVERSATION + """
+    ORDER BY sent_at DESC, message_id DESC
+    LIMIT :limit
+""")
+_NEXT_PAGE = text(_CONVERSATION + """
+      AND (sent_at, message_id) < (:before_at, :before_id)
+    ORDER BY sent_at DESC, message_id DESC
+    LIMIT :limit
+""")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def cursor_for(message: dict) -> str:
+    return f"{message['sent_at']}|{message['message_id']}"
+
+
+def _parse_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        sent_at, message_id = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(sent_at), int(message_id)
+    except ValueError as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def _entry(msg: dict) -> dict:
+    """The cached / returned shape of a message."""
+    return {"message_id": msg["message_id"], "sender_id": msg["sender_id"],
+            "receiver_id": msg["receiver_id"], "text": msg["text"],
+            "sent_at": msg["sent_at"]}
+
+
+def _member(msg: dict) -> str:
+    return json.dumps(_entry(msg), sort_keys=True, separators=(",", ":"))
+
+
+def page_from_rows(rows, limit: int, read_state: bool = True) -> dict:
+    """
+    {"messages": newest first, "next_cursor": str | None}. With
+    read_state=False messages have the cached shape (_entry), without is_read.
+    """
+    messages = [
+        {"message_id": r[0], "sender_id": r[1], "receiver_id": r[2],
+         "text": r[3], "sent_at": str(r[4]), **({"is_read": r[5]} if read_state else {})}
+        for r in rows[:limit]
+    ]
+    more = len(rows) > limit
+    return {"messages": messages,
+            "next_cursor": cursor_for(messages[-1]) if more else None}
+
+
+def page_query(item_id: int, a: str, b: str, before: str | None, limit: int):
+    """(statement, params) for one page; fetches limit + 1 to detect more."""
+    params = {"iid": item_id, "a": a, "b": b, "limit": limit + 1}
+    if before is None:
+        return _FIRST_PAGE, params
+    params["before_at"], params["before_id"] = _parse_cursor(before)
+    return _NEXT_PAGE, params
+
+
+async def older(item_id: int, a: str, b: str, before: str | None,
+                limit: int = PAGE_SIZE) -> dict:
+    stmt, params = page_query(item_id, a, b, before, limit)
+    async with async_engine.connect() as conn:
+        rows = (await conn.execute(stmt, params)).fetchall()
+    return page_from_rows(rows, limit, read_state=False)
+
+
+async def latest(conv_id: str, item_id: int, a: str, b: str) -> dict:
+    """Newest page for a fresh connection — from Redis when warm."""
+    redis = get_async_redis_client()
+    key = f"{KEY_PREFIX}{conv_id}"
+    if await redis.exists(f"{key}:full"):
+        members = await redis.zrevrange(key, 0, CACHE_SIZE - 1)
+        if members:
+            messages = [json.loads(m) for m in members]
+            full_page = len(messages) >= CACHE_SIZE
+            return {"messages": messages,
+                    "next_cursor": cursor_for(messages[-1]) if full_page else None}
+
+    page = await older(item_id, a, b, None, CACHE_SIZE)
+    async with redis.pipeline(transaction=True) as pipe:
+        if page["messages"]:
+            pipe.zadd(key, {_member(m): m["message_id"] for m in page["messages"]})
+            pipe.zremrangebyrank(key, 0, -CACHE_SIZE - 1)
+            pipe.expire(key, CACHE_TTL)
+        pipe.set(f"{key}:full", 1, ex=CACHE_TTL)
+        await pipe.execute()
+    return page
+
+
+def remember(pipe, conv_id: str, msg: dict) -> None:
+    """Queue the cache update for a new message on a (sync or async) pipeline."""
+    key = f"{KEY_PREFIX}{conv_id}"
+    pipe.zadd(key, {_member(msg): msg["message_id"]})
+    pipe.zremrangebyrank(key, 0, -CACHE_SIZE - 1)
+    pipe.expire(key, CACHE_TTL)
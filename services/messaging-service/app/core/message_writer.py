@@ -0,0 +1,169 @@
+"""
+Group-commit writer for marketplace_messages.
+
+One INSERT + COMMIT per chat message makes Postgres commit latency (WAL
+fsync) the throughput ceiling. The writer instead collects the messages
+that arrive within MESSAGE_WRITER_WINDOW_MS of each other — or up to
+MESSAGE_WRITER_MAX_BATCH — and writes them with a single statement:
+
+    sender A ─┐
+    sender B ─┼─► queue ──► INSERT ... SELECT FROM unnest(...) WITH ORDINALITY
+    sender C ─┘                RETURNING message_id, sent_at  (by ordinal)
+                               COMMIT  ──► resolve A, B, C
+
+Postgres doesn't promise RETURNING order, nor that sequence values follow
+VALUES order, so each row's message_id is drawn next to its ordinal in a
+CTE and the returned rows are joined back to that ordinal.
+
+Durability is unchanged: save() only returns after the COMMIT that
+contains its row, exactly like the single-row path. If the batch fails
+(e.g. one row violates a constraint) the rows are retried one by one so
+only the offending sender sees the error.
+
+Latency cost: at most one window (a few ms) while the previous batch is
+committing; an idle writer flushes a lone message immediately.
+
+close() fails every save() still waiting with MessageWriterClosed.
+"""
+
+import asyncio
+import os
+
+import structlog
+from sqlalchemy import text
+
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import message_writer_batch_size, message_writer_flush_seconds
+
+log = structlog.get_logger()
+
+WINDOW_MS = float(os.getenv("MESSAGE_WRITER_WINDOW_MS", 5))
+MAX_BATCH = int(os.getenv("MESSAGE_WRITER_MAX_BATCH", 200))
+
+_INSERT_BATCH = text("""
+    WITH input AS (
+        SELECT nextval(pg_get_serial_sequence('marketplace_messages', 'message_id')) AS message_id,
+               t.*
+        FROM unnest(CAST(:senders AS varchar[]), CAST(:receivers AS varchar[]),
+                    CAST(:items AS int[]), CAST(:texts AS text[]))
+             WITH ORDINALITY AS t(sender_id, receiver_id, item_id, message_text, ord)
+    ), ins AS (
+        INSERT INTO marketplace_messages
+            (message_id, sender_id, receiver_id, item_id, message_text, sent_at)
+        SELECT message_id, sender_id, receiver_id, item_id, message_text, NOW()
+        FROM input
+        RETURNING message_id, sent_at
+    )
+    SELECT ins.message_id, ins.sent_at
+    FROM ins JOIN input USING (message_id)
+    ORDER BY input.ord
+""")
+
+
+class MessageWriterClosed(Exception):
+    """The writer shut down before this message was written."""
+
+
+class MessageWriter:
+    def __init__(self, session_factory=AsyncSessionLocal,
+                 window_ms: float = WINDOW_MS, max_batch: int = MAX_BATCH):
+        self._session_factory = session_factory
+        self._window = window_ms / 1000
+        self._max_batch = max_batch
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def save(self, sender_id: str, receiver_id: str, item_id: int, body: str) -> dict:
+        """Persist one message; returns once it is committed."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        row = {"sender_id": sender_id, "receiver_id": receiver_id,
+               "item_id": item_id, "message_text": body}
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, fut))
+        return await fut
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            _row, fut = self._queue.get_nowait()
+            _settle(fut, exc=MessageWriterClosed())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: list = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self._window
+                while len(batch) < self._max_batch:
+                    # Whatever queued up during the previous commit goes in without waiting
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._flush(batch)
+        except asyncio.CancelledError:
+            # Senders of the batch being collected or written when close() hit
+            for _row, fut in batch:
+                _settle(fut, exc=MessageWriterClosed())
+            raise
+
+    async def _flush(self, batch: list) -> None:
+        t0 = asyncio.get_running_loop().time()
+        try:
+            results = await self._insert([row for row, _ in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                _settle(batch[0][1], exc=exc)
+                return
+            log.warning("message_batch_failed", size=len(batch), error=str(exc))
+            for item in batch:
+                await self._flush([item])
+            return
+        message_writer_batch_size.observe(len(batch))
+        message_writer_flush_seconds.observe(asyncio.get_running_loop().time() - t0)
+        for (row, fut), (message_id, sent_at) in zip(batch, results):
+            _settle(fut, result={
+                "message_id": message_id,
+                "sender_id": row["sender_id"],
+                "receiver_id": row["receiver_id"],
+                "item_id": row["item_id"],
+                "text": row["message_text"],
+                "sent_at": str(sent_at),
+            })
+
+    async def _insert(self, rows: list[dict]) -> list[tuple]:
+        """(message_id, sent_at) per row, in the order of `rows`."""
+        params = {
+            "senders":   [r["sender_id"] for r in rows],
+            "receivers": [r["receiver_id"] for r in rows],
+            "items":     [r["item_id"] for r in rows],
+            "texts":     [r["message_text"] for r in rows],
+        }
+        async with self._session_factory() as db:
+            returned = (await db.execute(_INSERT_BATCH, params)).fetchall()
+            await db.commit()
+        return returned
+
+
+def _settle(fut: asyncio.Future, result=None, exc: BaseException | None = None) -> None:
+    if fut.done():   # sender went away (socket closed, task cancelled)
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+
+
+message_writer = MessageWriter()
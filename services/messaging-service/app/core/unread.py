@@ -0,0 +1,168 @@
+"""
+Unread message counters in Redis, pushed to clients over WebSocket.
+
+    electrohub:unread:{user_id}   hash   {item_id}:{other_user_id} → n
+                                         total                     → Σ n
+
+  - on_message():  +1 for the receiver's conversation and total, in one
+    Lua call. Only applied when the hash exists: a missing hash is rebuilt
+    from Postgres on the next read instead of starting from a partial count.
+  - mark_read():   one UPDATE for any number of conversations, then the
+    matching fields are removed and total is lowered by their sum.
+  - rebuild():     replaces the hash from the conversations table (the
+    source of truth). Run on a cache miss and every UNREAD_RECONCILE_S for
+    users connected to this replica, which also repairs drift from writers
+    that don't touch Redis (e.g. the backend's contact endpoint).
+
+Every change is published on the user's inbox channel; ConversationManager
+delivers it as {"type": "unread", ...} to the user's inbox WebSocket on
+whichever replica holds it, so the navbar badge no longer polls.
+
+Everything here is sync (Postgres + Redis round trips) — call it from
+the threadpool or an executor, not from the event loop.
+"""
+
+import json
+import os
+
+import structlog
+from sqlalchemy import text
+
+from app.core.connection_manager import manager
+from app.core.database import SessionLocal
+from app.core.redis_client import get_redis_client
+
+log = structlog.get_logger()
+
+KEY_PREFIX    = "electrohub:unread:"
+UNREAD_TTL    = int(os.getenv("UNREAD_TTL_S", 86_400))
+RECONCILE_S   = int(os.getenv("UNREAD_RECONCILE_S", 300))
+
+_INCR = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return false end
+local n = redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+local total = redis.call('HINCRBY', KEYS[1], 'total', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return {n, total}
+"""
+
+_CLEAR = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return false end
+local cleared = 0
+for _, field in ipairs(ARGV) do
+    local n = tonumber(redis.call('HGET', KEYS[1], field) or '0')
+    if n > 0 then
+        redis.call('HDEL', KEYS[1], field)
+        cleared = cleared + n
+    end
+end
+return math.max(redis.call('HINCRBY', KEYS[1], 'total', -cleared), 0)
+"""
+
+
+def _key(user_id: str) -> str:
+    return f"{KEY_PREFIX}{user_id}"
+
+
+def _field(item_id: int, other_user_id: str) -> str:
+    return f"{item_id}:{other_user_id}"
+
+
+def total(user_id: str) -> int:
+    value = get_redis_client().hget(_key(user_id), "total")
+    if value is None:
+        return rebuild(user_id)
+    return max(int(value), 0)
+
+
+def on_message(msg: dict) -> None:
+    """Count a new message for its receiver and push the new badge value."""
+    receiver, sender = msg["receiver_id"], msg["sender_id"]
+    if receiver == sender:
+        return
+    try:
+        res = get_redis_client().eval(
+            _INCR, 1, _key(receiver), _field(msg["item_id"], sender), UNREAD_TTL)
+        new_total = int(res[1]) if res else rebuild(receiver)
+        _push(receiver, new_total, msg["item_id"], sender, int(res[0]) if res else None)
+    except Exception as exc:
+        log.warning("unread_increment_failed", user=receiver, error=str(exc))
+
+
+def mark_read(user_id: str, conversations: list[tuple[int, str]]) -> int:
+    """
+    Mark every message addressed to user_id in the given (item_id,
+    other_user_id) conversations as read. Returns the updated row count.
+    """
+    if not conversations:
+        return 0
+    db = SessionLocal()
+    try:
+        # The conversations trigger moves the Postgres counters in the same transaction
+        result = db.execute(text("""
+            UPDATE marketplace_messages m SET is_read = true
+            FROM unnest(CAST(:items AS int[]), CAST(:others AS varchar[])) AS t(item_id, other_id)
+            WHERE m.item_id = t.item_id
+              AND LEAST(m.sender_id, m.receiver_id) = LEAST(:uid, t.other_id)
+              AND GREATEST(m.sender_id, m.receiver_id) = GREATEST(:uid, t.other_id)
+              AND m.receiver_id = :uid
+              AND m.is_read = false
+        """), {
+            "uid": user_id,
+            "items": [item_id for item_id, _ in conversations],
+            "others": [other for _, other in conversations],
+        })
+        db.commit()
+    finally:
+        db.close()
+
+    try:
+        res = get_redis_client().eval(
+            _CLEAR, 1, _key(user_id), *(_field(i, o) for i, o in conversations))
+        new_total = int(res) if res is not None else rebuild(user_id)
+        for item_id, other in conversations:
+            _push(user_id, new_total, item_id, other, 0)
+    except Exception as exc:
+        log.warning("unread_clear_failed", user=user_id, error=str(exc))
+    return result.rowcount
+
+
+def rebuild(user_id: str) -> int:
+    """Replace the user's hash from the conversations table. Returns total."""
+    db = SessionLocal()
+    try:
+        rows = db.execute(text("""
+            SELECT item_id, user_b, unread_a FROM conversations
+            WHERE user_a = :uid AND unread_a > 0
+            UNION ALL
+            SELECT item_id, user_a, unread_b FROM conversations
+            WHERE user_b = :uid AND unread_b > 0
+        """), {"uid": user_id}).fetchall()
+    finally:
+        db.close()
+
+    fields = {_field(r[0], r[1]): int(r[2]) for r in rows}
+    fields["total"] = sum(fields.values())
+    pipe = get_redis_client().pipeline(transaction=True)
+    pipe.delete(_key(user_id))
+    pipe.hset(_key(user_id), mapping=fields)
+    pipe.expire(_key(user_id), UNREAD_TTL)
+    pipe.execute()
+    return fields["total"]
+
+
+def reconcile(user_ids: list[str]) -> None:
+    for user_id in user_ids:
+        try:
+            _push(user_id, rebuild(user_id))
+        except Exception as exc:
+            log.warning("unread_reconcile_failed", user=user_id, error=str(exc))
+
+
+def _push(user_id: str, new_total: int, item_id: int | None = None,
+          other_user_id: str | None = None, conversation_unread: int | None = None) -> None:
+    frame = {"type": "unread", "unread": new_total}
+    if item_id is not None:
+        frame["conversation"] = {"item_id": item_id, "other_user_id": other_user_id,
+                                 "unread": conversation_unread}
+    get_redis_client().publish(manager.channel(manager.inbox_id(user_id)), json.dumps(frame))
@@ -0,0 +1,72 @@
+"""
+WebSocket frame encodings for chat.
+
+Negotiated per socket through Sec-WebSocket-Protocol:
+
+    electrohub.msgpack.v1   binary frames, msgpack, short field tags
+    (none / anything else)  text frames, JSON with full field names (default)
+
+msgpack frames use the short tags in TAGS for keys at every level, e.g.
+
+    {"type": "message", "message_id": 812, "sender_id": "user_000003", ...}
+    → {"t": "message", "i": 812, "s": "user_000003", ...}
+
+A binary frame is either one such map or — when several messages were
+coalesced — an array of maps. Clients send maps with the same tags.
+"""
+
+import msgpack
+
+SUBPROTOCOL_MSGPACK = "electrohub.msgpack.v1"
+
+TAGS = {
+    "type":            "t",
+    "message_id":      "i",
+    "sender_id":       "s",
+    "receiver_id":     "r",
+    "item_id":         "k",
+    "text":            "x",
+    "sent_at":         "a",
+    "is_read":         "d",
+    "messages":        "m",
+    "next_cursor":     "c",
+    "before":          "b",
+    "unread":          "u",
+    "conversation":    "v",
+    "other_user_id":   "o",
+}
+_LONG = {short: long for long, short in TAGS.items()}
+
+
+def negotiate(requested: list[str]) -> str | None:
+    """The subprotocol to accept from the client's offer, if any."""
+    return SUBPROTOCOL_MSGPACK if SUBPROTOCOL_MSGPACK in requested else None
+
+
+def _shorten(value):
+    if isinstance(value, dict):
+        return {TAGS.get(k, k): _shorten(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_shorten(v) for v in value]
+    return value
+
+
+def _expand(value):
+    if isinstance(value, dict):
+        return {_LONG.get(k, k): _expand(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_expand(v) for v in value]
+    return value
+
+
+def pack(message: dict) -> bytes:
+    return msgpack.packb(_shorten(message), use_bin_type=True)
+
+
+def unpack(data: bytes) -> dict:
+    return _expand(msgpack.unpackb(data, raw=False))
+
+
+def pack_batch(frames: list[bytes]) -> bytes:
+    """Coalesce already-packed maps into one array frame without re-encoding."""
+    return msgpack.Packer().pack_array_header(len(frames)) + b"".join(frames)
@@ -6,22 +6,45 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.exceptions import ElectroHubException, electrohub_exception_handler, unhandled_exception_handler
 from app.core.logging_config import configure_logging, request_logging_middleware
+from app.core.metrics import setup_metrics
 from app.api.messages import router as messages_router
 
 configure_logging()
 
 
+async def _reconcile_unread() -> None:
+    """Periodically rebuild Redis unread counters of locally connected users."""
+    from app.core import unread
+    from app.core.presence import presence
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(unread.RECONCILE_S)
+        await loop.run_in_executor(None, unread.reconcile, presence.local_users())
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Background task: Redis fan-out subscriber for WebSocket multi-instance delivery
     from app.core.connection_manager import redis_fanout_subscriber
-    fan_task = asyncio.create_task(redis_fanout_subscriber())
+    from app.core.presence import presence
+    tasks = [
+        asyncio.create_task(redis_fanout_subscriber()),
+        # Keeps presence keys of locally connected users from expiring
+        asyncio.create_task(presence.run_heartbeat()),
+        asyncio.create_task(_reconcile_unread()),
+    ]
     yield
-    fan_task.cancel()
-    try:
-        await fan_task
-    except asyncio.CancelledError:
-        pass
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    from app.core.message_writer import message_writer
+    await message_writer.close()
+    # Flush buffered notification jobs and Kafka batches before the process exits
+    from app.core.rabbitmq_client import shutdown_publisher
+    from app.core.kafka_client import get_event_producer
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, shutdown_publisher)
+    await loop.run_in_executor(None, get_event_producer().flush)
 
 
 app = FastAPI(title="ElectroHub — Messaging Service", lifespan=lifespan)
@@ -34,6 +57,7 @@ app.add_middleware(CORSMiddleware,
     allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
 app.middleware("http")(request_logging_middleware)
+setup_metrics(app)
 app.include_router(messages_router)
 
 
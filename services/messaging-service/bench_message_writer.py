@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+bench_message_writer.py — chat message write throughput, one INSERT + COMMIT
+per message vs. the group-commit MessageWriter.
+
+Run inside Docker:
+    docker exec electrohub-messaging-service python3 bench_message_writer.py
+    docker exec electrohub-messaging-service python3 bench_message_writer.py --senders 500 --messages 20
+
+N concurrent senders (one per simulated chat) each write M messages back to
+back. Rows are tagged with a bench_ sender id and deleted afterwards.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.core.database import AsyncSessionLocal, async_engine
+from app.core.message_writer import MessageWriter
+
+_INSERT = text("""
+    INSERT INTO marketplace_messages
+        (sender_id, receiver_id, item_id, message_text, sent_at)
+    VALUES (:sender, :receiver, :item_id, :msg, NOW())
+    RETURNING message_id, sent_at
+""")
+
+
+async def _single_row(sender: str, receiver: str, item_id: int, body: str) -> None:
+    async with AsyncSessionLocal() as db:
+        (await db.execute(_INSERT, {
+            "sender": sender, "receiver": receiver, "item_id": item_id, "msg": body,
+        })).one()
+        await db.commit()
+
+
+async def _run(save, senders: int, messages: int, users: list, item_id: int, tag: str) -> float:
+    a, b = users
+
+    async def chat(i: int) -> None:
+        for n in range(messages):
+            await save(a, b, item_id, f"{tag} chat {i} message {n}")
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(chat(i) for i in range(senders)))
+    return senders * messages / (time.perf_counter() - t0)
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--senders", type=int, default=200)
+    ap.add_argument("--messages", type=int, default=10)
+    args = ap.parse_args()
+
+    tag = f"[bench {uuid.uuid4().hex[:8]}]"
+    async with async_engine.connect() as conn:
+        users = (await conn.execute(text(
+            "SELECT user_id FROM user_accounts LIMIT 2"
+        ))).scalars().all()
+        item_id = (await conn.execute(text(
+            "SELECT item_id FROM marketplace_items LIMIT 1"
+        ))).scalar_one()
+
+    writer = MessageWriter()
+    try:
+        single = await _run(_single_row, args.senders, args.messages, users, item_id, tag)
+        grouped = await _run(writer.save, args.senders, args.messages, users, item_id, tag)
+    finally:
+        await writer.close()
+        async with AsyncSessionLocal() as db:
+            await db.execute(text(
+                "DELETE FROM marketplace_messages WHERE message_text LIKE :tag"
+            ), {"tag": f"{tag}%"})
+            await db.commit()
+        await async_engine.dispose()
+
+    print(f"{args.senders} senders × {args.messages} messages")
+    print(f"  single-row commits : {single:9.0f} msg/s")
+    print(f"  group commit       : {grouped:9.0f} msg/s  ({grouped / single:.1f}×)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,13 +1,102 @@
+"""
+Email dispatch for notification-service.
+
+Sending path:
+  send_contact_email() / queue_message_notification()
+      → precompiled string.Template → MIMEText
+      → SmtpPool (app.core.smtp_pool): rate limited to SMTP_RATE_PER_SEC,
+        ≤ SMTP_POOL_SIZE sessions, each STARTTLS + login once, recycled
+        after SMTP_MAX_PER_SESSION messages
+
+Digest coalescing:
+  "New message" notifications are held per seller for EMAIL_DIGEST_WINDOW_S.
+  One notification in the window → a normal email; several → one digest.
+  A chatty buyer therefore costs the seller one email per window, not one
+  per message. queue_message_notification() returns a Future that settles
+  when the email carrying that notification has been sent or has failed;
+  the RabbitMQ consumer acks the job (or routes it to retry) only then, so
+  a crash or an SMTP error never loses a buffered notification. At most
+  EMAIL_DIGEST_MAX_HELD notifications are held at once — past that the
+  oldest recipient is flushed early — and flush_digests() sends everything
+  held right away, for a caller that has run out of room to wait.
+
+In dev: leave SMTP_HOST empty and emails are logged instead of sent.
+For a local stand-in: `python -m aiosmtpd -n -l localhost:8025` with
+SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=false SMTP_USER= .
+"""
+
+import heapq
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.mime.text import MIMEText
+from string import Template
+
 import structlog
 
+from app.core.smtp_pool import SmtpPool
+
 log = structlog.get_logger()
 
 SMTP_HOST = os.getenv("SMTP_HOST", "")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_USER = os.getenv("SMTP_USER", "")
 SMTP_PASS = os.getenv("SMTP_PASS", "")
+SMTP_FROM = os.getenv("SMTP_FROM", SMTP_USER or "notifications@electrohub.local")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+
+SMTP_POOL_SIZE       = int(os.getenv("SMTP_POOL_SIZE", 4))
+SMTP_RATE_PER_SEC    = float(os.getenv("SMTP_RATE_PER_SEC", 10))
+SMTP_MAX_PER_SESSION = int(os.getenv("SMTP_MAX_PER_SESSION", 100))
+SMTP_IDLE_CHECK_S    = float(os.getenv("SMTP_IDLE_CHECK_S", 30))
+SMTP_TIMEOUT_S       = float(os.getenv("SMTP_TIMEOUT_S", 10))
+DIGEST_WINDOW_S      = float(os.getenv("EMAIL_DIGEST_WINDOW_S", 30))
+DIGEST_MAX_HELD      = int(os.getenv("EMAIL_DIGEST_MAX_HELD", 512))
+
+# ── Templates (parsed once at import) ─────────────────────────────────────── #
+
+_CONTACT_SUBJECT = Template("[ElectroHub] New message: $subject")
+_CONTACT_BODY = Template("Item: $item_id\nFrom buyer: $buyer_id\n\n$subject\n\n$message")
+
+_DIGEST_SUBJECT = Template("[ElectroHub] $count new messages")
+_DIGEST_LINE = Template("- Item $item_id, from buyer $buyer_id: $preview")
+_DIGEST_BODY = Template(
+    "You have $count new messages on ElectroHub:\n\n$lines\n\n"
+    "Reply at http://localhost:3000/messages"
+)
+
+
+def _build(to: str, subject: str, body: str) -> MIMEText:
+    msg = MIMEText(body)
+    msg["Subject"] = subject
+    msg["From"] = SMTP_FROM
+    msg["To"] = to
+    return msg
+
 
+_pool = SmtpPool(
+    SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS,
+    starttls=SMTP_STARTTLS, size=SMTP_POOL_SIZE, rate=SMTP_RATE_PER_SEC,
+    max_per_session=SMTP_MAX_PER_SESSION, idle_check_s=SMTP_IDLE_CHECK_S,
+    timeout_s=SMTP_TIMEOUT_S,
+)
+
+
+def _deliver(to: str, subject: str, body: str, **log_fields) -> bool:
+    if not SMTP_HOST:
+        log.info("email_simulated", to=to, subject=subject, **log_fields)
+        return True
+    try:
+        _pool.send(_build(to, subject, body))
+        log.info("email_sent", to=to, **log_fields)
+        return True
+    except Exception as exc:
+        log.error("email_failed", to=to, error=str(exc), **log_fields)
+        return False
+
+
+# ── Public API ────────────────────────────────────────────────────────────── #
 
 def send_contact_email(seller_id: str, buyer_id: str, item_id: int,
                        subject: str, message: str) -> bool:
@@ -16,26 +105,130 @@ def send_contact_email(seller_id: str, buyer_id: str, item_id: int,
     In dev: logs the email payload instead of actually sending.
     In prod: configure SMTP_HOST/USER/PASS env vars.
     """
-    if not SMTP_HOST:
-        log.info("email_simulated",
-                 to_seller=seller_id, from_buyer=buyer_id,
-                 item=item_id, subject=subject)
-        return True
+    return _deliver(
+        to=seller_id,  # in production, look up email from user-service
+        subject=_CONTACT_SUBJECT.substitute(subject=subject),
+        body=_CONTACT_BODY.substitute(item_id=item_id, buyer_id=buyer_id,
+                                      subject=subject, message=message),
+        seller=seller_id, item=item_id,
+    )
+
 
+class EmailDeliveryError(Exception):
+    """The email carrying a buffered notification could not be sent."""
+
+
+class _DigestBuffer:
+    """
+    Holds "new message" notifications per recipient for `window` seconds,
+    or less once `max_held` are waiting. One flusher thread walks a
+    deadline heap; deliveries run on a small executor so a slow relay never
+    delays the next window.
+    """
+
+    def __init__(self, window: float, max_held: int):
+        self._window = window
+        self._max_held = max_held
+        self._held = 0
+        self._pending: dict[str, list[tuple[dict, Future]]] = {}
+        self._deadlines: list[tuple[float, str]] = []
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=SMTP_POOL_SIZE,
+                                            thread_name_prefix="email-digest")
+        threading.Thread(target=self._run, name="email-digest-flusher", daemon=True).start()
+
+    def add(self, to: str, note: dict) -> Future:
+        delivered: Future = Future()
+        with self._cond:
+            entries = self._pending.setdefault(to, [])
+            entries.append((note, delivered))
+            self._held += 1
+            if len(entries) == 1:
+                heapq.heappush(self._deadlines, (time.monotonic() + self._window, to))
+            if len(entries) == 1 or self._held >= self._max_held:
+                self._cond.notify()
+        return delivered
+
+    def flush_all(self) -> None:
+        for to, entries in self._take_all().items():
+            _flush(to, entries)
+
+    def flush_soon(self) -> None:
+        for to, entries in self._take_all().items():
+            self._executor.submit(_flush, to, entries)
+
+    def _take_all(self) -> dict[str, list[tuple[dict, Future]]]:
+        with self._cond:
+            pending, self._pending = self._pending, {}
+            self._deadlines.clear()
+            self._held = 0
+        return pending
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._deadlines:
+                    self._cond.wait()
+                deadline, to = self._deadlines[0]
+                wait = deadline - time.monotonic()
+                if wait > 0 and self._held < self._max_held:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._deadlines)
+                entries = self._pending.pop(to, [])
+                self._held -= len(entries)
+            if entries:
+                self._executor.submit(_flush, to, entries)
+
+
+def _flush(to: str, entries: list[tuple[dict, Future]]) -> None:
     try:
-        import smtplib
-        from email.mime.text import MIMEText
-        body = f"Item: {item_id}\nFrom buyer: {buyer_id}\n\n{subject}\n\n{message}"
-        msg = MIMEText(body)
-        msg["Subject"] = f"[ElectroHub] New message: {subject}"
-        msg["From"] = SMTP_USER
-        msg["To"] = seller_id  # in production, look up email from user-service
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
-        log.info("email_sent", seller=seller_id, item=item_id)
-        return True
+        sent = _send_digest(to, [note for note, _ in entries])
+        error = None if sent else EmailDeliveryError(f"email to {to} failed")
     except Exception as exc:
-        log.error("email_failed", error=str(exc))
-        return False
+        error = exc
+    for _, delivered in entries:
+        if error is None:
+            delivered.set_result(True)
+        else:
+            delivered.set_exception(error)
+
+
+def _send_digest(to: str, notes: list[dict]) -> bool:
+    if len(notes) == 1:
+        n = notes[0]
+        return send_contact_email(seller_id=to, buyer_id=n["buyer_id"], item_id=n["item_id"],
+                                  subject="New message", message=n["preview"])
+    lines = "\n".join(_DIGEST_LINE.substitute(n) for n in notes)
+    return _deliver(
+        to=to,
+        subject=_DIGEST_SUBJECT.substitute(count=len(notes)),
+        body=_DIGEST_BODY.substitute(count=len(notes), lines=lines),
+        digest_size=len(notes),
+    )
+
+
+_digest = _DigestBuffer(DIGEST_WINDOW_S, DIGEST_MAX_HELD)
+
+
+def queue_message_notification(seller_id: str, buyer_id: str, item_id: int,
+                               preview: str, seller_email: str = "") -> Future:
+    """
+    Buffer a "new message" email; coalesced per seller within the digest
+    window. The returned Future fails with EmailDeliveryError if the email
+    carrying it could not be sent.
+    """
+    return _digest.add(seller_email or seller_id, {
+        "buyer_id": buyer_id, "item_id": item_id, "preview": (preview or "")[:100],
+    })
+
+
+def flush_digests() -> None:
+    """Send every buffered notification now instead of at its window's end."""
+    _digest.flush_soon()
+
+
+def shutdown() -> None:
+    """Send whatever is still buffered and close pooled SMTP sessions."""
+    _digest.flush_all()
+    _pool.close()
@@ -1,63 +1,71 @@
 """
-Redis Pub/Sub subscriber — listens to events from all other services.
-Runs as an asyncio loop inside notification-service.
+Event subscriber — listens to events from all other services.
+Runs as an asyncio task inside notification-service.
+
+Two transports (EVENT_TRANSPORT):
+  streams  (default) Redis Streams consumer group "notification-service".
+           Events published while this service restarts are picked up
+           afterwards, and replicas share the load (app.core.event_stream).
+  pubsub   the original fire-and-forget Redis Pub/Sub channels
+           (push-based, see app.core.redis_subscriber).
 """
 
 import asyncio
 import json
+import os
+from concurrent.futures import Future
+
 import structlog
-from app.core.redis_client import get_redis_client
-from app.handlers.email_handler import send_contact_email
+from app.core.event_stream import StreamConsumer
+from app.core.metrics import notifications_suppressed
+from app.core.presence import presence
+from app.core.redis_subscriber import AsyncRedisSubscriber
+from app.handlers.email_handler import queue_message_notification
 
 log = structlog.get_logger()
 
-CHANNELS = [
-    "electrohub:events:message_sent",
-    "electrohub:events:item_saved",
-    "electrohub:events:item_listed",
-]
+EVENT_TRANSPORT = os.getenv("EVENT_TRANSPORT", "streams")
+
+EVENTS = ["message_sent", "item_saved", "item_listed"]
+
+CHANNELS = [f"electrohub:events:{e}" for e in EVENTS]
 
 
 async def subscribe_loop():
-    redis = get_redis_client()
-    pubsub = redis.pubsub()
-    pubsub.subscribe(*CHANNELS)
-    log.info("pubsub_subscribed", channels=CHANNELS)
-
-    while True:
-        try:
-            msg = pubsub.get_message(ignore_subscribe_messages=True, timeout=0.05)
-            if msg:
-                await _dispatch(msg)
-        except asyncio.CancelledError:
-            pubsub.unsubscribe()
-            return
-        except Exception as exc:
-            log.error("pubsub_error", error=str(exc))
-        await asyncio.sleep(0.01)
-
-
-async def _dispatch(msg: dict):
-    try:
-        channel = msg.get("channel", b"")
-        if isinstance(channel, bytes):
-            channel = channel.decode()
-        data = json.loads(msg["data"])
-        short = channel.split(":")[-1]
-        log.info("event_received", channel=short, data=data)
-
-        if short == "message_sent":
-            send_contact_email(
-                seller_id=data.get("seller_id"),
-                buyer_id=data.get("buyer_id"),
-                item_id=data.get("item_id"),
-                subject=data.get("subject", "Marketplace message"),
-                message=data.get("message", ""),
-            )
-        elif short == "item_listed":
-            log.info("item_listed_event", seller=data.get("seller_id"), item=data.get("item_id"))
-        elif short == "item_saved":
-            log.info("item_saved_event", user=data.get("user_id"), item=data.get("item_id"))
+    if EVENT_TRANSPORT == "pubsub":
+        await AsyncRedisSubscriber("notification_events", _on_pubsub, channels=CHANNELS).run()
+    else:
+        await StreamConsumer("notification-service", EVENTS, _handle).run()
 
+
+async def _on_pubsub(channel: str, raw: str):
+    try:
+        await _handle(channel.split(":")[-1], json.loads(raw))
     except Exception as exc:
         log.error("event_dispatch_error", error=str(exc))
+
+
+async def _handle(event: str, data: dict) -> Future | None:
+    """
+    Raises on failure so the stream consumer leaves the entry pending. A
+    buffered notification is returned as its delivery Future: the stream
+    consumer acks the entry only once the email has actually been sent.
+    """
+    log.info("event_received", channel=event, data=data)
+
+    if event == "message_sent":
+        # Presence reads are sync Redis round trips — keep them off the loop
+        if await asyncio.to_thread(presence.is_online, data.get("seller_id")):
+            notifications_suppressed.labels(service="notification").inc()
+            return None
+        return queue_message_notification(
+            seller_id=data.get("seller_id"),
+            buyer_id=data.get("buyer_id"),
+            item_id=data.get("item_id"),
+            preview=data.get("message", ""),
+        )
+    elif event == "item_listed":
+        log.info("item_listed_event", seller=data.get("seller_id"), item=data.get("item_id"))
+    elif event == "item_saved":
+        log.info("item_saved_event", user=data.get("user_id"), item=data.get("item_id"))
+    return None
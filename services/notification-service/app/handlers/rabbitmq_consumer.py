@@ -2,84 +2,353 @@
 RabbitMQ consumer — runs inside notification-service.
 
 Pulls jobs from the durable `electrohub.notifications` queue and
-processes them. If the handler fails, the message is nacked and
-requeued (RabbitMQ retries it when the service restarts).
+processes them on a worker pool.
 
 This is the correct use of RabbitMQ:
   - Guaranteed delivery (message survives service crash)
   - One job processed by exactly one worker
   - Easy to scale: add more notification-service replicas,
     RabbitMQ distributes jobs across all of them
+
+Concurrency:
+  The pika connection lives on one thread (pika is not thread-safe).
+  Up to NOTIFICATION_PREFETCH unacked jobs are delivered at once and
+  handed to a ThreadPoolExecutor of NOTIFICATION_WORKERS threads. Results
+  come back to the connection thread via add_callback_threadsafe().
+
+Batched acks:
+  Jobs finish out of order, but `basic_ack(multiple=True)` can only settle
+  a contiguous prefix of delivery tags. Finished tags are collected and
+  the longest finished prefix is acked once NOTIFICATION_ACK_BATCH jobs
+  are ready, when nothing is left in flight, or on a short flush timer.
+
+Held jobs:
+  A "message_received" job is done only once the digest email carrying it
+  has been sent (email_handler), up to EMAIL_DIGEST_WINDOW_S later. It
+  stays unacked until then, and a failed send takes the retry path below
+  like any other failure. Held jobs are kept out of the prefix tracking
+  and acked one by one as their email goes out; the batched ack stops
+  just below the oldest held job and catches up once it is settled. Once
+  NOTIFICATION_MAX_HELD jobs are held, the digests are flushed early so
+  held jobs never take over the prefetch window.
+
+Failures — bounded retries instead of requeue hot-loops:
+  A failed job is acked and re-published to the dead-letter exchange:
+
+    electrohub.notifications.dlx ──retry.5s──►  retry.5s queue  (TTL 5s)  ─┐
+                                 ──retry.30s──► retry.30s queue (TTL 30s) ─┤ dead-letter
+                                 ──retry.300s─► retry.300s queue (TTL 5m) ─┘ back to main
+                                 ──dead──────►  electrohub.notifications.dead
+
+  Each hop increments the `x-retry-count` header. Once every delay tier has
+  been used, or the body is not valid JSON, the job is parked in the dead
+  queue for inspection. The channel is in publisher-confirm mode and the
+  original is acked only after the broker confirms the re-publish; if it
+  doesn't, the original is rejected back onto the queue instead. The main
+  queue's arguments are unchanged, so it stays compatible with the declare
+  in rabbitmq_client.
 """
 
 import json
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import structlog
 
+from app.core.metrics import (
+    notification_jobs, notification_job_seconds, notification_jobs_in_progress,
+    notifications_suppressed,
+)
+from app.core.presence import presence
+from app.handlers.email_handler import flush_digests, queue_message_notification
+
 log = structlog.get_logger()
 
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
 RABBITMQ_USER = os.getenv("RABBITMQ_USER", "guest")
 RABBITMQ_PASS = os.getenv("RABBITMQ_PASS", "guest")
 QUEUE_NAME    = "electrohub.notifications"
+DLX_NAME      = f"{QUEUE_NAME}.dlx"
+DEAD_QUEUE    = f"{QUEUE_NAME}.dead"
 
+PREFETCH_COUNT = int(os.getenv("NOTIFICATION_PREFETCH", 64))
+WORKER_COUNT   = int(os.getenv("NOTIFICATION_WORKERS", 16))
+ACK_BATCH      = int(os.getenv("NOTIFICATION_ACK_BATCH", 32))
+ACK_FLUSH_S    = float(os.getenv("NOTIFICATION_ACK_FLUSH_MS", 50)) / 1000
+MAX_HELD       = int(os.getenv("NOTIFICATION_MAX_HELD", PREFETCH_COUNT // 2))
+RETRY_DELAYS_S = [int(s) for s in os.getenv("NOTIFICATION_RETRY_DELAYS", "5,30,300").split(",")]
 
-def _handle(ch, method, properties, body):
-    try:
-        job = json.loads(body)
-        jtype = job.get("type")
-        log.info("notification_job_received", type=jtype, job=job)
-
-        if jtype == "message_received":
-            _handle_message_received(job)
-        elif jtype == "item_sold":
-            _handle_item_sold(job)
-        else:
-            log.warning("unknown_notification_type", type=jtype)
 
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+class PoisonMessage(Exception):
+    """Job can never succeed (e.g. undecodable body) — skip the retries."""
 
-    except Exception as exc:
-        log.error("notification_job_failed", error=str(exc))
-        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
 
+# ── Job handlers ──────────────────────────────────────────────────────────── #
 
-def _handle_message_received(job: dict):
+def _handle_message_received(job: dict) -> Future | None:
     seller_id = job.get("seller_id")
     buyer_id  = job.get("buyer_id")
     item_id   = job.get("item_id")
     preview   = job.get("preview", "")
+    # Re-checked here: the seller may have opened the chat since the job was queued
+    if presence.is_online(seller_id):
+        notifications_suppressed.labels(service="notification").inc()
+        return None
     log.info("email_notification",
              to=seller_id, from_buyer=buyer_id,
              item=item_id, preview=preview[:50])
-    # In production: send email via SMTP / SendGrid / SES
+    return queue_message_notification(
+        seller_id=seller_id, buyer_id=buyer_id, item_id=item_id,
+        preview=preview, seller_email=job.get("seller_email", ""),
+    )
 
 
-def _handle_item_sold(job: dict):
+def _handle_item_sold(job: dict) -> None:
     log.info("item_sold_notification", seller=job.get("seller_id"),
              item=job.get("item_id"))
 
 
-def start_consuming():
-    """Blocking call — runs until process killed."""
-    import pika
-    import time
+_HANDLERS = {
+    "message_received": _handle_message_received,
+    "item_sold":        _handle_item_sold,
+}
 
-    while True:
-        try:
-            conn = pika.BlockingConnection(
-                pika.ConnectionParameters(
-                    host=RABBITMQ_HOST,
-                    credentials=pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASS),
-                    heartbeat=30,
+
+def _decode(body: bytes) -> dict:
+    try:
+        job = json.loads(body)
+    except ValueError as exc:
+        raise PoisonMessage(f"invalid JSON: {exc}") from exc
+    if not isinstance(job, dict):
+        raise PoisonMessage("job is not a JSON object")
+    return job
+
+
+def _job_type(job: dict) -> str:
+    """Metric label for `job` — unrecognised types share one label."""
+    jtype = job.get("type")
+    return jtype if jtype in _HANDLERS else "unknown"
+
+
+def _process(job: dict) -> Future | None:
+    """
+    Run one job on a worker thread. Returns a Future if the job only
+    completes once a buffered email is sent.
+    """
+    jtype = job.get("type")
+    handler = _HANDLERS.get(jtype)
+    if handler is None:
+        log.warning("unknown_notification_type", type=jtype)
+        return None
+
+    log.info("notification_job_received", type=jtype)
+    return handler(job)
+
+
+# ── Topology ──────────────────────────────────────────────────────────────── #
+
+def _retry_key(delay_s: int) -> str:
+    return f"retry.{delay_s}s"
+
+
+def _declare_topology(ch) -> None:
+    ch.queue_declare(queue=QUEUE_NAME, durable=True)
+    ch.exchange_declare(exchange=DLX_NAME, exchange_type="direct", durable=True)
+    for delay in RETRY_DELAYS_S:
+        retry_queue = f"{QUEUE_NAME}.{_retry_key(delay)}"
+        ch.queue_declare(queue=retry_queue, durable=True, arguments={
+            "x-message-ttl": delay * 1000,
+            "x-dead-letter-exchange": "",          # default exchange …
+            "x-dead-letter-routing-key": QUEUE_NAME,  # … back onto the main queue
+        })
+        ch.queue_bind(queue=retry_queue, exchange=DLX_NAME, routing_key=_retry_key(delay))
+    ch.queue_declare(queue=DEAD_QUEUE, durable=True)
+    ch.queue_bind(queue=DEAD_QUEUE, exchange=DLX_NAME, routing_key="dead")
+
+
+# ── Consumer ──────────────────────────────────────────────────────────────── #
+
+class NotificationConsumer:
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=WORKER_COUNT,
+                                        thread_name_prefix="notification-worker")
+        self._conn = None
+        self._ch = None
+        self._generation = 0                # bumps on reconnect; stale results are ignored
+        self._outstanding: dict[int, bool] = {}   # delivery_tag → finished
+        self._held: set[int] = set()              # delivery_tags waiting on an email
+        self._ack_upto = 0
+        self._ack_pending = 0
+
+    def run(self) -> None:
+        """Blocking call — runs until process killed."""
+        import pika
+
+        while True:
+            try:
+                self._conn = pika.BlockingConnection(
+                    pika.ConnectionParameters(
+                        host=RABBITMQ_HOST,
+                        credentials=pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASS),
+                        heartbeat=30,
+                    )
                 )
-            )
-            ch = conn.channel()
-            ch.queue_declare(queue=QUEUE_NAME, durable=True)
-            ch.basic_qos(prefetch_count=1)   # one job at a time per worker
-            ch.basic_consume(queue=QUEUE_NAME, on_message_callback=_handle)
-            log.info("rabbitmq_consumer_started", queue=QUEUE_NAME)
-            ch.start_consuming()
+                self._ch = self._conn.channel()
+                self._ch.confirm_delivery()
+                _declare_topology(self._ch)
+                self._ch.basic_qos(prefetch_count=PREFETCH_COUNT)
+                self._ch.basic_consume(queue=QUEUE_NAME, on_message_callback=self._on_message)
+
+                self._generation += 1
+                self._outstanding.clear()
+                self._held.clear()
+                self._ack_pending = 0
+                self._conn.call_later(ACK_FLUSH_S, self._on_flush_timer)
+
+                log.info("rabbitmq_consumer_started", queue=QUEUE_NAME,
+                         prefetch=PREFETCH_COUNT, workers=WORKER_COUNT)
+                self._ch.start_consuming()
+            except Exception as exc:
+                log.error("rabbitmq_consumer_error", error=str(exc))
+                time.sleep(5)   # retry connection on broker restart
+
+    # ── Connection thread ─────────────────────────────────────────────────── #
+
+    def _on_message(self, ch, method, properties, body) -> None:
+        tag = method.delivery_tag
+        self._outstanding[tag] = False
+        conn, gen = self._conn, self._generation
+
+        def _call(callback) -> None:
+            try:
+                conn.add_callback_threadsafe(callback)
+            except Exception:
+                pass   # connection already gone — broker will redeliver
+
+        def _done(future):
+            jtype, delivered, exc = future.result()
+            if delivered is None:
+                _call(lambda: self._settle(gen, tag, properties, body, jtype, exc))
+                return
+            # Held unacked until the buffered email has actually been sent
+            _call(lambda: self._hold(gen, tag))
+            delivered.add_done_callback(lambda d: _call(
+                lambda: self._settle(gen, tag, properties, body, jtype, d.exception(), held=True)))
+
+        notification_jobs_in_progress.inc()
+        self._pool.submit(self._timed_process, body).add_done_callback(_done)
+
+    @staticmethod
+    def _timed_process(body: bytes) -> tuple[str, Future | None, Exception | None]:
+        """(job type, delivery Future if held, error) — never raises."""
+        t0 = time.perf_counter()
+        jtype = "unknown"
+        try:
+            job = _decode(body)
+            jtype = _job_type(job)   # before the handler runs, so failures are labelled too
+            return jtype, _process(job), None
         except Exception as exc:
-            log.error("rabbitmq_consumer_error", error=str(exc))
-            time.sleep(5)   # retry connection on broker restart
+            return jtype, None, exc
+        finally:
+            notification_jobs_in_progress.dec()
+            notification_job_seconds.labels(type=jtype).observe(time.perf_counter() - t0)
+
+    def _hold(self, gen, tag) -> None:
+        if gen != self._generation:
+            return
+        del self._outstanding[tag]
+        self._held.add(tag)
+        if len(self._held) >= MAX_HELD:
+            flush_digests()
+        self._advance()
+
+    def _settle(self, gen, tag, properties, body, jtype, exc, held=False) -> None:
+        if gen != self._generation:
+            return
+        if exc is None:
+            notification_jobs.labels(type=jtype, outcome="ok").inc()
+        elif not self._route_failure(properties, body, jtype, exc):
+            # Re-publish not confirmed — put the original back rather than lose it
+            self._ch.basic_reject(delivery_tag=tag, requeue=True)
+            self._forget(tag, held)
+            return
+
+        if held:
+            self._held.discard(tag)
+            self._ch.basic_ack(delivery_tag=tag)
+        else:
+            self._outstanding[tag] = True
+        self._advance()
+
+    def _forget(self, tag, held) -> None:
+        if held:
+            self._held.discard(tag)
+        else:
+            del self._outstanding[tag]
+        self._advance()
+
+    def _advance(self) -> None:
+        """Extend the finished prefix, stopping below the oldest held job."""
+        floor = min(self._held, default=None)
+        while self._outstanding:
+            first = next(iter(self._outstanding))
+            if not self._outstanding[first] or (floor is not None and first > floor):
+                break
+            del self._outstanding[first]
+            self._ack_upto = first
+            self._ack_pending += 1
+
+        if self._ack_pending >= ACK_BATCH or not self._outstanding:
+            self._flush_acks()
+
+    def _route_failure(self, properties, body, jtype: str, exc: Exception) -> bool:
+        """Re-publish a failed job to the DLX; False if the broker didn't take it."""
+        import pika
+        from pika.exceptions import NackError, UnroutableError
+
+        headers = dict(properties.headers or {}) if properties else {}
+        attempt = int(headers.get("x-retry-count", 0))
+
+        if isinstance(exc, PoisonMessage) or attempt >= len(RETRY_DELAYS_S):
+            routing_key, outcome = "dead", "dead"
+        else:
+            routing_key, outcome = _retry_key(RETRY_DELAYS_S[attempt]), "retried"
+
+        headers.update({"x-retry-count": attempt + 1, "x-last-error": str(exc)[:200]})
+        try:
+            # Blocks until the broker confirms (confirm_delivery on the channel)
+            self._ch.basic_publish(
+                exchange=DLX_NAME,
+                routing_key=routing_key,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,
+                    content_type="application/json",
+                    headers=headers,
+                ),
+                mandatory=True,
+            )
+        except (UnroutableError, NackError) as publish_exc:
+            log.error("notification_retry_publish_failed", type=jtype,
+                      routed_to=routing_key, error=str(publish_exc))
+            return False
+        notification_jobs.labels(type=jtype, outcome=outcome).inc()
+        log.error("notification_job_failed", type=jtype, attempt=attempt + 1,
+                  routed_to=routing_key, error=str(exc))
+        return True
+
+    def _flush_acks(self) -> None:
+        if self._ack_pending:
+            self._ch.basic_ack(delivery_tag=self._ack_upto, multiple=True)
+            self._ack_pending = 0
+
+    def _on_flush_timer(self) -> None:
+        if self._ch is not None and self._ch.is_open:
+            self._flush_acks()
+            self._conn.call_later(ACK_FLUSH_S, self._on_flush_timer)
+
+
+def start_consuming():
+    """Blocking call — runs until process killed."""
+    NotificationConsumer().run()
@@ -1,11 +1,14 @@
 """
 Notification Service — no REST API, two concurrent consumers:
   1. RabbitMQ consumer  — persistent notification jobs (email, push)
-  2. Redis Pub/Sub      — lightweight system events (logging, analytics)
+  2. Redis Streams      — system events via a consumer group (Pub/Sub fallback)
   3. gRPC server        — direct calls from other services
+
+Prometheus metrics are served on METRICS_PORT (default 9105).
 """
 
 import asyncio
+import os
 import threading
 import grpc.aio
 import structlog
@@ -15,6 +18,8 @@ from app.core.logging_config import configure_logging
 configure_logging()
 log = structlog.get_logger()
 
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9105))
+
 
 def _run_rabbitmq_in_thread():
     """RabbitMQ uses blocking I/O — run in a separate thread."""
@@ -42,12 +47,19 @@ async def _serve_pubsub():
 async def main():
     log.info("notification_service_starting")
 
+    from app.core.metrics import start_metrics_server
+    start_metrics_server(METRICS_PORT)
+
     # RabbitMQ consumer runs in a background thread (blocking API)
     t = threading.Thread(target=_run_rabbitmq_in_thread, daemon=True)
     t.start()
 
     # gRPC + Redis Pub/Sub run as async tasks
-    await asyncio.gather(_serve_grpc(), _serve_pubsub())
+    try:
+        await asyncio.gather(_serve_grpc(), _serve_pubsub())
+    finally:
+        from app.handlers.email_handler import shutdown as shutdown_email
+        shutdown_email()
 
 
 if __name__ == "__main__":
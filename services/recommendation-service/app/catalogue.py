@@ -0,0 +1,260 @@
+"""
+Live catalogue for recommendation-service.
+
+A Catalogue is the vector index built over a base embedding matrix plus two
+cheap ways to change it without a rebuild:
+
+    append   new / re-encoded items go into a fixed-capacity delta buffer
+             that search() scans exactly next to the index
+    remove   deactivated items (and the old row of a re-encoded one) are
+             tombstoned in a boolean mask and filtered out of results
+
+Rows are numbered base first, then delta. row(item_id) finds the live row
+by binary search over the base ids (plus a small dict for delta rows), so
+there's no per-item Python object anywhere: metadata lives in an ItemTable
+(app.items), the content hash of each row's embedding text in an S16
+array, and the base vectors are normally the embedding store's memory map.
+
+Filtering: mask(Filters) ANDs the tombstone mask with per-value boolean
+masks over the ItemTable's dictionary codes — cached for category and state
+— and range comparisons on price in whole cents (so they agree with the
+SQL NUMERIC comparison in app.search), and search() hands that mask to the
+index so filtering happens before top-k selection. If an approximate index comes
+back short of k, the matching rows are scored exactly, so a page is always
+full whenever enough items match.
+
+Concurrency: one writer (the listing-feed thread), many readers (request
+threads). Writes only ever append, flip a tombstone byte or replace a
+single row, and `size` — the number of rows readers may look at — is
+published after the row is fully written, so readers never lock. Only the
+mask cache is guarded, so a mask can't be cached while a row is changing.
+
+save() / attach() share a freshly built catalogue between worker
+processes: the index and ItemTable go to disk next to the embedding store
+and other processes map them (app.serving).
+
+When the delta is full or tombstones pile up, the writer builds a fresh
+Catalogue from live() and the service swaps its module-level reference to
+it in one assignment; requests already running finish on the old one.
+"""
+
+import math
+import os
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+
+from app.index import VectorIndex, build_index, load_index, save_index, top_k
+from app.items import ItemTable
+
+COMPACT_DELTA = int(os.getenv("RECOMMENDATION_COMPACT_DELTA", 5_000))
+COMPACT_DEAD  = int(os.getenv("RECOMMENDATION_COMPACT_DEAD", 5_000))
+
+_CACHED = ("category", "state")   # few distinct values — masks worth keeping
+
+
+@dataclass(frozen=True)
+class Filters:
+    category: str | None = None
+    state: str | None = None
+    min_price: Decimal | None = None   # exact, like the NUMERIC column it mirrors
+    max_price: Decimal | None = None
+    exclude_seller: str | None = None
+    exclude_items: frozenset[int] = frozenset()
+
+
+class Catalogue:
+    def __init__(self, table: ItemTable, vectors: np.ndarray, hashes: np.ndarray,
+                 index: VectorIndex | None = None):
+        self.table = table
+        self.base = vectors
+        self.index = index or build_index(vectors)
+        self._n_base, dim = vectors.shape
+        capacity = self._n_base + COMPACT_DELTA
+        self._delta = np.empty((COMPACT_DELTA, dim), dtype=np.float32)
+        self._alive = np.ones(capacity, dtype=bool)
+        self._hashes = np.empty(capacity, dtype="S16")
+        self._hashes[:self._n_base] = hashes
+
+        base_ids = table.numeric("item_id")[:self._n_base]
+        self._base_order = np.argsort(base_ids, kind="stable")
+        self._base_ids = base_ids[self._base_order]
+        self._delta_row: dict[int, int] = {}
+        self.size = self._n_base   # rows visible to readers
+        self.dead = 0
+
+        self._masks: dict[tuple[str, str], np.ndarray] = {}
+        self._mask_lock = threading.Lock()
+
+    @classmethod
+    def from_items(cls, items: list[dict], vectors: np.ndarray, hashes: np.ndarray) -> "Catalogue":
+        return cls(ItemTable.from_dicts(items, spare=COMPACT_DELTA), vectors, hashes)
+
+    def save(self, path: Path) -> None:
+        """Write index and metadata for attach(); call before any live update."""
+        save_index(self.index, path / "index")
+        self.table.save(path / "items")
+
+    @classmethod
+    def attach(cls, path: Path, vectors: np.ndarray, hashes: np.ndarray) -> "Catalogue":
+        return cls(ItemTable.load(path / "items"), vectors, hashes,
+                   index=load_index(path / "index", vectors))
+
+    def __len__(self) -> int:
+        return self.size - self.dead
+
+    @property
+    def delta_rows(self) -> int:
+        return self.size - self._n_base
+
+    @property
+    def room(self) -> int:
+        return COMPACT_DELTA - self.delta_rows
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.room <= 0 or self.dead >= COMPACT_DEAD
+
+    @property
+    def nbytes(self) -> int:
+        """Resident bytes, not counting base vectors left on the memory map."""
+        return (self.index.nbytes + self.table.nbytes + self._delta.nbytes
+                + self._alive.nbytes + self._hashes.nbytes
+                + self._base_order.nbytes + self._base_ids.nbytes)
+
+    def row(self, item_id: int) -> int | None:
+        row = self._delta_row.get(item_id)
+        if row is not None:
+            return row
+        i = int(np.searchsorted(self._base_ids, item_id))
+        if i < self._n_base and self._base_ids[i] == item_id:
+            row = int(self._base_order[i])
+            if self._alive[row]:
+                return row
+        return None
+
+    def item(self, row: int) -> dict:
+        return self.table.row(row)
+
+    def content_hash(self, row: int) -> bytes:
+        return self._hashes[row]
+
+    def vector(self, row: int) -> np.ndarray:
+        if row < self._n_base:
+            return self.base[row]
+        return self._delta[row - self._n_base]
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        out = np.empty((len(rows), self._delta.shape[1]), dtype=np.float32)
+        in_base = rows < self._n_base
+        out[in_base] = self.base[rows[in_base]]
+        out[~in_base] = self._delta[rows[~in_base] - self._n_base]
+        return out
+
+    # ── Filtering ────────────────────────────────────────────────────────── #
+
+    def _value_mask(self, col: str, value: str) -> np.ndarray:
+        code = self.table.code_of(col, value)
+        if col not in _CACHED or code < 0:
+            return self.table.codes(col) == code
+        with self._mask_lock:
+            cached = self._masks.get((col, value))
+            if cached is None:
+                cached = self._masks[(col, value)] = self.table.codes(col) == code
+            return cached
+
+    def mask(self, filters: Filters | None = None) -> np.ndarray:
+        """Live rows matching `filters`, over the rows currently visible."""
+        size = self.size
+        mask = self._alive[:size].copy()
+        if filters is None:
+            return mask
+        if filters.category is not None:
+            mask &= self._value_mask("category", filters.category)[:size]
+        if filters.state is not None:
+            mask &= self._value_mask("state", filters.state)[:size]
+        if filters.exclude_seller is not None:
+            mask &= ~self._value_mask("seller_id", filters.exclude_seller)[:size]
+        cents = self.table.numeric("price_cents")
+        if filters.min_price is not None:
+            mask &= cents[:size] >= math.ceil(filters.min_price * 100)
+        if filters.max_price is not None:
+            mask &= cents[:size] <= math.floor(filters.max_price * 100)
+        for item_id in filters.exclude_items:
+            row = self.row(item_id)
+            if row is not None and row < size:
+                mask[row] = False
+        return mask
+
+    # ── Search ───────────────────────────────────────────────────────────── #
+
+    def search(self, query: np.ndarray, k: int,
+               filters: Filters | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k live rows matching `filters`, best first."""
+        return self.search_many(query[None, :], k, filters)[0]
+
+    def search_many(self, queries: np.ndarray, k: int,
+                    filters: Filters | None = None) -> list[tuple[np.ndarray, np.ndarray]]:
+        """search() for every row of `queries` — one matrix product on the exact index."""
+        mask = self.mask(filters)
+        n_base = self._n_base
+        matching = int(mask.sum())
+        found = self.index.search_many(queries, k, mask[:n_base])
+        delta_rows = n_base + np.flatnonzero(mask[n_base:])
+        delta_scores = queries @ self._delta[delta_rows - n_base].T
+
+        results = []
+        for i, (rows, scores) in enumerate(found):
+            rows = np.concatenate([rows, delta_rows])
+            scores = np.concatenate([scores, delta_scores[i]])
+            best = top_k(scores, k)
+            rows, scores = rows[best], scores[best]
+            if len(rows) < min(k, matching):
+                # Approximate index missed matching rows — score them all exactly
+                rows = np.flatnonzero(mask)
+                scores = self.vectors(rows) @ queries[i]
+                best = top_k(scores, k)
+                rows, scores = rows[best], scores[best]
+            results.append((rows, scores))
+        return results
+
+    # ── Writer side (listing-feed thread only) ───────────────────────────── #
+
+    def _set_row(self, row: int, item: dict) -> None:
+        with self._mask_lock:
+            self.table.set(row, item)
+            for (col, value), cached in self._masks.items():
+                cached[row] = item[col] == value
+
+    def replace(self, item: dict) -> None:
+        """New metadata for an item whose embedding text is unchanged."""
+        self._set_row(self.row(item["item_id"]), item)
+
+    def remove(self, item_id: int) -> None:
+        row = self.row(item_id)
+        if row is not None:
+            self._alive[row] = False
+            self._delta_row.pop(item_id, None)
+            self.dead += 1
+
+    def append(self, items: list[dict], vectors: np.ndarray, hashes: np.ndarray) -> None:
+        """Add (or re-embed) items; the caller checks `room` first."""
+        start = self.size
+        self._delta[start - self._n_base:start - self._n_base + len(items)] = vectors
+        self._hashes[start:start + len(items)] = hashes
+        for row, it in enumerate(items, start):
+            self._set_row(row, it)
+        for it in items:
+            self.remove(it["item_id"])
+        self.size = start + len(items)
+        for row, it in enumerate(items, start):
+            self._delta_row[it["item_id"]] = row
+
+    def live(self) -> tuple[ItemTable, np.ndarray, np.ndarray]:
+        """Live rows ordered by item_id — (metadata, vectors, hashes) for a compacted Catalogue."""
+        rows = np.flatnonzero(self._alive[:self.size])
+        rows = rows[np.argsort(self.table.numeric("item_id")[rows], kind="stable")]
+        return self.table.take(rows, spare=COMPACT_DELTA), self.vectors(rows), self._hashes[rows]
@@ -0,0 +1,141 @@
+"""
+Persisted embedding matrix for recommendation-service.
+
+Layout under RECOMMENDATION_DATA_DIR (a Docker volume):
+
+    current -> v1718000000000000000/      symlink, swapped atomically
+    v1718000000000000000/
+        manifest.json     {"model": ..., "dim": 384, "count": N}
+        item_ids.npy      (N,)   int64
+        hashes.npy        (N,)   S16   blake2b of the text that was encoded
+        embeddings.npy    (N, d) float32, L2-normalised
+
+On boot sync() compares the catalogue with the stored ids and content
+hashes:
+  - nothing changed        → the stored matrix is returned as a read-only
+                             np.memmap. No model load, no encoding; every
+                             worker process maps the same page-cache pages.
+  - some items new/changed → only those are encoded, unchanged rows are
+                             copied from the old matrix, and a new version
+                             directory is written and swapped in.
+
+save() writes a new version from vectors the caller already holds — the
+live index persists itself this way after every compaction.
+
+Changing RECOMMENDATION_MODEL (or its dimension) invalidates the store.
+Superseded versions are deleted, keeping the previous one for processes
+that still have it mapped.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+DATA_DIR = os.getenv("RECOMMENDATION_DATA_DIR", "/data/recommendations")
+KEEP_VERSIONS = 2
+
+
+def content_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def content_hashes(texts: list[str]) -> np.ndarray:
+    return np.array([content_hash(t) for t in texts], dtype="S16")
+
+
+@dataclass
+class StoredEmbeddings:
+    path: Path
+    item_ids: np.ndarray
+    hashes: np.ndarray
+    vectors: np.ndarray   # np.memmap, read-only
+
+
+class EmbeddingStore:
+    def __init__(self, model_name: str, dim: int, root: str = DATA_DIR):
+        self.model_name = model_name
+        self.dim = dim
+        self.root = Path(root)
+
+    def load(self, version: str = "current") -> StoredEmbeddings | None:
+        path = self.root / version
+        try:
+            manifest = json.loads((path / "manifest.json").read_text())
+            if manifest.get("model") != self.model_name or manifest.get("dim") != self.dim:
+                log.info("Embedding store was built with %s/%s — ignoring it",
+                         manifest.get("model"), manifest.get("dim"))
+                return None
+            return StoredEmbeddings(
+                path=path.resolve(),
+                item_ids=np.load(path / "item_ids.npy"),
+                hashes=np.load(path / "hashes.npy"),
+                vectors=np.load(path / "embeddings.npy", mmap_mode="r"),
+            )
+        except (OSError, ValueError) as exc:
+            log.info("No usable embedding store at %s (%s)", path, exc)
+            return None
+
+    def sync(self, item_ids: list[int], texts: list[str],
+             encode: Callable[[list[str]], np.ndarray]) -> StoredEmbeddings:
+        """Embeddings for `texts` in the given order, encoding only what changed."""
+        ids = np.asarray(item_ids, dtype=np.int64)
+        hashes = content_hashes(texts)
+        stored = self.load()
+
+        if (stored is not None and np.array_equal(stored.item_ids, ids)
+                and np.array_equal(stored.hashes, hashes)):
+            log.info("Embedding store up to date — mapped %d vectors from %s", len(ids), stored.path)
+            return stored
+
+        vectors = np.empty((len(ids), self.dim), dtype=np.float32)
+        fresh = np.zeros(len(ids), dtype=bool)
+        if stored is not None and len(stored.item_ids):
+            position = {iid: row for row, iid in enumerate(stored.item_ids.tolist())}
+            rows = np.array([position.get(iid, -1) for iid in ids.tolist()], dtype=np.int64)
+            fresh = rows >= 0
+            fresh[fresh] = stored.hashes[rows[fresh]] == hashes[fresh]
+            vectors[fresh] = stored.vectors[rows[fresh]]
+
+        todo = np.flatnonzero(~fresh)
+        log.info("Embedding store: %d reused, %d to encode", int(fresh.sum()), len(todo))
+        if len(todo):
+            vectors[todo] = encode([texts[i] for i in todo])
+        return self._write(ids, hashes, vectors)
+
+    def save(self, item_ids: np.ndarray, hashes: np.ndarray, vectors: np.ndarray) -> StoredEmbeddings:
+        """Persist vectors that were computed elsewhere (e.g. a compacted live index)."""
+        return self._write(np.asarray(item_ids, dtype=np.int64), hashes, vectors)
+
+    def _write(self, ids: np.ndarray, hashes: np.ndarray, vectors: np.ndarray) -> StoredEmbeddings:
+        self.root.mkdir(parents=True, exist_ok=True)
+        version = self.root / f"v{time.time_ns()}"
+        version.mkdir()
+        np.save(version / "item_ids.npy", ids)
+        np.save(version / "hashes.npy", hashes)
+        np.save(version / "embeddings.npy", vectors)
+        (version / "manifest.json").write_text(json.dumps(
+            {"model": self.model_name, "dim": self.dim, "count": len(ids)}))
+
+        # Atomic swap: readers see either the old or the new version, never a mix
+        link = self.root / f".current-{os.getpid()}"
+        link.unlink(missing_ok=True)
+        link.symlink_to(version.name)
+        os.replace(link, self.root / "current")
+        self._prune()
+        return self.load()
+
+    def _prune(self) -> None:
+        versions = sorted(p for p in self.root.glob("v*") if p.is_dir())
+        for old in versions[:-KEEP_VERSIONS]:
+            # Safe on Linux even if another process still maps its files
+            shutil.rmtree(old, ignore_errors=True)
@@ -0,0 +1,115 @@
+"""
+Text encoders for recommendation-service.
+
+RECOMMENDATION_ENCODER picks the backend:
+
+    torch       SentenceTransformer on PyTorch (default)
+    onnx        the same network exported to ONNX (export_onnx.py, run at
+                image build), on ONNX Runtime
+    onnx-int8   the ONNX graph with dynamically quantised int8 weights —
+                the fastest CPU path, at a small embedding drift
+                (bench_encoder.py measures it)
+
+All three return L2-normalised float32 rows, so dot product = cosine
+similarity as before.
+
+ONNX batches are length-bucketed: every text is tokenised once, texts are
+sorted by token count and cut into batches, and each batch is padded only
+to its own longest text, so a one-line listing never pays for a 256-token
+description next to it. Rows come back in input order.
+
+store_key() is the model name the embedding store files vectors under.
+onnx matches torch to float rounding and shares its vectors; onnx-int8 gets
+its own, so switching to or from it re-encodes the catalogue once instead
+of mixing vectors from two models in one index.
+"""
+
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+BACKEND    = os.getenv("RECOMMENDATION_ENCODER", "torch")
+ONNX_DIR   = Path(os.getenv("RECOMMENDATION_ONNX_DIR", "/app/onnx"))
+BATCH_SIZE = int(os.getenv("RECOMMENDATION_ENCODE_BATCH", 64))
+THREADS    = int(os.getenv("RECOMMENDATION_ENCODE_THREADS", 0))   # 0 = ONNX Runtime default
+MAX_TOKENS = 256   # all-MiniLM-L6-v2 max_seq_length
+
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model-int8.onnx"}
+
+
+class TorchEncoder:
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        log.info("Loading SBERT model (%s)…", model_name)
+        self._model = SentenceTransformer(model_name)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        # SentenceTransformer.encode already sorts each call by length
+        return self._model.encode(
+            texts,
+            batch_size=BATCH_SIZE,
+            show_progress_bar=False,
+            normalize_embeddings=True,   # unit vectors → dot product = cosine sim
+            convert_to_numpy=True,
+        )
+
+
+class OnnxEncoder:
+    def __init__(self, model_name: str, backend: str, model_dir: Path = ONNX_DIR):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = model_dir / model_name / ONNX_FILES[backend]
+        log.info("Loading ONNX model (%s)…", path)
+        self._tokenizer = Tokenizer.from_file(str(model_dir / model_name / "tokenizer.json"))
+        self._tokenizer.enable_truncation(MAX_TOKENS)
+        self._tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if THREADS:
+            options.intra_op_num_threads = THREADS
+        self._session = ort.InferenceSession(str(path), options,
+                                             providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self._session.get_inputs()}
+        self._dim = self._session.get_outputs()[0].shape[-1]
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        lengths = np.fromiter((len(e.ids) for e in encodings), dtype=np.int64, count=len(encodings))
+        order = np.argsort(lengths, kind="stable")
+        out = np.empty((len(texts), self._dim), dtype=np.float32)
+
+        for start in range(0, len(texts), BATCH_SIZE):
+            batch = order[start:start + BATCH_SIZE]
+            width = int(lengths[batch].max())
+            ids = np.zeros((len(batch), width), dtype=np.int64)
+            mask = np.zeros((len(batch), width), dtype=np.int64)
+            for i, j in enumerate(batch.tolist()):
+                n = lengths[j]
+                ids[i, :n] = encodings[j].ids
+                mask[i, :n] = 1
+            feeds = {"input_ids": ids, "attention_mask": mask,
+                     "token_type_ids": np.zeros_like(ids)}
+            hidden = self._session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+            # Mean pooling over real tokens, as SentenceTransformer does
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            out[batch] = pooled / np.linalg.norm(pooled, axis=1, keepdims=True)
+        return out
+
+
+def store_key(model_name: str, backend: str = BACKEND) -> str:
+    return f"{model_name}+int8" if backend == "onnx-int8" else model_name
+
+
+def load_encoder(model_name: str, backend: str = BACKEND) -> TorchEncoder | OnnxEncoder:
+    if backend == "torch":
+        return TorchEncoder(model_name)
+    if backend not in ONNX_FILES:
+        raise ValueError(f"Unknown RECOMMENDATION_ENCODER {backend!r} — torch, onnx or onnx-int8")
+    return OnnxEncoder(model_name, backend)
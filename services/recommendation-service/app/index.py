@@ -0,0 +1,407 @@
+"""
+Vector indexes for recommendation-service.
+
+Every index holds the L2-normalised embedding matrix and answers
+"top-k rows by inner product" (= cosine similarity):
+
+    index.build(vectors)              vectors: (N, d) float32
+    index.search(query, k, mask)      → (rows, scores), best first
+    index.search_many(queries, k, mask) → [(rows, scores), …] per query row
+
+`mask` (optional, bool per row) restricts results to the rows where it is
+True. It is applied before top-k selection, so the exact index always
+returns min(k, mask.sum()) rows; approximate indexes return at most k
+among the candidates they visited.
+
+Implementations (RECOMMENDATION_INDEX):
+
+  exact   Full mat-vec product + np.argpartition. O(N) but all in BLAS and
+          one partial partition — no Python-level sort. Recall 1.0.
+          search_many() scores a whole batch with one matrix-matrix product.
+  ivf     Pure-NumPy inverted file: spherical k-means splits the catalogue
+          into ~4·√N lists stored contiguously; a query scores the
+          centroids, then only the `nprobe` closest lists.
+          RECOMMENDATION_IVF_NPROBE trades recall for latency.
+  hnsw    hnswlib graph index, if the package is installed.
+  auto    (default) exact below RECOMMENDATION_EXACT_MAX items, ivf above.
+
+exact and ivf score with a reduced-precision copy of the vectors
+(RECOMMENDATION_PRECISION):
+
+  int8     (default) per-row symmetric quantisation, 1 byte per dim + a
+           float32 scale per row — 4x smaller than float32
+  float16  2 bytes per dim (NumPy upcasts float16 slowly — int8 is faster)
+  float32  no quantisation, no rescoring
+
+With int8/float16 the best k · RECOMMENDATION_RESCORE candidates are
+rescored against the float32 vectors passed to build() — normally the
+embedding store's memory map, so only the candidate rows are ever paged in
+and the full-precision matrix is not resident.
+
+save_index() / load_index() write an index next to the embedding store and
+map it back read-only, so every worker process serves from one copy of the
+quantised vectors (see app.serving).
+
+bench_index.py measures recall@k against float32 `exact`, per-query latency
+and index memory.
+"""
+
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+INDEX_KIND = os.getenv("RECOMMENDATION_INDEX", "auto")
+EXACT_MAX  = int(os.getenv("RECOMMENDATION_EXACT_MAX", 50_000))
+IVF_NPROBE = int(os.getenv("RECOMMENDATION_IVF_NPROBE", 16))
+HNSW_EF    = int(os.getenv("RECOMMENDATION_HNSW_EF", 64))
+PRECISION  = os.getenv("RECOMMENDATION_PRECISION", "int8")
+RESCORE    = int(os.getenv("RECOMMENDATION_RESCORE", 4))
+
+_CHUNK = 16_384   # rows upcast to float32 at a time while scoring
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first — O(N + k log k)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """top_k() for every row of a (Q, N) score matrix."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((len(scores), 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+
+class QuantizedMatrix:
+    """Row-major vectors at reduced precision; dot() upcasts a chunk at a time."""
+
+    def __init__(self, vectors: np.ndarray, precision: str = PRECISION):
+        self.precision = precision
+        n = len(vectors)
+        self._scale = None
+        if precision == "float32" and isinstance(vectors, np.ndarray):
+            self._codes = np.ascontiguousarray(vectors, dtype=np.float32)   # no copy of a memmap
+            return
+        dtype = {"int8": np.int8, "float16": np.float16, "float32": np.float32}[precision]
+        self._codes = np.empty(vectors.shape, dtype=dtype)
+        self._scale = np.ones(n, dtype=np.float32) if precision == "int8" else None
+        for start in range(0, n, _CHUNK):
+            chunk = np.asarray(vectors[start:start + _CHUNK], dtype=np.float32)
+            if precision == "int8":
+                scale = np.maximum(np.abs(chunk).max(axis=1), 1e-12) / 127
+                self._scale[start:start + len(chunk)] = scale
+                chunk = np.rint(chunk / scale[:, None])
+            self._codes[start:start + len(chunk)] = chunk
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    @property
+    def nbytes(self) -> int:
+        return self._codes.nbytes + (self._scale.nbytes if self._scale is not None else 0)
+
+    def save(self, path: Path, name: str) -> None:
+        np.save(path / f"{name}.npy", self._codes)
+        if self._scale is not None:
+            np.save(path / f"{name}_scale.npy", self._scale)
+
+    @classmethod
+    def load(cls, path: Path, name: str, precision: str) -> "QuantizedMatrix":
+        matrix = cls.__new__(cls)
+        matrix.precision = precision
+        matrix._codes = np.load(path / f"{name}.npy", mmap_mode="r")
+        scale = path / f"{name}_scale.npy"
+        matrix._scale = np.load(scale, mmap_mode="r") if scale.exists() else None
+        return matrix
+
+    def dot(self, queries: np.ndarray, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Approximate (Q, stop - start) scores of rows [start, stop)."""
+        stop = len(self._codes) if stop is None else stop
+        if self.precision == "float32":
+            return queries @ self._codes[start:stop].T
+        out = np.empty((len(queries), stop - start), dtype=np.float32)
+        for a in range(start, stop, _CHUNK):
+            b = min(a + _CHUNK, stop)
+            out[:, a - start:b - start] = queries @ self._codes[a:b].astype(np.float32).T
+        if self._scale is not None:
+            out *= self._scale[start:stop]
+        return out
+
+
+def rescore(full: np.ndarray, query: np.ndarray, rows: np.ndarray,
+            k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Exact top-k among candidate `rows` using the float32 vectors."""
+    rows = np.sort(rows)   # ascending reads from the memory map
+    scores = full[rows] @ query if len(rows) else np.empty(0, dtype=np.float32)
+    best = top_k(scores, k)
+    return rows[best], scores[best]
+
+
+class VectorIndex(ABC):
+    name = ""
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size of the index structures."""
+        return 0
+
+    @abstractmethod
+    def build(self, vectors: np.ndarray) -> None:
+        ...
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int,
+               mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        ...
+
+    def search_many(self, queries: np.ndarray, k: int,
+                    mask: np.ndarray | None = None) -> list[tuple[np.ndarray, np.ndarray]]:
+        return [self.search(q, k, mask) for q in queries]
+
+    @abstractmethod
+    def save(self, path: Path) -> None:
+        ...
+
+    @classmethod
+    @abstractmethod
+    def load(cls, path: Path, vectors: np.ndarray, meta: dict) -> "VectorIndex":
+        ...
+
+
+class ExactIndex(VectorIndex):
+    name = "exact"
+
+    def __init__(self, precision: str = PRECISION):
+        self.precision = precision
+
+    def build(self, vectors: np.ndarray) -> None:
+        self._full = vectors
+        self._matrix = QuantizedMatrix(vectors, self.precision)
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes
+
+    def save(self, path: Path) -> None:
+        if self.precision != "float32":   # float32 scores straight off the store's matrix
+            self._matrix.save(path, "codes")
+
+    @classmethod
+    def load(cls, path: Path, vectors: np.ndarray, meta: dict) -> "ExactIndex":
+        index = cls(meta["precision"])
+        index._full = vectors
+        index._matrix = (QuantizedMatrix(vectors, "float32") if index.precision == "float32"
+                         else QuantizedMatrix.load(path, "codes", index.precision))
+        return index
+
+    def search(self, query: np.ndarray, k: int,
+               mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        return self.search_many(query[None, :], k, mask)[0]
+
+    def search_many(self, queries: np.ndarray, k: int,
+                    mask: np.ndarray | None = None) -> list[tuple[np.ndarray, np.ndarray]]:
+        scores = self._matrix.dot(queries)   # (Q, N) — one GEMM per chunk
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+            k = min(k, int(mask.sum()))
+        if self.precision == "float32":
+            rows = top_k_rows(scores, k)
+            return list(zip(rows, np.take_along_axis(scores, rows, axis=1)))
+        candidates = top_k_rows(scores, k * RESCORE)
+        if mask is not None:
+            candidates = [rows[mask[rows]] for rows in candidates]
+        return [rescore(self._full, q, rows, k) for q, rows in zip(queries, candidates)]
+
+
+class _Gather:
+    """vectors[rows] read lazily, chunk by chunk, so the reordered copy isn't float32."""
+
+    def __init__(self, vectors: np.ndarray, rows: np.ndarray):
+        self._vectors, self._rows = vectors, rows
+        self.shape = (len(rows), vectors.shape[1])
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, span: slice) -> np.ndarray:
+        return np.asarray(self._vectors[self._rows[span]])
+
+
+class IVFIndex(VectorIndex):
+    name = "ivf"
+
+    def __init__(self, nlist: int | None = None, nprobe: int = IVF_NPROBE,
+                 train_iters: int = 10, train_sample: int = 100_000, seed: int = 0,
+                 precision: str = PRECISION):
+        self._nlist = nlist
+        self.nprobe = nprobe
+        self.precision = precision
+        self._train_iters = train_iters
+        self._train_sample = train_sample
+        self._rng = np.random.default_rng(seed)
+
+    def build(self, vectors: np.ndarray) -> None:
+        self._full = vectors
+        n = len(vectors)
+        if n == 0:
+            self._centroids = np.empty(vectors.shape, dtype=np.float32)
+            self._lists = QuantizedMatrix(self._centroids, self.precision)
+            self._rows, self._offsets = np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64)
+            return
+        nlist = max(1, min(n, self._nlist or int(4 * np.sqrt(n))))
+        self._centroids = self._train(vectors, nlist)
+
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 65_536):
+            chunk = vectors[start:start + 65_536]
+            assign[start:start + len(chunk)] = np.argmax(chunk @ self._centroids.T, axis=1)
+
+        # Lists stored back to back: rows of list l are _lists[_offsets[l]:_offsets[l+1]]
+        order = np.argsort(assign, kind="stable")
+        self._rows = order.astype(np.int64)
+        self._lists = QuantizedMatrix(_Gather(vectors, self._rows), self.precision)
+        self._offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+        log.info("IVF index: %d items in %d lists (nprobe=%d)", n, nlist, self.nprobe)
+
+    def _train(self, vectors: np.ndarray, nlist: int) -> np.ndarray:
+        sample_size = min(len(vectors), max(self._train_sample, nlist))
+        sample = vectors[self._rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[self._rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(self._train_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(assign, minlength=nlist)
+            used = np.flatnonzero(counts)
+            starts = (np.cumsum(counts) - counts)[used]
+            sums = np.add.reduceat(sample[np.argsort(assign, kind="stable")], starts, axis=0)
+            # Spherical k-means: centroids stay unit length; empty lists keep their old centroid
+            centroids[used] = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        return centroids
+
+    def search(self, query: np.ndarray, k: int,
+               mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        if not len(self._rows):
+            return self._rows, np.empty(0, dtype=np.float32)
+        probe = top_k(self._centroids @ query, self.nprobe)
+        spans = [(self._offsets[l], self._offsets[l + 1]) for l in probe]
+        scores = np.concatenate([self._lists.dot(query[None, :], a, b)[0] for a, b in spans])
+        rows = np.concatenate([self._rows[a:b] for a, b in spans])
+        if mask is not None:
+            keep = mask[rows]
+            rows, scores = rows[keep], scores[keep]
+        if self.precision == "float32":
+            best = top_k(scores, k)
+            return rows[best], scores[best]
+        return rescore(self._full, query, rows[top_k(scores, k * RESCORE)], k)
+
+    @property
+    def nbytes(self) -> int:
+        return self._lists.nbytes + self._centroids.nbytes + self._rows.nbytes
+
+    def save(self, path: Path) -> None:
+        self._lists.save(path, "lists")
+        np.save(path / "centroids.npy", self._centroids)
+        np.save(path / "rows.npy", self._rows)
+        np.save(path / "offsets.npy", self._offsets)
+
+    @classmethod
+    def load(cls, path: Path, vectors: np.ndarray, meta: dict) -> "IVFIndex":
+        index = cls(precision=meta["precision"])
+        index._full = vectors
+        index._lists = QuantizedMatrix.load(path, "lists", index.precision)
+        index._centroids = np.load(path / "centroids.npy")
+        index._rows = np.load(path / "rows.npy", mmap_mode="r")
+        index._offsets = np.load(path / "offsets.npy")
+        return index
+
+
+class HNSWIndex(VectorIndex):
+    name = "hnsw"
+
+    def __init__(self, m: int = 16, ef_construction: int = 200, ef: int = HNSW_EF):
+        import hnswlib   # optional dependency
+        self._hnswlib = hnswlib
+        self._m = m
+        self._ef_construction = ef_construction
+        self.ef = ef
+
+    def build(self, vectors: np.ndarray) -> None:
+        n, dim = vectors.shape
+        self._graph = self._hnswlib.Index(space="ip", dim=dim)
+        self._graph.init_index(max_elements=max(n, 1), ef_construction=self._ef_construction, M=self._m)
+        if n:
+            self._graph.add_items(vectors, np.arange(n))
+        self._graph.set_ef(self.ef)
+        self._n = n
+        self._dim = dim
+
+    @property
+    def nbytes(self) -> int:
+        # float32 vectors + ~2·M neighbour ids per element on layer 0
+        return self._n * (self._dim * 4 + self._m * 2 * 4)
+
+    def save(self, path: Path) -> None:
+        self._graph.save_index(str(path / "hnsw.bin"))
+
+    @classmethod
+    def load(cls, path: Path, vectors: np.ndarray, meta: dict) -> "HNSWIndex":
+        # hnswlib reads the graph into process memory — not shared between workers
+        index = cls()
+        index._n, index._dim = vectors.shape
+        index._graph = index._hnswlib.Index(space="ip", dim=index._dim)
+        index._graph.load_index(str(path / "hnsw.bin"), max_elements=max(index._n, 1))
+        index._graph.set_ef(index.ef)
+        return index
+
+    def search(self, query: np.ndarray, k: int,
+               mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        k = min(k, self._n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        self._graph.set_ef(max(self.ef, k))
+        labels, distances = self._graph.knn_query(query, k=k)
+        # hnswlib "ip" distance is 1 - inner product
+        rows, scores = labels[0].astype(np.int64), 1.0 - distances[0]
+        if mask is not None:
+            keep = mask[rows]
+            rows, scores = rows[keep], scores[keep]
+        return rows, scores
+
+
+_KINDS = {"exact": ExactIndex, "ivf": IVFIndex, "hnsw": HNSWIndex}
+
+
+def build_index(vectors: np.ndarray, kind: str = INDEX_KIND) -> VectorIndex:
+    if kind == "auto":
+        kind = "exact" if len(vectors) <= EXACT_MAX else "ivf"
+    try:
+        index = _KINDS[kind]()
+    except ImportError:
+        log.warning("Index %r unavailable (hnswlib not installed) — using ivf", kind)
+        index = IVFIndex()
+    index.build(vectors)
+    return index
+
+
+def save_index(index: VectorIndex, path: Path) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+    index.save(path)
+    meta = {"kind": index.name, "precision": getattr(index, "precision", "float32")}
+    (path / "index.json").write_text(json.dumps(meta))
+
+
+def load_index(path: Path, vectors: np.ndarray) -> VectorIndex:
+    meta = json.loads((path / "index.json").read_text())
+    return _KINDS[meta["kind"]].load(path, vectors, meta)
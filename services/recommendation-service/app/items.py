@@ -0,0 +1,170 @@
+"""
+Columnar item metadata for recommendation-service.
+
+One NumPy array per field instead of one dict per item:
+
+    item_id, views_count, saves_count,            fixed-width numeric arrays
+    price_cents                                   (price as exact integer cents)
+    category, condition, city, state, seller_id   int32 codes + a value list
+                                                  (dictionary encoding)
+    title, description, thumbnail                 StringColumn: one UTF-8
+                                                  buffer + offsets, Arrow-style
+
+Every column has spare capacity past the loaded rows for live appends;
+row(i) materialises a dict only for the items actually returned.
+
+save() / load() persist a freshly built table next to the embedding store.
+load() maps the arrays copy-on-write: worker processes share the pages
+until a live update writes to a row, which then becomes private to that
+process.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+NUMERIC = {"item_id": np.int64, "views_count": np.int32, "saves_count": np.int32,
+           "price_cents": np.int64}
+CODED   = ("category", "condition", "city", "state", "seller_id")
+STRINGS = ("title", "description", "thumbnail")
+
+
+class StringColumn:
+    """Immutable UTF-8 buffer for the loaded rows; later writes go to a small dict."""
+
+    def __init__(self, values: list[str | None]):
+        encoded = [(v or "").encode() for v in values]
+        self._buf = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        self._offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)),
+                  out=self._offsets[1:])
+        self._null = np.array([v is None for v in values], dtype=bool)
+        self._written: dict[int, str | None] = {}
+
+    def __getitem__(self, row: int) -> str | None:
+        if row in self._written:
+            return self._written[row]
+        if self._null[row]:
+            return None
+        return self._buf[self._offsets[row]:self._offsets[row + 1]].tobytes().decode()
+
+    def __setitem__(self, row: int, value: str | None) -> None:
+        self._written[row] = value
+
+    @property
+    def nbytes(self) -> int:
+        return self._buf.nbytes + self._offsets.nbytes + self._null.nbytes
+
+    def save(self, path: Path, name: str) -> None:
+        np.save(path / f"{name}.buf.npy", self._buf)
+        np.save(path / f"{name}.offsets.npy", self._offsets)
+        np.save(path / f"{name}.null.npy", self._null)
+
+    @classmethod
+    def load(cls, path: Path, name: str) -> "StringColumn":
+        col = cls.__new__(cls)
+        col._buf = np.load(path / f"{name}.buf.npy", mmap_mode="r")
+        col._offsets = np.load(path / f"{name}.offsets.npy", mmap_mode="r")
+        col._null = np.load(path / f"{name}.null.npy", mmap_mode="r")
+        col._written = {}
+        return col
+
+
+def _numeric_value(item: dict, field: str):
+    # Prices are DECIMAL(10,2): whole cents compare exactly, float32 doesn't
+    return round(item["price"] * 100) if field == "price_cents" else item[field]
+
+
+class ItemTable:
+    def __init__(self, columns: dict, vocab: dict[str, list], spare: int):
+        n = len(columns["item_id"])
+        self._numeric = {f: np.zeros(n + spare, dtype=t) for f, t in NUMERIC.items()}
+        for f in NUMERIC:
+            self._numeric[f][:n] = columns[f]
+        self._values = vocab
+        self._index = {f: {v: c for c, v in enumerate(values)} for f, values in vocab.items()}
+        self._codes = {f: np.full(n + spare, -1, dtype=np.int32) for f in CODED}
+        for f in CODED:
+            self._codes[f][:n] = columns[f]
+        self._strings = {f: StringColumn(columns[f]) for f in STRINGS}
+
+    @classmethod
+    def from_dicts(cls, items: list[dict], spare: int) -> "ItemTable":
+        columns = {f: [_numeric_value(it, f) for it in items] for f in NUMERIC}
+        columns.update({f: [it[f] for it in items] for f in STRINGS})
+        vocab = {}
+        for f in CODED:
+            index: dict = {}
+            columns[f] = [index.setdefault(it[f], len(index)) for it in items]
+            vocab[f] = list(index)
+        return cls(columns, vocab, spare)
+
+    def take(self, rows: np.ndarray, spare: int) -> "ItemTable":
+        """A compacted copy holding only `rows`, in that order."""
+        columns = {f: self._numeric[f][rows] for f in NUMERIC}
+        columns.update({f: self._codes[f][rows] for f in CODED})
+        columns.update({f: [self._strings[f][r] for r in rows.tolist()] for f in STRINGS})
+        return ItemTable(columns, {f: list(v) for f, v in self._values.items()}, spare)
+
+    def save(self, path: Path) -> None:
+        """Call on a freshly built table — rows written since live in memory only."""
+        path.mkdir(parents=True, exist_ok=True)
+        for f, values in self._numeric.items():
+            np.save(path / f"{f}.npy", values)
+        for f, codes in self._codes.items():
+            np.save(path / f"{f}.codes.npy", codes)
+        for f, col in self._strings.items():
+            col.save(path, f)
+        (path / "vocab.json").write_text(json.dumps(self._values))
+
+    @classmethod
+    def load(cls, path: Path) -> "ItemTable":
+        table = cls.__new__(cls)
+        table._numeric = {f: np.load(path / f"{f}.npy", mmap_mode="c") for f in NUMERIC}
+        table._codes = {f: np.load(path / f"{f}.codes.npy", mmap_mode="c") for f in CODED}
+        table._strings = {f: StringColumn.load(path, f) for f in STRINGS}
+        table._values = json.loads((path / "vocab.json").read_text())
+        table._index = {f: {v: c for c, v in enumerate(values)} for f, values in table._values.items()}
+        return table
+
+    # ── Columns ──────────────────────────────────────────────────────────── #
+
+    def numeric(self, field: str) -> np.ndarray:
+        return self._numeric[field]
+
+    def codes(self, field: str) -> np.ndarray:
+        return self._codes[field]
+
+    def code_of(self, field: str, value) -> int:
+        """Dictionary code of `value`, or -2 if no row has ever held it."""
+        return self._index[field].get(value, -2)
+
+    # ── Rows ─────────────────────────────────────────────────────────────── #
+
+    def set(self, row: int, item: dict) -> None:
+        for f in NUMERIC:
+            self._numeric[f][row] = _numeric_value(item, f)
+        for f in CODED:
+            index = self._index[f]
+            code = index.get(item[f])
+            if code is None:
+                code = len(self._values[f])
+                self._values[f].append(item[f])
+                index[item[f]] = code
+            self._codes[f][row] = code
+        for f in STRINGS:
+            self._strings[f][row] = item[f]
+
+    def row(self, row: int) -> dict:
+        out = {f: self._numeric[f][row].item() for f in NUMERIC}
+        out["price"] = out.pop("price_cents") / 100
+        out.update({f: self._values[f][self._codes[f][row]] for f in CODED})
+        out.update({f: self._strings[f][row] for f in STRINGS})
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return (sum(a.nbytes for a in self._numeric.values())
+                + sum(a.nbytes for a in self._codes.values())
+                + sum(s.nbytes for s in self._strings.values()))
@@ -0,0 +1,95 @@
+"""
+Listing change feed for recommendation-service.
+
+database/01_schema.sql sends pg_notify('electrohub_listings', item_id) from
+every writer that creates, edits, deactivates or deletes a listing, or
+changes its thumbnail. ListingFeed keeps a dedicated LISTEN connection in a
+background thread and hands the changed item ids to a callback at most every
+RECOMMENDATION_REFRESH_MS. The callback re-reads those rows, so bursts are
+coalesced and replays are harmless.
+
+LISTEN is issued before the initial catalogue load, so nothing committed
+while the service starts is missed. After a lost connection the callback
+gets None instead: notifications may have been dropped, resync everything.
+"""
+
+import logging
+import os
+import select
+import threading
+import time
+from typing import Callable
+
+import psycopg2
+import psycopg2.extensions
+
+log = logging.getLogger(__name__)
+
+CHANNEL   = "electrohub_listings"
+REFRESH_S = int(os.getenv("RECOMMENDATION_REFRESH_MS", 1_000)) / 1000
+IDLE_S    = 5.0
+
+
+class ListingFeed:
+    def __init__(self, dsn: str, apply: Callable[[set[int] | None], None]):
+        self._dsn = dsn
+        self._apply = apply
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def listen(self) -> None:
+        conn = psycopg2.connect(self._dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        conn.cursor().execute(f"LISTEN {CHANNEL}")
+        self._conn = conn
+        log.info("Listening for listing changes on %s", CHANNEL)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="listing-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=IDLE_S + 1)
+        self._close()
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+            self._conn = None
+
+    def _run(self) -> None:
+        pending: set[int] = set()
+        flush_at: float | None = None
+        resync = False
+        while not self._stop.is_set():
+            try:
+                if self._conn is None:
+                    self.listen()
+                    resync = True
+
+                wait = IDLE_S if flush_at is None else max(0.0, flush_at - time.monotonic())
+                if select.select([self._conn], [], [], wait)[0]:
+                    self._conn.poll()
+                    pending.update(int(n.payload) for n in self._conn.notifies)
+                    self._conn.notifies.clear()
+                    if pending and flush_at is None:
+                        flush_at = time.monotonic() + REFRESH_S
+
+                if resync or (flush_at is not None and time.monotonic() >= flush_at):
+                    batch = None if resync else pending
+                    pending, flush_at, resync = set(), None, False
+                    self._apply(batch)
+            except psycopg2.Error as exc:
+                log.warning("Listing feed connection lost (%s) — reconnecting", exc)
+                self._close()
+                self._stop.wait(1)
+            except Exception:
+                log.exception("Applying listing changes failed — resyncing")
+                resync = True
+                self._stop.wait(1)
@@ -4,24 +4,66 @@ Recommendation service — SBERT semantic similarity.
 Startup:
   1. Load all active items from Postgres
   2. Build text: "title. category. condition. description"
-  3. Encode with all-MiniLM-L6-v2 (384-dim, normalised)
-  4. Store embedding matrix in memory
+  3. Sync with the persisted embedding store (app.embedding_store): only
+     new or changed items are encoded with all-MiniLM-L6-v2 (384-dim,
+     normalised) on PyTorch or ONNX Runtime (app.encoder); an unchanged
+     catalogue is memory-mapped from disk and the model is never loaded
+  4. Build the vector index over the embedding matrix
+
+Live updates (app.listings, app.catalogue):
+  Listing inserts / edits / deactivations arrive as Postgres notifications.
+  Changed rows are re-read in batches; new or re-worded items are encoded in
+  the feed's background thread and appended to the live catalogue, removed
+  ones are tombstoned. Compaction rebuilds the index, persists it to the
+  embedding store and swaps it in — new listings are recommendable within
+  about RECOMMENDATION_REFRESH_MS, without a restart.
+
+Workers (app.serving):
+  With several uvicorn workers (WEB_CONCURRENCY), one becomes the builder —
+  it alone loads the model, follows listing changes and builds the index —
+  and publishes each base and change batch to RECOMMENDATION_DATA_DIR. The
+  others memory-map what it wrote and hot-swap on every new generation.
 
 Query:
   GET /recommendations/{item_id}?limit=6
   → cosine similarity (dot product on normalised vecs) → top-N
+    through a pluggable vector index (app.index: exact / ivf / hnsw)
+  POST /recommendations/batch {"item_ids": [...], "limit": 6}
+  → the same for several seed items, scored with one matrix-matrix product
+  GET /recommendations/user/{user_id}?limit=12
+  → top-N for the user's taste vector (app.users: saves + activity,
+    recency weighted, cached), excluding items they already interacted with
+  GET /recommendations/search?q=noise+cancelling+headphones&limit=20
+  → Postgres full-text matches and nearest items to the query embedding,
+    fused by reciprocal rank (app.search)
+
+Every query endpoint takes the same filters — category, state, min_price,
+max_price, exclude_seller, exclude_saved_by (a user_id) — applied as a row
+mask before top-k selection (app.catalogue.Filters), so filtered pages are
+still `limit` long whenever enough items match.
 """
 
 import asyncio
 import logging
 import os
+from dataclasses import replace
+from decimal import Decimal
+from functools import lru_cache
 
 import numpy as np
 import psycopg2
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from sentence_transformers import SentenceTransformer
+from pydantic import BaseModel
+
+from app.catalogue import COMPACT_DELTA, Catalogue, Filters
+from app.encoder import load_encoder, store_key
+from app.embedding_store import EmbeddingStore, content_hashes
+from app.listings import ListingFeed
+from app.search import HybridSearch
+from app.serving import BuilderLock, Changes, Follower, Publisher
+from app.users import UserProfiles
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -33,17 +75,26 @@ DB_DSN = (
     f"user={os.getenv('DB_USER','postgres')} "
     f"password={os.getenv('DB_PASSWORD','password')}"
 )
+MODEL_NAME = os.getenv("RECOMMENDATION_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_DIM = 384
 
 # ── In-memory index ───────────────────────────────────────────────────────── #
-_items: list[dict] = []
-_embeddings: np.ndarray | None = None   # shape (N, 384), L2-normalised
-_item_index: dict[int, int] = {}        # item_id → row index
+_catalogue: Catalogue | None = None     # swapped whole on rebuild / compaction / new generation
+_store = EmbeddingStore(store_key(MODEL_NAME), EMBEDDING_DIM)
+_profiles = UserProfiles(DB_DSN)
+_lock = BuilderLock(_store.root)
+_publisher: Publisher | None = None     # set in the builder process only
+_role = "starting"
+
+MAX_BATCH = 50
+MAX_LIMIT = 50
 
 
-def _load_items() -> list[dict]:
+def _load_items(item_ids: list[int] | None = None) -> list[dict]:
+    """Active items — all of them, or just those among `item_ids`."""
     conn = psycopg2.connect(DB_DSN)
     cur = conn.cursor()
-    cur.execute("""
+    cur.execute(f"""
         SELECT
             mi.item_id, mi.title, mi.category, mi.condition,
             mi.description, mi.price, mi.city, mi.state,
@@ -53,8 +104,9 @@ def _load_items() -> list[dict]:
              LIMIT 1) AS thumbnail
         FROM marketplace_items mi
         WHERE mi.is_active = true
+          {"AND mi.item_id = ANY(%s)" if item_ids is not None else ""}
         ORDER BY mi.item_id
-    """)
+    """, (item_ids,) if item_ids is not None else None)
     rows = cur.fetchall()
     conn.close()
     return [
@@ -76,40 +128,130 @@ def _load_items() -> list[dict]:
     ]
 
 
-def _build_index() -> None:
-    global _items, _embeddings, _item_index
+def _item_text(it: dict) -> str:
+    return f"{it['title']}. {it['category']}. {it['condition']}. {it['description'][:300]}"
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    return load_encoder(MODEL_NAME)
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    log.info("Computing %d embeddings…", len(texts))
+    return _encoder().encode(texts)
+
+
+def _embed_query(query: str) -> np.ndarray:
+    vec = _encoder().encode([query])[0]
+    vec.flags.writeable = False   # shared through the query cache
+    return vec
 
-    log.info("Loading SBERT model (all-MiniLM-L6-v2)…")
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+
+_search = HybridSearch(DB_DSN, _embed_query)
+
+
+def _build_index() -> None:
+    global _catalogue
 
     log.info("Fetching items from Postgres…")
-    _items = _load_items()
-    log.info("Loaded %d items", len(_items))
+    items = _load_items()
+    log.info("Loaded %d items", len(items))
 
-    texts = [
-        f"{it['title']}. {it['category']}. {it['condition']}. {it['description'][:300]}"
-        for it in _items
-    ]
+    stored = _store.sync([it["item_id"] for it in items],
+                         [_item_text(it) for it in items], _encode)
+    log.info("Embedding matrix: %s", stored.vectors.shape)
+
+    cat = Catalogue.from_items(items, stored.vectors, stored.hashes)
+    _publisher.publish_base(cat, stored.path)
+    _catalogue = cat
+    log.info("Index ready — %d items indexed (%s, %.0f MB resident, generation %d)",
+             len(cat), cat.index.name, cat.nbytes / 2**20, _publisher.generation)
+
+
+def _swap(cat: Catalogue) -> Catalogue:
+    """Compact `cat`, persist and publish it, and atomically install the result."""
+    global _catalogue
+    table, vectors, hashes = cat.live()
+    stored = _store.save(table.numeric("item_id")[:len(hashes)], hashes, vectors)
+    compacted = Catalogue(table, stored.vectors, stored.hashes)
+    _publisher.publish_base(compacted, stored.path)
+    _catalogue = compacted
+    log.info("Rebuilt index — %d items (%s)", len(compacted), compacted.index.name)
+    return compacted
+
+
+def _apply_listing_changes(item_ids: set[int] | None) -> None:
+    """ListingFeed callback: re-read changed items and update the live catalogue."""
+    if item_ids is None or _catalogue is None:
+        _build_index()
+        return
+
+    cat = _catalogue
+    current = {it["item_id"]: it for it in _load_items(sorted(item_ids))}
+    removed, replaced, encode, hashes = [], [], [], []
+    for item_id in item_ids:
+        item = current.get(item_id)
+        if item is None:
+            removed.append(item_id)
+            continue
+        row = cat.row(item_id)
+        digest = content_hashes([_item_text(item)])[0]
+        if row is not None and cat.content_hash(row) == digest:
+            replaced.append(item)
+        else:
+            encode.append(item)
+            hashes.append(digest)
 
-    log.info("Computing embeddings…")
-    _embeddings = model.encode(
-        texts,
-        batch_size=64,
-        show_progress_bar=False,
-        normalize_embeddings=True,   # unit vectors → dot product = cosine sim
-        convert_to_numpy=True,
-    )
-    log.info("Embedding matrix: %s", _embeddings.shape)
+    vectors = (_encode([_item_text(it) for it in encode]) if encode
+               else np.empty((0, EMBEDDING_DIM), dtype=np.float32))
+    hashes = np.array(hashes, dtype="S16")
+    # One Changes per delta-sized slice, so each fits after at most one compaction
+    for start in range(0, max(len(encode), 1), COMPACT_DELTA):
+        stop = start + COMPACT_DELTA
+        batch = Changes(removed if start == 0 else [], replaced if start == 0 else [],
+                        encode[start:stop], vectors[start:stop], hashes[start:stop])
+        if len(batch.appended) > cat.room:
+            cat = _swap(cat)
+        batch.apply(cat)
+        _publisher.publish_changes(batch)
+    log.info("Applied %d listing changes (%d encoded)", len(item_ids), len(encode))
 
-    _item_index = {it["item_id"]: i for i, it in enumerate(_items)}
-    log.info("Index ready — %d items indexed", len(_item_index))
+    if cat.needs_compaction:
+        _swap(cat)
+
+
+def _install(cat: Catalogue) -> None:
+    global _catalogue
+    _catalogue = cat
+
+
+def _become_builder() -> None:
+    global _publisher, _role
+    _publisher = Publisher(_store.root)
+    _role = "builder"
+    _feed.listen()
+    _build_index()
+    _feed.start()
+
+
+_feed = ListingFeed(DB_DSN, _apply_listing_changes)
+_follower = Follower(_store, _lock, _install, _become_builder)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global _role
     loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, _build_index)
+    if _lock.try_acquire():
+        await loop.run_in_executor(None, _become_builder)
+    else:
+        _role = "follower"
+        _follower.start()
     yield
+    _follower.stop()
+    _search.close()
+    await loop.run_in_executor(None, _feed.stop)
 
 
 app = FastAPI(title="ElectroHub Recommendations", lifespan=lifespan)
@@ -117,38 +259,108 @@ app = FastAPI(title="ElectroHub Recommendations", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
-    allow_methods=["GET"],
+    allow_methods=["GET", "POST"],
     allow_headers=["*"],
 )
 
 
 @app.get("/health")
 def health():
+    cat = _catalogue
     return {
         "service": "recommendation-service",
         "status": "ok",
-        "items_indexed": len(_item_index),
+        "items_indexed": len(cat) if cat else 0,
+        "index": cat.index.name if cat else None,
+        "delta_rows": cat.delta_rows if cat else 0,
+        "resident_mb": round(cat.nbytes / 2**20, 1) if cat else 0,
+        "role": _role,
+        "generation": _publisher.generation if _publisher else _follower.generation,
+        "tombstones": cat.dead if cat else 0,
     }
 
 
-@app.get("/recommendations/{item_id}")
-def get_recommendations(item_id: int, limit: int = 6):
-    if _embeddings is None or item_id not in _item_index:
-        return {"item_id": item_id, "recommendations": []}
+def _filters(
+    category: str | None = None,
+    state: str | None = None,
+    min_price: Decimal | None = None,
+    max_price: Decimal | None = None,
+    exclude_seller: str | None = None,
+    exclude_saved_by: str | None = None,
+) -> Filters:
+    saved = _profiles.saved(exclude_saved_by) if exclude_saved_by else frozenset()
+    return Filters(category=category, state=state, min_price=min_price, max_price=max_price,
+                   exclude_seller=exclude_seller, exclude_items=saved)
+
+
+def _page(cat: Catalogue, rows: np.ndarray, scores: np.ndarray) -> list[dict]:
+    """Materialise metadata for the returned rows only."""
+    return [{**cat.item(i), "similarity": round(score, 4)}
+            for i, score in zip(rows.tolist(), scores.tolist())]
+
+
+class BatchRequest(BaseModel):
+    item_ids: list[int]
+    limit: int = 6
 
-    idx = _item_index[item_id]
-    query_vec = _embeddings[idx]               # (384,)
-    scores = (_embeddings @ query_vec).tolist() # cosine sim for all items
 
-    # Sort descending, skip self
-    ranked = sorted(
-        ((s, i) for i, s in enumerate(scores) if i != idx),
-        reverse=True,
-    )
+@app.post("/recommendations/batch")
+def get_batch_recommendations(body: BatchRequest, filters: Filters = Depends(_filters)):
+    """Recommendations for several seed items in one request and one GEMM."""
+    if not 0 < len(body.item_ids) <= MAX_BATCH:
+        raise HTTPException(status_code=422, detail=f"Between 1 and {MAX_BATCH} item_ids per request")
+    limit = min(body.limit, MAX_LIMIT)
+    cat = _catalogue
+    seeds = [(iid, cat.row(iid) if cat else None) for iid in body.item_ids]
+    known = [(iid, row) for iid, row in seeds if row is not None]
 
-    results = []
-    for score, i in ranked[:limit]:
-        item = _items[i]
-        results.append({**item, "similarity": round(score, 4)})
+    pages: dict[int, list[dict]] = {}
+    if known:
+        # Seeds are never recommended back — to themselves or to each other
+        filters = replace(filters, exclude_items=filters.exclude_items | set(body.item_ids))
+        queries = cat.vectors(np.array([row for _, row in known], dtype=np.int64))
+        found = cat.search_many(queries, limit, filters)
+        for (iid, _), (rows, scores) in zip(known, found):
+            pages[iid] = _page(cat, rows, scores)
+
+    return {"results": [{"item_id": iid, "recommendations": pages.get(iid, [])}
+                        for iid, _ in seeds]}
+
+
+@app.get("/recommendations/user/{user_id}")
+def get_user_recommendations(user_id: str, limit: int = 12, filters: Filters = Depends(_filters)):
+    """Homepage personalisation: nearest items to the user's taste vector."""
+    limit = min(limit, MAX_LIMIT)
+    cat = _catalogue
+    profile = _profiles.vector(user_id, cat) if cat else None
+    if profile is None:
+        return {"user_id": user_id, "recommendations": []}
+
+    vec, seen = profile
+    filters = replace(filters, exclude_items=filters.exclude_items | seen)
+    rows, scores = cat.search(vec, limit, filters)
+    return {"user_id": user_id, "recommendations": _page(cat, rows, scores)}
+
+
+@app.get("/recommendations/search")
+def search(q: str, limit: int = 20, filters: Filters = Depends(_filters)):
+    """Keyword + semantic search, fused by reciprocal rank."""
+    cat = _catalogue
+    if cat is None or not q.strip():
+        return {"query": q, "results": []}
+
+    found = _search.search(cat, q, min(limit, MAX_LIMIT), filters)
+    return {"query": q, "results": [{**cat.item(row), "score": round(score, 4)}
+                                    for row, score in found]}
+
+
+@app.get("/recommendations/{item_id}")
+def get_recommendations(item_id: int, limit: int = 6, filters: Filters = Depends(_filters)):
+    cat = _catalogue
+    row = cat.row(item_id) if cat else None
+    if row is None:
+        return {"item_id": item_id, "recommendations": []}
 
-    return {"item_id": item_id, "recommendations": results}
+    filters = replace(filters, exclude_items=filters.exclude_items | {item_id})
+    rows, scores = cat.search(cat.vector(row), min(limit, MAX_LIMIT), filters)
+    return {"item_id": item_id, "recommendations": _page(cat, rows, scores)}
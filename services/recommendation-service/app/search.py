@@ -0,0 +1,129 @@
+"""
+Hybrid search for recommendation-service.
+
+A query is answered from two candidate lists, fused by reciprocal rank:
+
+    lexical    Postgres full-text search over title (weight A) and
+               description (weight B), ranked by ts_rank_cd. The GIN
+               expression index idx_item_text_search (database/02_indexes.sql)
+               is built on exactly DOCUMENT below — change both together or
+               the planner falls back to a sequential scan.
+    semantic   the query's SBERT embedding against the catalogue, the same
+               filtered search() recommendations use
+
+    score(item) = Σ over lists containing it  1 / (RRF_K + rank)
+
+RRF only looks at ranks, so text ranks and cosine similarities never have
+to be put on one scale: an exact keyword hit ("PS5") still ranks high when
+the embedding is vague, and "noise cancelling headphones" finds listings
+that only say "ANC earbuds".
+
+Filters go into the SQL WHERE clause on one side and the catalogue mask on
+the other, so both lists are already filtered when they're fused. The text
+query runs on a pooled connection in a worker thread while the request
+thread embeds the query and searches the index. Query embeddings are kept
+in an LRU cache (RECOMMENDATION_QUERY_CACHE_SIZE) keyed on the normalised
+query, so repeated searches skip the model entirely.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable
+
+import numpy as np
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from app.catalogue import Catalogue, Filters
+
+RRF_K       = int(os.getenv("RECOMMENDATION_SEARCH_RRF_K", 60))
+CANDIDATES  = int(os.getenv("RECOMMENDATION_SEARCH_CANDIDATES", 100))   # per list
+POOL_SIZE   = int(os.getenv("RECOMMENDATION_SEARCH_POOL_SIZE", 4))
+CACHE_SIZE  = int(os.getenv("RECOMMENDATION_QUERY_CACHE_SIZE", 4_096))
+
+DOCUMENT = ("setweight(to_tsvector('english', title), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')")
+
+
+def rrf(*rankings: list[int], k: int = RRF_K) -> list[tuple[int, float]]:
+    """Reciprocal-rank fusion of ranked lists, best first."""
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def _where(filters: Filters) -> tuple[list[str], dict]:
+    where, params = ["is_active = true"], {}
+    if filters.category is not None:
+        where.append("category = %(category)s")
+        params["category"] = filters.category
+    if filters.state is not None:
+        where.append("state = %(state)s")
+        params["state"] = filters.state
+    if filters.min_price is not None:
+        where.append("price >= %(min_price)s")
+        params["min_price"] = filters.min_price
+    if filters.max_price is not None:
+        where.append("price <= %(max_price)s")
+        params["max_price"] = filters.max_price
+    if filters.exclude_seller is not None:
+        where.append("seller_id <> %(exclude_seller)s")
+        params["exclude_seller"] = filters.exclude_seller
+    if filters.exclude_items:
+        where.append("item_id <> ALL(%(exclude_items)s)")
+        params["exclude_items"] = list(filters.exclude_items)
+    return where, params
+
+
+class HybridSearch:
+    def __init__(self, dsn: str, embed: Callable[[str], np.ndarray]):
+        self._dsn = dsn
+        self._pool: ThreadedConnectionPool | None = None
+        self._pool_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(POOL_SIZE, thread_name_prefix="lexical")
+        self._embed = lru_cache(maxsize=CACHE_SIZE)(embed)
+
+    def search(self, cat: Catalogue, query: str, limit: int,
+               filters: Filters) -> list[tuple[int, float]]:
+        """(row, fused score) for the best `limit` matches, best first."""
+        key = " ".join(query.lower().split())
+        lexical = self._executor.submit(self.lexical, key, filters)
+        vector = self._embed(key)
+        semantic, _ = cat.search(vector, CANDIDATES, filters)
+        rows = (cat.row(item_id) for item_id in lexical.result())
+        # Items the catalogue hasn't caught up with yet are dropped
+        return rrf([r for r in rows if r is not None], semantic.tolist())[:limit]
+
+    def lexical(self, query: str, filters: Filters) -> list[int]:
+        """item_ids matching `query` and `filters`, best text match first."""
+        where, params = _where(filters)
+        params.update(query=query, limit=CANDIDATES)
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(1, POOL_SIZE, self._dsn)
+        conn = self._pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT item_id
+                    FROM marketplace_items, websearch_to_tsquery('english', %(query)s) q
+                    WHERE ({DOCUMENT}) @@ q AND {" AND ".join(where)}
+                    ORDER BY ts_rank_cd({DOCUMENT}, q) DESC, item_id
+                    LIMIT %(limit)s
+                """, params)
+                ids = [r[0] for r in cur.fetchall()]
+            conn.rollback()   # close the read transaction before returning the connection
+        except psycopg2.Error:
+            self._pool.putconn(conn, close=True)
+            raise
+        self._pool.putconn(conn)
+        return ids
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        if self._pool is not None:
+            self._pool.closeall()
@@ -0,0 +1,210 @@
+"""
+Multi-process serving for recommendation-service.
+
+Run uvicorn with several workers (WEB_CONCURRENCY) and they share one copy
+of the data instead of each loading the model and building its own index:
+
+  builder    The worker holding an exclusive flock on builder.lock under
+             RECOMMENDATION_DATA_DIR. It alone loads the model, runs the
+             listing feed and builds / compacts the catalogue. Every base it
+             builds is saved next to the embedding store
+
+                 v…/serving-{generation}/index/   quantised vectors, IVF lists
+                 v…/serving-{generation}/items/   ItemTable columns
+                 v…/serving-{generation}/changes/ 00000000.npz, …
+
+             and every batch of live changes it applies is appended to
+             changes/ as one file.
+
+  followers  All other workers. They np.load the files with mmap_mode —
+             read-only for vectors and index, copy-on-write for metadata —
+             so the page cache holds a single copy for the whole host, and
+             replay changes/ through the same Catalogue methods the builder
+             used. Similarity search is plain NumPy/BLAS in each process, so
+             requests use every core.
+
+generation.json is the generation counter:
+
+    {"generation": 42, "path": "v1718…/serving-40", "changes": 2}
+
+The builder bumps it atomically (write + os.replace) after each base or
+change batch; followers poll it every RECOMMENDATION_POLL_MS and hot-swap:
+a new `path` means attach the new base and replay its changes, a higher
+`changes` means replay just the new batches.
+
+If the builder exits its flock is released, and the first follower to
+grab it on its next poll promotes itself.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from app.catalogue import Catalogue
+from app.embedding_store import EmbeddingStore
+
+log = logging.getLogger(__name__)
+
+POLL_S = int(os.getenv("RECOMMENDATION_POLL_MS", 200)) / 1000
+
+
+@dataclass
+class Changes:
+    """One batch of live updates, as applied by the builder and replayed by followers."""
+    removed: list[int]
+    replaced: list[dict]
+    appended: list[dict]
+    vectors: np.ndarray
+    hashes: np.ndarray
+
+    def apply(self, cat: Catalogue) -> None:
+        for item_id in self.removed:
+            cat.remove(item_id)
+        for item in self.replaced:
+            cat.replace(item)
+        if self.appended:
+            cat.append(self.appended, self.vectors, self.hashes)
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, removed=np.asarray(self.removed, dtype=np.int64),
+                     replaced=json.dumps(self.replaced), appended=json.dumps(self.appended),
+                     vectors=self.vectors, hashes=self.hashes)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Changes":
+        with np.load(path) as f:
+            return cls(removed=f["removed"].tolist(),
+                       replaced=json.loads(str(f["replaced"])),
+                       appended=json.loads(str(f["appended"])),
+                       vectors=f["vectors"], hashes=f["hashes"])
+
+
+def read_generation(root: Path) -> dict | None:
+    try:
+        return json.loads((root / "generation.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_generation(root: Path, doc: dict) -> None:
+    tmp = root / f".generation-{os.getpid()}.json"
+    tmp.write_text(json.dumps(doc))
+    os.replace(tmp, root / "generation.json")
+
+
+class BuilderLock:
+    def __init__(self, root: Path):
+        self._path = root / "builder.lock"
+        self._fd: int | None = None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+
+class Publisher:
+    """Builder side: saves bases and change batches and bumps the generation."""
+
+    def __init__(self, root: Path):
+        self._root = root
+        current = read_generation(root) or {}
+        self.generation = current.get("generation", 0)
+        self._dir: Path | None = None
+        self._changes = 0
+
+    def publish_base(self, cat: Catalogue, version_path: Path) -> None:
+        self.generation += 1
+        self._dir = version_path / f"serving-{self.generation}"
+        cat.save(self._dir)
+        (self._dir / "changes").mkdir()
+        self._changes = 0
+        self._bump()
+
+    def publish_changes(self, changes: Changes) -> None:
+        changes.save(self._dir / "changes" / f"{self._changes:08d}.npz")
+        self._changes += 1
+        self.generation += 1
+        self._bump()
+
+    def _bump(self) -> None:
+        _write_generation(self._root, {
+            "generation": self.generation,
+            "path": str(self._dir.relative_to(self._root)),
+            "changes": self._changes,
+        })
+
+
+class Follower:
+    """
+    Poll generation.json, keep an attached catalogue in step with the
+    builder, and hand every new Catalogue to `install`. Stops following and
+    calls `promote` once this process wins the builder lock.
+    """
+
+    def __init__(self, store: EmbeddingStore, lock: BuilderLock,
+                 install: Callable[[Catalogue], None], promote: Callable[[], None]):
+        self._store = store
+        self._root = store.root
+        self._lock = lock
+        self._install = install
+        self._promote = promote
+        self._stop = threading.Event()
+        self._cat: Catalogue | None = None
+        self._path: str | None = None
+        self._applied = 0
+        self.generation = 0
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="serving-follower", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self._lock.try_acquire():
+                    log.info("Builder lock acquired — promoting this worker to builder")
+                    self._promote()
+                    return
+                self._sync()
+            except Exception:
+                log.exception("Following generation %s failed — retrying", self.generation)
+            self._stop.wait(POLL_S)
+
+    def _sync(self) -> None:
+        doc = read_generation(self._root)
+        if doc is None or doc["generation"] == self.generation:
+            return
+        if doc["path"] != self._path:
+            version = doc["path"].split("/", 1)[0]
+            stored = self._store.load(version)
+            if stored is None:
+                return
+            self._cat = Catalogue.attach(self._root / doc["path"], stored.vectors, stored.hashes)
+            self._path, self._applied = doc["path"], 0
+        changes = self._root / doc["path"] / "changes"
+        while self._applied < doc["changes"]:
+            Changes.load(changes / f"{self._applied:08d}.npz").apply(self._cat)
+            self._applied += 1
+        self.generation = doc["generation"]
+        self._install(self._cat)
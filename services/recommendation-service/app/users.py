@@ -0,0 +1,110 @@
+"""
+User taste vectors for recommendation-service.
+
+A user's vector is the weighted mean of the embeddings of items they
+interacted with, re-normalised to unit length:
+
+    item_saved                           weight SAVE_WEIGHT
+    user_activity  save_item / send_message / view_item   ACTIVITY_WEIGHTS
+
+each decayed by 0.5 ** (age_days / RECOMMENDATION_USER_HALF_LIFE_DAYS), so
+last week's browsing outweighs last quarter's. Only the newest HISTORY_LIMIT
+interactions are read.
+
+Vectors are cached per process for RECOMMENDATION_USER_TTL_S, so a homepage
+that re-renders is one mat-vec product and no database round trip.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import psycopg2
+
+from app.catalogue import Catalogue
+
+HALF_LIFE_DAYS = float(os.getenv("RECOMMENDATION_USER_HALF_LIFE_DAYS", 14))
+TTL_S          = int(os.getenv("RECOMMENDATION_USER_TTL_S", 300))
+CACHE_SIZE     = int(os.getenv("RECOMMENDATION_USER_CACHE_SIZE", 10_000))
+HISTORY_LIMIT  = 200
+
+SAVE_WEIGHT = 3.0
+ACTIVITY_WEIGHTS = {"save_item": 3.0, "send_message": 2.0, "view_item": 1.0}
+
+_HISTORY = """
+    SELECT item_id, kind, EXTRACT(EPOCH FROM NOW() - at) / 86400 AS age_days
+    FROM (
+        SELECT item_id, 'saved' AS kind, saved_at AS at
+        FROM item_saved WHERE user_id = %(uid)s
+        UNION ALL
+        SELECT item_id, activity_type, created_at
+        FROM user_activity
+        WHERE user_id = %(uid)s AND item_id IS NOT NULL
+          AND activity_type = ANY(%(kinds)s)
+    ) h
+    ORDER BY at DESC
+    LIMIT %(limit)s
+"""
+
+
+class UserProfiles:
+    def __init__(self, dsn: str):
+        self._dsn = dsn
+        self._cache: OrderedDict[str, tuple[float, np.ndarray, frozenset[int]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def vector(self, user_id: str, cat: Catalogue) -> tuple[np.ndarray, frozenset[int]] | None:
+        """(unit taste vector, item_ids it was built from), or None without history."""
+        with self._lock:
+            hit = self._cache.get(user_id)
+            if hit and hit[0] > time.monotonic():
+                self._cache.move_to_end(user_id)
+                return hit[1], hit[2]
+
+        built = self._build(user_id, cat)
+        if built is None:
+            return None
+        with self._lock:
+            self._cache[user_id] = (time.monotonic() + TTL_S, *built)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return built
+
+    def saved(self, user_id: str) -> frozenset[int]:
+        conn = psycopg2.connect(self._dsn)
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT item_id FROM item_saved WHERE user_id = %s", (user_id,))
+            return frozenset(r[0] for r in cur.fetchall())
+        finally:
+            conn.close()
+
+    def _build(self, user_id: str, cat: Catalogue) -> tuple[np.ndarray, frozenset[int]] | None:
+        conn = psycopg2.connect(self._dsn)
+        try:
+            cur = conn.cursor()
+            cur.execute(_HISTORY, {"uid": user_id, "kinds": list(ACTIVITY_WEIGHTS),
+                                   "limit": HISTORY_LIMIT})
+            history = cur.fetchall()
+        finally:
+            conn.close()
+
+        rows, weights = [], []
+        for item_id, kind, age_days in history:
+            row = cat.row(item_id)
+            if row is None:
+                continue
+            weight = SAVE_WEIGHT if kind == "saved" else ACTIVITY_WEIGHTS[kind]
+            rows.append(row)
+            weights.append(weight * 0.5 ** (float(age_days) / HALF_LIFE_DAYS))
+        if not rows:
+            return None
+
+        vec = np.asarray(weights, dtype=np.float32) @ cat.vectors(np.asarray(rows, dtype=np.int64))
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return None
+        return vec / norm, frozenset(h[0] for h in history)
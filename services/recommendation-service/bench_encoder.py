@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+bench_encoder.py — throughput and embedding drift of the encoder backends.
+
+Run inside Docker (no database needed — synthetic listings):
+    docker exec electrohub-recommendation-service python3 bench_encoder.py
+    docker exec electrohub-recommendation-service python3 bench_encoder.py --items 20000 --backends torch onnx-int8
+
+Listing texts are generated in the service's "title. category. condition.
+description" shape, with descriptions from a few words up to the 300
+characters the service keeps, so batches mix short and long texts as the
+real catalogue does.
+
+    items/s       full re-index throughput, one encode() call over every item
+    p50/p99 ms    single-text latency — a search query or one new listing
+    cos mean/min  cosine between each backend's embedding and the first
+                  backend's (torch by default)
+    top-k         overlap of each item's k nearest neighbours with the first
+                  backend's — what the drift actually costs recommendations
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.encoder import load_encoder
+
+MODEL = "all-MiniLM-L6-v2"
+
+BRANDS = ["Sony", "Apple", "Samsung", "Dell", "Lenovo", "Bose", "Nintendo", "Canon", "LG", "Asus"]
+PRODUCTS = ["wireless headphones", "noise cancelling earbuds", "gaming laptop", "4K monitor",
+            "mirrorless camera", "smartphone", "tablet", "mechanical keyboard", "Switch console",
+            "soundbar", "smartwatch", "graphics card", "bluetooth speaker", "e-reader"]
+CATEGORIES = ["Audio", "Computers", "Phones", "Gaming", "Cameras", "TV & Video", "Wearables"]
+CONDITIONS = ["new", "like_new", "good", "fair"]
+PHRASES = ["barely used", "comes with original box and charger", "minor scratches on the back",
+           "battery health 92%", "pickup only", "price negotiable", "includes carrying case",
+           "factory reset and ready to go", "selling because I upgraded", "works perfectly",
+           "screen has no dead pixels", "firmware updated last month", "receipt available"]
+
+
+def synthetic_listings(n: int, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(n):
+        # A model number keeps titles distinct, so neighbour lists have no exact ties
+        title = f"{rng.choice(BRANDS)} {rng.choice(PRODUCTS)} {rng.integers(100, 10_000)}"
+        phrases = rng.choice(PHRASES, size=rng.integers(0, 12))
+        description = ". ".join(phrases)[:300]
+        texts.append(f"{title}. {rng.choice(CATEGORIES)}. {rng.choice(CONDITIONS)}. {description}")
+    return texts
+
+
+def neighbours(vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = vectors @ vectors.T
+    np.fill_diagonal(scores, -np.inf)
+    return np.argpartition(-scores, k, axis=1)[:, :k]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=5_000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    args = ap.parse_args()
+
+    texts = synthetic_listings(args.items)
+    queries = synthetic_listings(args.queries, seed=1)
+    print(f"\n{args.items:,} listings, {args.queries} single-text queries, {MODEL}")
+
+    results, reference = [], None
+    for backend in args.backends:
+        encoder = load_encoder(MODEL, backend)
+        encoder.encode(texts[:64])   # warm up
+
+        t0 = time.perf_counter()
+        vectors = encoder.encode(texts)
+        throughput = len(texts) / (time.perf_counter() - t0)
+
+        latencies = []
+        for q in queries:
+            t0 = time.perf_counter()
+            encoder.encode([q])
+            latencies.append(time.perf_counter() - t0)
+        lat = np.array(latencies) * 1000
+
+        if reference is None:
+            reference = vectors, neighbours(vectors, args.k)
+        cos = np.einsum("ij,ij->i", vectors, reference[0])
+        found = neighbours(vectors, args.k)
+        overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, reference[1])])
+        results.append((backend, throughput, np.percentile(lat, 50), np.percentile(lat, 99),
+                        cos.mean(), cos.min(), overlap))
+
+    print(f"  {'backend':<12}{'items/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'cos mean':>10}{'cos min':>9}{'top-' + str(args.k):>8}")
+    for name, throughput, p50, p99, cos_mean, cos_min, overlap in results:
+        print(f"  {name:<12}{throughput:>10.0f}{p50:>9.2f}{p99:>9.2f}"
+              f"{cos_mean:>10.4f}{cos_min:>9.4f}{overlap:>8.3f}")
+    print(f"  (drift is measured against {args.backends[0]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+bench_index.py — recall and latency of the recommendation indexes.
+
+Run inside Docker (no database or model needed — synthetic data):
+    docker exec electrohub-recommendation-service python3 bench_index.py
+    docker exec electrohub-recommendation-service python3 bench_index.py --sizes 100000 --nprobe 8 16 32
+
+The catalogue is simulated as unit vectors drawn around random "product
+clusters" (384-dim, like all-MiniLM-L6-v2). Queries are catalogue items,
+as in item→item recommendations. Recall@k is measured against the float32
+exact index; latencies are single-query, as served per request. "MB" is the
+index's resident size — with int8/float16 the float32 vectors used for
+rescoring stay on the embedding store's memory map in production.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.index import ExactIndex, HNSWIndex, IVFIndex
+
+DIM = 384
+
+
+def synthetic_catalogue(n: int, clusters: int = 2_000, spread: float = 0.6, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, DIM), dtype=np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    out = np.empty((n, DIM), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        m = min(100_000, n - start)
+        noise = rng.standard_normal((m, DIM), dtype=np.float32) * (spread / np.sqrt(DIM))
+        out[start:start + m] = centres[rng.integers(0, clusters, m)] + noise
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out
+
+
+def bench(index, vectors, queries, truth, k):
+    latencies, hits = [], 0
+    for q, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        rows, _ = index.search(vectors[q], k)
+        latencies.append(time.perf_counter() - t0)
+        hits += len(set(rows.tolist()) & expected)
+    lat = np.array(latencies) * 1000
+    return hits / (len(queries) * k), np.percentile(lat, 50), np.percentile(lat, 99)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    ap.add_argument("--precisions", nargs="+", default=["float16", "int8"])
+    args = ap.parse_args()
+
+    for n in args.sizes:
+        print(f"\n{n:,} items × {DIM} dims")
+        vectors = synthetic_catalogue(n)
+        queries = np.random.default_rng(1).choice(n, args.queries, replace=False)
+
+        results = []
+        t0 = time.perf_counter()
+        exact = ExactIndex(precision="float32")
+        exact.build(vectors)
+        exact_build = time.perf_counter() - t0
+        truth = [set(exact.search(vectors[q], args.k)[0].tolist()) for q in queries]
+        results.append(("exact float32", exact_build, exact.nbytes,
+                        *bench(exact, vectors, queries, truth, args.k)))
+
+        for precision in args.precisions:
+            t0 = time.perf_counter()
+            quantized = ExactIndex(precision=precision)
+            quantized.build(vectors)
+            results.append((f"exact {precision}", time.perf_counter() - t0, quantized.nbytes,
+                            *bench(quantized, vectors, queries, truth, args.k)))
+
+        for precision in ("float32", *args.precisions):
+            t0 = time.perf_counter()
+            ivf = IVFIndex(precision=precision)
+            ivf.build(vectors)
+            ivf_build = time.perf_counter() - t0
+            for nprobe in args.nprobe:
+                ivf.nprobe = nprobe
+                results.append((f"ivf {precision} nprobe={nprobe}", ivf_build, ivf.nbytes,
+                                *bench(ivf, vectors, queries, truth, args.k)))
+
+        try:
+            t0 = time.perf_counter()
+            hnsw = HNSWIndex()
+            hnsw.build(vectors)
+            results.append((f"hnsw ef={hnsw.ef}", time.perf_counter() - t0, hnsw.nbytes,
+                            *bench(hnsw, vectors, queries, truth, args.k)))
+        except ImportError:
+            print("  (hnswlib not installed — skipping hnsw)")
+
+        print(f"  {'index':<28}{'build s':>9}{'MB':>8}{'recall@' + str(args.k):>11}{'p50 ms':>9}{'p99 ms':>9}")
+        for name, build_s, nbytes, recall, p50, p99 in results:
+            print(f"  {name:<28}{build_s:>9.1f}{nbytes / 2**20:>8.0f}{recall:>11.3f}{p50:>9.3f}{p99:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
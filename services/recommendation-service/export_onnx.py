@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+export_onnx.py — export the SBERT encoder for the ONNX backends (app.encoder).
+
+Run once at image build, after the model weights are downloaded:
+    python3 export_onnx.py                      # → /app/onnx/all-MiniLM-L6-v2/
+
+Writes, under RECOMMENDATION_ONNX_DIR/<model>/:
+    model.onnx         the transformer (token ids → last hidden state), fp32
+    model-int8.onnx    the same with int8 weights (dynamic quantisation —
+                       activations are quantised per batch at run time, so
+                       no calibration data is needed)
+    tokenizer.json     the fast tokenizer, for the `tokenizers` library
+
+Pooling and normalisation are left out of the graph; OnnxEncoder does them
+in NumPy, masked by the real token count of each row.
+"""
+
+import argparse
+from pathlib import Path
+
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from sentence_transformers import SentenceTransformer
+
+from app.encoder import ONNX_DIR, ONNX_FILES
+
+OPSET = 14
+
+
+def export(model_name: str, out: Path) -> None:
+    out.mkdir(parents=True, exist_ok=True)
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+    st.tokenizer.save_pretrained(out)
+
+    dummy = st.tokenizer(["an example listing"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {"batch": 0, "tokens": 1}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(dummy[n] for n in names),
+            out / ONNX_FILES["onnx"],
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={n: dynamic for n in [*names, "last_hidden_state"]},
+            opset_version=OPSET,
+        )
+    quantize_dynamic(out / ONNX_FILES["onnx"], out / ONNX_FILES["onnx-int8"],
+                     weight_type=QuantType.QInt8)
+    print(f"Exported {model_name} → {out}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default="all-MiniLM-L6-v2")
+    ap.add_argument("--out", type=Path, default=ONNX_DIR)
+    args = ap.parse_args()
+    export(args.model, args.out / args.model)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Durable event log on Redis Streams.
+
+Pub/Sub is fire-and-forget: an event published while a subscriber is
+restarting is gone. Streams keep the log, and consumer groups give each
+service its own cursor plus load-balancing across replicas:
+
+    producer ──XADD electrohub:stream:{event} MAXLEN ~N──► stream
+                                                           │
+                    XREADGROUP (group = service name) ─────┤
+                    replica A ◄── entries 1, 3, 5          │
+                    replica B ◄── entries 2, 4, 6 ─────────┘
+                    XACK after the handler succeeds
+
+Failure handling:
+  - A handler that raises leaves the entry pending (not acked).
+  - A handler may instead return a concurrent Future for work it handed
+    off (e.g. a buffered email). The entry is acked when the Future
+    succeeds and left pending if it fails, without holding up the rest of
+    the batch. Keep claim_idle_ms above how long that work can take, or
+    XAUTOCLAIM hands the entry out again meanwhile.
+  - Every `claim_every_s` each consumer XAUTOCLAIMs entries that have been
+    pending for longer than `claim_idle_ms` — from itself or from a replica
+    that died — and retries them.
+  - Entries delivered more than `max_deliveries` times are copied to
+    electrohub:stream:dead and acked so they stop cycling.
+  - On start a consumer reads its own pending entries once, walking the
+    ID forward past each page, then switches to new ones (">"). Entries
+    that fail again are left to XAUTOCLAIM / dead-lettering — re-reading
+    from "0" would hand them straight back and reset their idle time.
+
+Metrics: per stream/group lag (entries not yet delivered to the group,
+from XINFO GROUPS) and pending count, plus processed entries by outcome.
+Defined here rather than in app.core.metrics because the backend copies
+this module too (backend/Dockerfile) for its RedisStreamsEventBus, so the
+monolith and the microservices share the same log.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Iterable
+
+import structlog
+from prometheus_client import Counter, Gauge
+
+from app.core.redis_client import get_async_redis_client, get_redis_client
+
+log = structlog.get_logger()
+
+STREAM_PREFIX = "electrohub:stream:"
+DEAD_STREAM   = f"{STREAM_PREFIX}dead"
+STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", 100_000))
+
+Handler = Callable[[str, dict], Awaitable[Future | None]]   # (event, payload)
+
+event_stream_entries = Counter(
+    "electrohub_event_stream_entries_total",
+    "Stream entries processed by a consumer group",
+    ["stream", "group", "outcome"],   # outcome: "ok" | "redelivered" | "claimed" | "failed" | "dead"
+)
+
+event_stream_lag = Gauge(
+    "electrohub_event_stream_group_lag",
+    "Entries in the stream not yet delivered to the consumer group",
+    ["stream", "group"],
+)
+
+event_stream_pending = Gauge(
+    "electrohub_event_stream_group_pending",
+    "Entries delivered to the consumer group but not yet acked",
+    ["stream", "group"],
+)
+
+
+def publish_stream_event(event: str, payload: dict) -> None:
+    """
+    XADD with approximate MAXLEN trimming. Never raises — the primary
+    request must not fail because of an event.
+    """
+    try:
+        get_redis_client().xadd(
+            f"{STREAM_PREFIX}{event}", {"data": json.dumps(payload)},
+            maxlen=STREAM_MAXLEN, approximate=True,
+        )
+    except Exception as exc:
+        log.error("stream_publish_failed", event=event, error=str(exc))
+
+
+class StreamConsumer:
+    def __init__(self, group: str, events: Iterable[str], handler: Handler, *,
+                 batch: int = 100, block_ms: int = 5_000,
+                 claim_idle_ms: int = 60_000, claim_every_s: float = 30,
+                 max_deliveries: int = 5):
+        self.group = group
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._streams = {f"{STREAM_PREFIX}{e}": e for e in events}
+        self._handler = handler
+        self._batch = batch
+        self._block_ms = block_ms
+        self._claim_idle_ms = claim_idle_ms
+        self._claim_every_s = claim_every_s
+        self._max_deliveries = max_deliveries
+        self._settling: set[asyncio.Task] = set()
+
+    async def run(self) -> None:
+        """Long-running coroutine; cancel it to shut down."""
+        redis = get_async_redis_client()
+        await self._ensure_groups(redis)
+        log.info("stream_consumer_started", group=self.group,
+                 consumer=self.consumer, streams=list(self._streams))
+
+        try:
+            await self._drain_pending(redis)
+        except Exception as exc:   # whatever is left is reclaimed by XAUTOCLAIM
+            log.error("stream_pending_read_failed", group=self.group, error=str(exc))
+        next_claim = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_claim:
+                    await self._maintenance(redis)
+                    next_claim = time.monotonic() + self._claim_every_s
+
+                resp = await redis.xreadgroup(
+                    self.group, self.consumer,
+                    {s: ">" for s in self._streams},
+                    count=self._batch, block=self._block_ms,
+                )
+                for stream, entries in resp or []:
+                    await self._process(redis, stream, entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                log.error("stream_consumer_error", group=self.group, error=str(exc))
+                await asyncio.sleep(1)
+
+    async def _ensure_groups(self, redis) -> None:
+        for stream in self._streams:
+            try:
+                # "$": a brand-new group starts at the tail instead of replaying history
+                await redis.xgroup_create(stream, self.group, id="$", mkstream=True)
+            except Exception as exc:
+                if "BUSYGROUP" not in str(exc):
+                    raise
+
+    async def _drain_pending(self, redis) -> None:
+        """One pass over this consumer's pending entries, left by a previous run."""
+        for stream in self._streams:
+            after = "0"
+            while True:
+                resp = await redis.xreadgroup(self.group, self.consumer, {stream: after},
+                                              count=self._batch)
+                entries = resp[0][1] if resp else []
+                if not entries:
+                    break
+                await self._process(redis, stream, entries, outcome="redelivered")
+                after = entries[-1][0]
+
+    async def _process(self, redis, stream: str, entries, outcome: str = "ok") -> None:
+        event = self._streams[stream]
+        acked = []
+        for entry_id, fields in entries:
+            if not fields:   # trimmed by MAXLEN while pending
+                acked.append(entry_id)
+                continue
+            try:
+                held = await self._handler(event, json.loads(fields["data"]))
+            except Exception as exc:
+                event_stream_entries.labels(stream=event, group=self.group, outcome="failed").inc()
+                log.error("stream_entry_failed", stream=stream, id=entry_id, error=str(exc))
+                continue
+            if held is not None:
+                task = asyncio.create_task(self._settle(redis, stream, entry_id, held, outcome))
+                self._settling.add(task)
+                task.add_done_callback(self._settling.discard)
+                continue
+            acked.append(entry_id)
+            event_stream_entries.labels(stream=event, group=self.group, outcome=outcome).inc()
+        if acked:
+            await redis.xack(stream, self.group, *acked)
+
+    async def _settle(self, redis, stream: str, entry_id: str, held: Future, outcome: str) -> None:
+        """Ack an entry once the work its handler handed off has finished."""
+        event = self._streams[stream]
+        try:
+            await asyncio.wrap_future(held)
+            await redis.xack(stream, self.group, entry_id)
+        except Exception as exc:
+            event_stream_entries.labels(stream=event, group=self.group, outcome="failed").inc()
+            log.error("stream_entry_failed", stream=stream, id=entry_id, error=str(exc))
+            return
+        event_stream_entries.labels(stream=event, group=self.group, outcome=outcome).inc()
+
+    async def _maintenance(self, redis) -> None:
+        for stream, event in self._streams.items():
+            await self._bury_poison(redis, stream, event)
+            _next, claimed, *_ = await redis.xautoclaim(
+                stream, self.group, self.consumer,
+                min_idle_time=self._claim_idle_ms, start_id="0-0", count=self._batch,
+            )
+            if claimed:
+                log.warning("stream_entries_claimed", stream=stream, count=len(claimed))
+                await self._process(redis, stream, claimed, outcome="claimed")
+
+            for info in await redis.xinfo_groups(stream):
+                if info["name"] == self.group:
+                    event_stream_lag.labels(stream=event, group=self.group).set(info.get("lag") or 0)
+                    event_stream_pending.labels(stream=event, group=self.group).set(info["pending"])
+
+    async def _bury_poison(self, redis, stream: str, event: str) -> None:
+        pending = await redis.xpending_range(
+            stream, self.group, min="-", max="+", count=self._batch,
+            idle=self._claim_idle_ms,
+        )
+        poison = [p["message_id"] for p in pending if p["times_delivered"] >= self._max_deliveries]
+        for entry_id in poison:
+            for _id, fields in await redis.xrange(stream, min=entry_id, max=entry_id):
+                await redis.xadd(DEAD_STREAM, {**fields, "stream": stream, "group": self.group},
+                                 maxlen=STREAM_MAXLEN, approximate=True)
+            await redis.xack(stream, self.group, entry_id)
+            event_stream_entries.labels(stream=event, group=self.group, outcome="dead").inc()
+        if poison:
+            log.error("stream_entries_dead_lettered", stream=stream, count=len(poison))
@@ -8,14 +8,50 @@ Topics:
   electrohub.user.login     — user logged in
 
 These events feed the Spark ETL pipeline → ML recommendations.
-Producer is created once per process (lru_cache) and is thread-safe.
+
+Topic profiles:
+  Producer settings in kafka-python are per producer, so each profile gets
+  its own KafkaProducer (created once per process, thread-safe):
+
+    bulk      item_viewed — the hottest endpoint. acks=1, 20ms linger,
+              64KB batches, lz4. Many views share one compressed request.
+    reliable  everything else. acks=all, 5ms linger, lz4.
+
+  Every knob is overridable via KAFKA_<PROFILE>_{LINGER_MS,BATCH_SIZE,
+  COMPRESSION,ACKS}. COMPRESSION accepts gzip | snappy | lz4 | zstd | none;
+  a codec whose library isn't installed (snappy needs python-snappy) is
+  rejected at import rather than on the first send.
+
+Delivery tracking:
+  Each send() gets callbacks that feed electrohub_kafka_events_total
+  (delivered / failed / spilled / dropped) and the send→ack latency
+  histogram electrohub_kafka_delivery_seconds.
+
+Spill buffer:
+  If the producer cannot be built or the broker rejects / times out a
+  send, the event goes into a bounded in-memory deque (KAFKA_SPILL_MAX,
+  oldest dropped first). The next publish() after KAFKA_SPILL_RETRY_S
+  replays it. max_block_ms is kept small so an outage costs a request at
+  most ~100ms instead of kafka-python's default 60s.
+
+Testing:
+  EventProducer(producer_factory=...) accepts any callable returning an
+  object with send(topic, value=, key=) → future(add_callback, add_errback)
+  and flush(timeout), so it runs against a fake or a single-node broker.
 """
 
+import importlib.util
 import os
 import json
-import structlog
+import threading
+import time
+from collections import deque
 from functools import lru_cache
 
+import structlog
+
+from app.core.metrics import kafka_events, kafka_delivery_seconds, kafka_spill_size
+
 log = structlog.get_logger()
 
 KAFKA_BROKERS = os.getenv("KAFKA_BROKERS", "kafka:9092")
@@ -28,18 +64,146 @@ TOPICS = {
 }
 
 
-@lru_cache(maxsize=1)
-def _get_producer():
+# compression_type → module kafka-python needs for it (gzip is stdlib)
+_CODECS = {"gzip": None, "snappy": "snappy", "lz4": "lz4", "zstd": "zstandard"}
+
+
+def _profile(name: str, acks, linger_ms: int, batch_size: int, compression: str) -> dict:
+    prefix = f"KAFKA_{name.upper()}_"
+    acks = os.getenv(prefix + "ACKS", str(acks))
+    compression = os.getenv(prefix + "COMPRESSION", compression)
+    if compression != "none":
+        if compression not in _CODECS:
+            raise ValueError(f"{prefix}COMPRESSION={compression!r}: "
+                             f"expected one of {', '.join(_CODECS)} or none")
+        module = _CODECS[compression]
+        if module and importlib.util.find_spec(module) is None:
+            raise RuntimeError(f"{prefix}COMPRESSION={compression!r} needs the "
+                               f"'{module}' package, which is not installed")
+    return {
+        "acks": acks if acks == "all" else int(acks),
+        "linger_ms": int(os.getenv(prefix + "LINGER_MS", linger_ms)),
+        "batch_size": int(os.getenv(prefix + "BATCH_SIZE", batch_size)),
+        "compression_type": None if compression == "none" else compression,
+    }
+
+
+PROFILES = {
+    "bulk":     _profile("bulk",     acks=1,     linger_ms=20, batch_size=64 * 1024, compression="lz4"),
+    "reliable": _profile("reliable", acks="all", linger_ms=5,  batch_size=16 * 1024, compression="lz4"),
+}
+
+TOPIC_PROFILES = {
+    "item_viewed":  "bulk",
+    "item_saved":   "reliable",
+    "message_sent": "reliable",
+    "user_login":   "reliable",
+}
+
+MAX_BLOCK_MS  = int(os.getenv("KAFKA_MAX_BLOCK_MS", 100))
+SPILL_MAX     = int(os.getenv("KAFKA_SPILL_MAX", 10_000))
+SPILL_RETRY_S = float(os.getenv("KAFKA_SPILL_RETRY_S", 5))
+REPLAY_BATCH  = int(os.getenv("KAFKA_REPLAY_BATCH", 500))
+
+
+def _kafka_producer(**profile):
     from kafka import KafkaProducer
     return KafkaProducer(
         bootstrap_servers=KAFKA_BROKERS,
         value_serializer=lambda v: json.dumps(v).encode("utf-8"),
         key_serializer=lambda k: k.encode("utf-8") if k else None,
-        acks="all",
         retries=3,
+        max_block_ms=MAX_BLOCK_MS,
+        **profile,
     )
 
 
+class EventProducer:
+    def __init__(self, producer_factory=_kafka_producer, spill_max: int = SPILL_MAX):
+        self._factory = producer_factory
+        self._producers: dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._spill: deque = deque()
+        self._spill_max = spill_max
+        self._next_replay = 0.0
+
+    def publish(self, topic_key: str, event: dict, key: str | None = None) -> None:
+        if self._spill and time.monotonic() >= self._next_replay:
+            self._replay()
+        self._send(topic_key, event, key)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        for producer in list(self._producers.values()):
+            producer.flush(timeout=timeout)
+
+    @property
+    def spilled(self) -> int:
+        return len(self._spill)
+
+    # ── internals ─────────────────────────────────────────────────────────── #
+
+    def _producer(self, profile: str):
+        producer = self._producers.get(profile)
+        if producer is None:
+            with self._lock:
+                producer = self._producers.get(profile)
+                if producer is None:
+                    producer = self._factory(**PROFILES[profile])
+                    self._producers[profile] = producer
+        return producer
+
+    def _send(self, topic_key: str, event: dict, key: str | None) -> bool:
+        topic = TOPICS.get(topic_key, topic_key)
+        profile = TOPIC_PROFILES.get(topic_key, "reliable")
+        t0 = time.perf_counter()
+        try:
+            future = self._producer(profile).send(topic, value=event, key=key)
+        except Exception as exc:
+            self._spill_event(topic_key, event, key, exc)
+            return False
+        future.add_callback(self._on_delivered, topic_key, t0)
+        future.add_errback(self._on_failed, topic_key, event, key)
+        return True
+
+    def _on_delivered(self, topic_key: str, t0: float, _metadata) -> None:
+        kafka_events.labels(topic=topic_key, outcome="delivered").inc()
+        kafka_delivery_seconds.labels(topic=topic_key).observe(time.perf_counter() - t0)
+
+    def _on_failed(self, topic_key: str, event: dict, key: str | None, exc) -> None:
+        # Runs on the producer's I/O thread — only touch the deque here
+        kafka_events.labels(topic=topic_key, outcome="failed").inc()
+        self._spill_event(topic_key, event, key, exc)
+
+    def _spill_event(self, topic_key: str, event: dict, key: str | None, exc) -> None:
+        with self._lock:
+            if len(self._spill) >= self._spill_max:
+                self._spill.popleft()
+                kafka_events.labels(topic=topic_key, outcome="dropped").inc()
+            self._spill.append((topic_key, event, key))
+            size = len(self._spill)
+        kafka_events.labels(topic=topic_key, outcome="spilled").inc()
+        kafka_spill_size.set(size)
+        log.warning("kafka_event_spilled", topic=topic_key, spilled=size, error=str(exc))
+
+    def _replay(self) -> None:
+        with self._lock:
+            self._next_replay = time.monotonic() + SPILL_RETRY_S
+            batch = [self._spill.popleft() for _ in range(min(REPLAY_BATCH, len(self._spill)))]
+        for i, (topic_key, event, key) in enumerate(batch):
+            if not self._send(topic_key, event, key):
+                # Still down: _send re-spilled this one; put the rest back too
+                with self._lock:
+                    self._spill.extendleft(reversed(batch[i + 1:]))
+                break
+        kafka_spill_size.set(len(self._spill))
+        log.info("kafka_spill_replayed", attempted=len(batch), remaining=len(self._spill))
+
+
+@lru_cache(maxsize=1)
+def get_event_producer() -> EventProducer:
+    return EventProducer()
+
+
 def publish(topic_key: str, event: dict, key: str | None = None) -> None:
     """
     Fire-and-forget publish. Never raises — a Kafka outage must not
@@ -48,9 +212,7 @@ def publish(topic_key: str, event: dict, key: str | None = None) -> None:
     topic_key: one of the TOPICS dict keys, e.g. "item_viewed"
     key: partition key (e.g. user_id for user events)
     """
-    topic = TOPICS.get(topic_key, topic_key)
     try:
-        _get_producer().send(topic, value=event, key=key)
-        log.info("kafka_published", topic=topic, key=key)
+        get_event_producer().publish(topic_key, event, key=key)
     except Exception as exc:
-        log.error("kafka_publish_failed", topic=topic, error=str(exc))
+        log.error("kafka_publish_failed", topic=topic_key, error=str(exc))
@@ -0,0 +1,136 @@
+"""
+Prometheus metrics for the ElectroHub microservices.
+
+Lives in services/shared/ so every service gets the same metric names
+(copied to app/core/ by each Dockerfile). Only services that import this
+module need prometheus-client installed.
+
+Exposure:
+  - FastAPI services call setup_metrics(app) → GET /metrics plus the
+    standard http_requests_total / http_request_duration_seconds.
+  - notification-service has no HTTP API → start_metrics_server(port)
+    starts the prometheus_client HTTP exporter on its own port.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# ── Notification jobs (RabbitMQ consumer) ─────────────────────────────────── #
+
+notification_jobs = Counter(
+    "electrohub_notification_jobs_total",
+    "Notification jobs processed by notification-service",
+    ["type", "outcome"],   # outcome: "ok" | "retried" | "dead"
+)
+
+notification_job_seconds = Histogram(
+    "electrohub_notification_job_duration_seconds",
+    "Handler time per notification job",
+    ["type"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10),
+)
+
+notification_jobs_in_progress = Gauge(
+    "electrohub_notification_jobs_in_progress",
+    "Notification jobs currently running on the worker pool",
+)
+
+
+# ── Kafka producer ────────────────────────────────────────────────────────── #
+
+kafka_events = Counter(
+    "electrohub_kafka_events_total",
+    "Kafka events by delivery outcome",
+    ["topic", "outcome"],  # outcome: "delivered" | "failed" | "spilled" | "dropped"
+)
+
+kafka_delivery_seconds = Histogram(
+    "electrohub_kafka_delivery_seconds",
+    "Time from send() to broker acknowledgement",
+    ["topic"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+kafka_spill_size = Gauge(
+    "electrohub_kafka_spill_buffer_size",
+    "Events held locally while the broker is unreachable",
+)
+
+
+# ── WebSocket delivery (messaging-service) ────────────────────────────────── #
+
+ws_connections = Gauge(
+    "electrohub_ws_connections",
+    "Open chat WebSockets on this instance",
+)
+
+ws_send_seconds = Histogram(
+    "electrohub_ws_send_seconds",
+    "Time to write one frame to a WebSocket",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+
+ws_queue_depth = Histogram(
+    "electrohub_ws_queue_depth",
+    "Per-socket outbound queue depth observed at enqueue",
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+ws_sent_bytes = Counter(
+    "electrohub_ws_sent_bytes_total",
+    "Bytes written to chat WebSockets",
+    ["protocol"],   # "json" | "msgpack"
+)
+
+ws_delivered_messages = Counter(
+    "electrohub_ws_delivered_messages_total",
+    "Messages delivered to chat WebSockets (coalesced frames count each message)",
+    ["protocol"],
+)
+
+ws_coalesced_messages = Histogram(
+    "electrohub_ws_coalesced_messages",
+    "Messages per binary WebSocket frame",
+    buckets=(1, 2, 4, 8, 16, 32),
+)
+
+ws_slow_consumers = Counter(
+    "electrohub_ws_slow_consumers_total",
+    "Frames dropped or sockets closed because an outbound queue was full",
+    ["action"],   # "drop" | "disconnect"
+)
+
+
+message_writer_batch_size = Histogram(
+    "electrohub_message_writer_batch_size",
+    "Chat messages written per group commit",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+message_writer_flush_seconds = Histogram(
+    "electrohub_message_writer_flush_seconds",
+    "INSERT + COMMIT time of one group commit",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+
+notifications_suppressed = Counter(
+    "electrohub_notifications_suppressed_total",
+    "Message notifications not sent because the recipient was online",
+    ["service"],
+)
+
+
+# ── Wiring ────────────────────────────────────────────────────────────────── #
+
+def setup_metrics(app) -> None:
+    """Call once in main.py after the app is created."""
+    from prometheus_fastapi_instrumentator import Instrumentator
+    Instrumentator(
+        should_group_status_codes=True,
+        should_ignore_untemplated=True,
+        excluded_handlers=["/health", "/metrics", "/docs", "/openapi.json", "/redoc"],
+    ).instrument(app).expose(app, endpoint="/metrics", include_in_schema=False)
+
+
+def start_metrics_server(port: int) -> None:
+    """Serve /metrics from a background thread (for non-HTTP services)."""
+    start_http_server(port)
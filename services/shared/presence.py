@@ -0,0 +1,146 @@
+"""
+Cluster-wide presence registry for chat users.
+
+One Redis hash per user, one field per messaging replica holding a socket
+for that user:
+
+    electrohub:presence:{user_id}   {instance_id: last_heartbeat_epoch}   EXPIRE ttl
+
+  - join():  the user's first local socket writes this replica's field.
+  - leave(): the user's last local socket removes it.
+  - run_heartbeat(): refreshes every locally online user in one pipeline
+    every ttl/3 seconds. A replica that dies stops refreshing: its field
+    goes stale after `ttl` (ignored by readers) and the key expires.
+
+Reads are sync — they run on notification paths in threadpool / consumer
+threads — and cached per process for PRESENCE_CACHE_S. Users with a
+socket on this replica are answered without touching Redis at all.
+
+A stale "online" answer costs at most one skipped email for someone who
+disconnected seconds ago; the chat history still has the message.
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from collections import Counter
+from typing import Iterable
+
+import structlog
+
+from app.core.redis_client import get_async_redis_client, get_redis_client
+
+log = structlog.get_logger()
+
+KEY_PREFIX   = "electrohub:presence:"
+PRESENCE_TTL = int(os.getenv("PRESENCE_TTL_S", 60))
+CACHE_TTL    = float(os.getenv("PRESENCE_CACHE_S", 2))
+
+
+class PresenceRegistry:
+    def __init__(self, ttl: int = PRESENCE_TTL, cache_ttl: float = CACHE_TTL):
+        self.instance = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self._ttl = ttl
+        self._cache_ttl = cache_ttl
+        self._local: Counter[str] = Counter()              # user_id → sockets here
+        self._cache: dict[str, tuple[bool, float]] = {}    # user_id → (online, expires)
+
+    def key(self, user_id: str) -> str:
+        return f"{KEY_PREFIX}{user_id}"
+
+    # ── writes (event loop) ───────────────────────────────────────────────── #
+
+    async def join(self, user_id: str) -> None:
+        self._local[user_id] += 1
+        if self._local[user_id] == 1:
+            await self._touch([user_id])
+
+    async def leave(self, user_id: str) -> None:
+        if self._local[user_id] > 1:
+            self._local[user_id] -= 1
+            return
+        self._local.pop(user_id, None)
+        self._cache.pop(user_id, None)
+        try:
+            await get_async_redis_client().hdel(self.key(user_id), self.instance)
+        except Exception as exc:
+            log.warning("presence_leave_failed", user=user_id, error=str(exc))
+
+    async def run_heartbeat(self) -> None:
+        """Long-running coroutine; cancel it to shut down."""
+        try:
+            while True:
+                await asyncio.sleep(self._ttl / 3)
+                if self._local:
+                    await self._touch(list(self._local))
+        finally:
+            if self._local:
+                redis = get_async_redis_client()
+                async with redis.pipeline(transaction=False) as pipe:
+                    for user_id in self._local:
+                        pipe.hdel(self.key(user_id), self.instance)
+                    await pipe.execute()
+
+    async def _touch(self, user_ids: list[str]) -> None:
+        now = int(time.time())
+        try:
+            async with get_async_redis_client().pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.hset(self.key(user_id), self.instance, now)
+                    pipe.expire(self.key(user_id), self._ttl)
+                await pipe.execute()
+        except Exception as exc:
+            log.warning("presence_heartbeat_failed", users=len(user_ids), error=str(exc))
+
+    # ── reads (any thread) ────────────────────────────────────────────────── #
+
+    def local_users(self) -> list[str]:
+        """Users with at least one socket on this replica."""
+        return list(self._local)
+
+    def is_online(self, user_id: str) -> bool:
+        return user_id in self.online(user_id)
+
+    def online(self, *user_ids: str) -> set[str]:
+        """Bulk check — one pipelined round trip for every cache miss."""
+        now = time.monotonic()
+        result, misses = set(), []
+        for user_id in user_ids:
+            if self._local.get(user_id):
+                result.add(user_id)
+                continue
+            cached = self._cache.get(user_id)
+            if cached and cached[1] > now:
+                if cached[0]:
+                    result.add(user_id)
+            else:
+                misses.append(user_id)
+        if misses:
+            result.update(self._fetch(misses, now))
+        return result
+
+    def _fetch(self, user_ids: Iterable[str], now: float) -> set[str]:
+        user_ids = list(user_ids)
+        try:
+            pipe = get_redis_client().pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.hvals(self.key(user_id))
+            replies = pipe.execute()
+        except Exception as exc:
+            # Unknown presence → treat as offline so the notification still goes out
+            log.warning("presence_lookup_failed", error=str(exc))
+            return set()
+
+        fresh_after = time.time() - self._ttl
+        online = set()
+        for user_id, beats in zip(user_ids, replies):
+            up = any(int(b) >= fresh_after for b in beats)
+            self._cache[user_id] = (up, now + self._cache_ttl)
+            if up:
+                online.add(user_id)
+        return online
+
+
+presence = PresenceRegistry()
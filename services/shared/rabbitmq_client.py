@@ -12,10 +12,34 @@ Why RabbitMQ here and not Redis Pub/Sub?
     guaranteed delivery matters.
 
 Queue: electrohub.notifications  (durable, persistent messages)
+
+Publisher design:
+  publish_notification() never touches the network. It drops the encoded
+  job into a bounded in-memory buffer and returns. A small pool of
+  long-lived publisher threads — one AMQP connection + channel each —
+  drains the buffer in batches:
+
+    caller ──put()──► [ bounded buffer ] ──► worker 0 (conn/channel) ─┐
+                                        └──► worker 1 (conn/channel) ─┴─► broker
+
+  - Publisher confirms: every channel runs in confirm mode and the broker
+    acks deliveries with `multiple=True`, so one confirm frame settles a
+    whole batch. Nacked or unconfirmed jobs go back into the buffer
+    (at-least-once, same as the consumer side).
+  - Backpressure: at most RABBITMQ_PUBLISH_MAX_IN_FLIGHT unconfirmed jobs
+    per channel. When the buffer is full, put() waits briefly and then the
+    job is dropped and logged — a broker outage must never block chat.
+  - Reconnect: a worker that loses its connection re-buffers its in-flight
+    jobs and reconnects with exponential backoff.
 """
 
 import os
 import json
+import queue
+import threading
+import time
+from functools import lru_cache
+
 import structlog
 
 log = structlog.get_logger()
@@ -25,39 +49,240 @@ RABBITMQ_USER = os.getenv("RABBITMQ_USER", "guest")
 RABBITMQ_PASS = os.getenv("RABBITMQ_PASS", "guest")
 QUEUE_NAME    = "electrohub.notifications"
 
+PUBLISH_POOL_SIZE     = int(os.getenv("RABBITMQ_PUBLISH_POOL_SIZE", 2))
+PUBLISH_BUFFER_SIZE   = int(os.getenv("RABBITMQ_PUBLISH_BUFFER", 10_000))
+PUBLISH_BATCH_SIZE    = int(os.getenv("RABBITMQ_PUBLISH_BATCH", 200))
+PUBLISH_MAX_IN_FLIGHT = int(os.getenv("RABBITMQ_PUBLISH_MAX_IN_FLIGHT", 1_000))
+PUBLISH_LINGER_S      = float(os.getenv("RABBITMQ_PUBLISH_LINGER_MS", 5)) / 1000
+PUBLISH_BLOCK_S       = float(os.getenv("RABBITMQ_PUBLISH_BLOCK_MS", 50)) / 1000
+
 
-def _get_connection():
+def _connection_parameters():
     import pika
-    return pika.BlockingConnection(
-        pika.ConnectionParameters(
-            host=RABBITMQ_HOST,
-            credentials=pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASS),
-            heartbeat=30,
-            blocked_connection_timeout=10,
-        )
+    return pika.ConnectionParameters(
+        host=RABBITMQ_HOST,
+        credentials=pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASS),
+        heartbeat=30,
+        blocked_connection_timeout=10,
     )
 
 
+class _PublisherWorker(threading.Thread):
+    """
+    Owns one SelectConnection + confirm-mode channel and runs its ioloop.
+    pika connections are not thread-safe, so all channel calls happen on
+    this thread; the shared buffer (queue.Queue) is the only handoff.
+    """
+
+    def __init__(self, buffer: queue.Queue, index: int):
+        super().__init__(name=f"rabbitmq-publisher-{index}", daemon=True)
+        self._buffer = buffer
+        self._conn = None
+        self._ch = None
+        self._next_tag = 0
+        self._in_flight: dict[int, bytes] = {}   # delivery_tag → body
+        self._stop_event = threading.Event()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def run(self) -> None:
+        import pika
+        backoff = 1
+        while not self._stop_event.is_set():
+            opened_at = time.monotonic()
+            try:
+                self._conn = pika.SelectConnection(
+                    _connection_parameters(),
+                    on_open_callback=self._on_connection_open,
+                    on_open_error_callback=self._on_connection_error,
+                    on_close_callback=self._on_connection_closed,
+                )
+                self._conn.ioloop.start()
+            except Exception as exc:
+                log.error("rabbitmq_publisher_error", worker=self.name, error=str(exc))
+            self._ch = None
+            self._requeue_in_flight()
+            # A connection that stayed up for a while resets the backoff
+            backoff = 1 if time.monotonic() - opened_at > 30 else min(backoff * 2, 30)
+            self._stop_event.wait(backoff)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        conn = self._conn
+        if conn is not None:
+            conn.ioloop.add_callback_threadsafe(self._close_connection)
+
+    # ── Connection lifecycle (ioloop thread) ──────────────────────────────── #
+
+    def _close_connection(self) -> None:
+        if self._conn.is_open or self._conn.is_opening:
+            self._conn.close()
+        else:
+            self._conn.ioloop.stop()
+
+    def _on_connection_open(self, conn) -> None:
+        conn.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_error(self, conn, exc) -> None:
+        log.error("rabbitmq_publisher_connect_failed", worker=self.name, error=str(exc))
+        conn.ioloop.stop()
+
+    def _on_connection_closed(self, conn, reason) -> None:
+        self._ch = None
+        if not self._stop_event.is_set():
+            log.warning("rabbitmq_publisher_disconnected", worker=self.name, reason=str(reason))
+        conn.ioloop.stop()
+
+    def _on_channel_open(self, ch) -> None:
+        self._ch = ch
+        ch.add_on_close_callback(self._on_channel_closed)
+        ch.queue_declare(queue=QUEUE_NAME, durable=True, callback=self._on_queue_declared)
+
+    def _on_channel_closed(self, ch, reason) -> None:
+        log.warning("rabbitmq_publisher_channel_closed", worker=self.name, reason=str(reason))
+        self._ch = None
+        if self._conn.is_open:
+            self._conn.close()
+
+    def _on_queue_declared(self, _frame) -> None:
+        self._next_tag = 0
+        self._ch.confirm_delivery(
+            ack_nack_callback=self._on_confirm,
+            callback=lambda _frame: self._drain(),
+        )
+        log.info("rabbitmq_publisher_ready", worker=self.name)
+
+    # ── Publishing (ioloop thread) ────────────────────────────────────────── #
+
+    def _drain(self) -> None:
+        """Move up to one batch from the buffer onto the channel, then reschedule."""
+        if self._ch is None or not self._ch.is_open:
+            return
+        import pika
+
+        budget = min(PUBLISH_BATCH_SIZE, PUBLISH_MAX_IN_FLIGHT - len(self._in_flight))
+        sent = 0
+        while sent < budget:
+            try:
+                body = self._buffer.get_nowait()
+            except queue.Empty:
+                break
+            self._ch.basic_publish(
+                exchange="",
+                routing_key=QUEUE_NAME,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,   # persistent — survives broker restart
+                    content_type="application/json",
+                ),
+            )
+            self._next_tag += 1
+            self._in_flight[self._next_tag] = body
+            sent += 1
+
+        # Full batch → more is probably waiting; yield to the ioloop for I/O
+        # and come straight back. Otherwise linger before polling again.
+        delay = 0 if budget > 0 and sent == budget else PUBLISH_LINGER_S
+        self._conn.ioloop.call_later(delay, self._drain)
+
+    def _on_confirm(self, frame) -> None:
+        import pika
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+
+        if method.multiple:
+            tags = []
+            for tag in self._in_flight:           # insertion order == tag order
+                if tag > method.delivery_tag:
+                    break
+                tags.append(tag)
+        else:
+            tags = [method.delivery_tag]
+
+        for tag in tags:
+            body = self._in_flight.pop(tag, None)
+            if body is not None and not acked:
+                self._rebuffer(body)
+        if not acked:
+            log.warning("rabbitmq_publish_nacked", worker=self.name, count=len(tags))
+
+    def _requeue_in_flight(self) -> None:
+        if self._in_flight:
+            log.warning("rabbitmq_publish_requeued", worker=self.name, count=len(self._in_flight))
+        for body in self._in_flight.values():
+            self._rebuffer(body)
+        self._in_flight.clear()
+
+    def _rebuffer(self, body: bytes) -> None:
+        try:
+            self._buffer.put_nowait(body)
+        except queue.Full:
+            log.error("rabbitmq_publish_dropped", worker=self.name, reason="buffer_full")
+
+
+class NotificationPublisher:
+    """
+    Thread-safe, process-wide publisher. Callers only ever touch the
+    bounded buffer; the worker pool owns all network I/O.
+    """
+
+    def __init__(self, pool_size: int = PUBLISH_POOL_SIZE,
+                 buffer_size: int = PUBLISH_BUFFER_SIZE):
+        self._buffer: queue.Queue = queue.Queue(maxsize=buffer_size)
+        self._workers = [_PublisherWorker(self._buffer, i) for i in range(pool_size)]
+        for w in self._workers:
+            w.start()
+
+    @property
+    def pending(self) -> int:
+        """Jobs buffered or awaiting a broker confirm."""
+        return self._buffer.qsize() + sum(w.in_flight for w in self._workers)
+
+    def publish(self, notification_type: str, payload: dict) -> bool:
+        """Returns False if the buffer stayed full for PUBLISH_BLOCK_S."""
+        body = json.dumps({"type": notification_type, **payload}).encode("utf-8")
+        try:
+            self._buffer.put(body, timeout=PUBLISH_BLOCK_S)
+            return True
+        except queue.Full:
+            return False
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Give outstanding jobs up to `timeout` seconds to be confirmed, then stop."""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        if self.pending:
+            log.warning("rabbitmq_publisher_closed_with_pending", pending=self.pending)
+        for w in self._workers:
+            w.stop()
+
+
+@lru_cache(maxsize=1)
+def get_publisher() -> NotificationPublisher:
+    """Created lazily on first publish — after any uvicorn worker fork."""
+    return NotificationPublisher()
+
+
+def shutdown_publisher(timeout: float = 5.0) -> None:
+    """Flush and stop the publisher if this process ever created one."""
+    if get_publisher.cache_info().currsize:
+        get_publisher().close(timeout)
+
+
 def publish_notification(notification_type: str, payload: dict) -> None:
     """
-    Publish a notification job to RabbitMQ.
+    Queue a notification job for RabbitMQ.
     Never raises — RabbitMQ outage must not block the primary flow.
 
     notification_type: "message_received" | "item_sold" | "item_saved_alert"
     """
     try:
-        conn = _get_connection()
-        ch = conn.channel()
-        ch.queue_declare(queue=QUEUE_NAME, durable=True)
-        ch.basic_publish(
-            exchange="",
-            routing_key=QUEUE_NAME,
-            body=json.dumps({"type": notification_type, **payload}),
-            properties=__import__("pika").BasicProperties(
-                delivery_mode=2,   # persistent — survives broker restart
-            ),
-        )
-        conn.close()
-        log.info("rabbitmq_published", type=notification_type)
+        if get_publisher().publish(notification_type, payload):
+            log.info("rabbitmq_published", type=notification_type)
+        else:
+            log.error("rabbitmq_publish_dropped", type=notification_type, reason="buffer_full")
     except Exception as exc:
         log.error("rabbitmq_publish_failed", type=notification_type, error=str(exc))
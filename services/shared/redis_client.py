@@ -1,5 +1,6 @@
 import os
 import redis
+import redis.asyncio
 from functools import lru_cache
 
 
@@ -10,3 +11,14 @@ def get_redis_client() -> redis.Redis:
         port=int(os.getenv("REDIS_PORT", 6379)),
         decode_responses=True,
     )
+
+
+@lru_cache(maxsize=1)
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """For long-lived consumers on the event loop (subscriptions, blocking reads)."""
+    return redis.asyncio.Redis(
+        host=os.getenv("REDIS_HOST", "redis"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        decode_responses=True,
+        health_check_interval=30,   # detect half-open subscriber connections
+    )
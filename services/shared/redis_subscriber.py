@@ -0,0 +1,162 @@
+"""
+Push-based async Redis Pub/Sub subscriber.
+
+Replaces the `get_message(timeout=0.05)` + `asyncio.sleep(0.01)` polling
+loops: a redis.asyncio PubSub connection is awaited with listen(), so an
+idle subscriber costs nothing and a message is dispatched as soon as it
+arrives.
+
+    Redis ──listen()──► reader ──hash(channel) % workers──► worker queues ──► handler
+
+  - Bounded concurrency: `workers` tasks, each with a bounded queue. When
+    every queue is full the reader stops reading, and Redis buffers.
+  - Ordering: one channel always maps to the same worker, so messages on
+    a channel (e.g. one chat conversation) are handled in publish order.
+  - Reconnect: a dropped connection is re-opened with backoff and every
+    current channel / pattern is re-subscribed.
+  - Dynamic membership: subscribe() / unsubscribe() may be called at any
+    time from other tasks. With nothing subscribed the reader just waits.
+
+Metrics (labelled by subscriber name): messages handled, handler errors,
+dispatch lag (received → handler start) and worker queue depth. They are
+defined here rather than in app.core.metrics because the backend copies
+this module too (backend/Dockerfile), and its metrics module differs.
+"""
+
+import asyncio
+import time
+import zlib
+from typing import Awaitable, Callable, Iterable
+
+import structlog
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.redis_client import get_async_redis_client
+
+log = structlog.get_logger()
+
+Handler = Callable[[str, str], Awaitable[None]]   # (channel, data)
+
+
+redis_subscriber_messages = Counter(
+    "electrohub_redis_subscriber_messages_total",
+    "Pub/Sub messages handled",
+    ["subscriber"],
+)
+
+redis_subscriber_errors = Counter(
+    "electrohub_redis_subscriber_errors_total",
+    "Pub/Sub messages whose handler raised",
+    ["subscriber"],
+)
+
+redis_subscriber_lag_seconds = Histogram(
+    "electrohub_redis_subscriber_dispatch_lag_seconds",
+    "Time from receiving a Pub/Sub message to its handler starting",
+    ["subscriber"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1, 0.5, 1),
+)
+
+redis_subscriber_queue_depth = Gauge(
+    "electrohub_redis_subscriber_queue_depth",
+    "Messages waiting in a subscriber worker queue",
+    ["subscriber", "worker"],
+)
+
+
+class AsyncRedisSubscriber:
+    def __init__(self, name: str, handler: Handler, *,
+                 channels: Iterable[str] = (), patterns: Iterable[str] = (),
+                 workers: int = 8, queue_size: int = 1_000):
+        self.name = name
+        self._handler = handler
+        self._channels: set[str] = set(channels)
+        self._patterns: set[str] = set(patterns)
+        self._queues = [asyncio.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._pubsub = None
+        self._wake = asyncio.Event()
+
+    # ── membership ────────────────────────────────────────────────────────── #
+
+    async def subscribe(self, *channels: str) -> None:
+        new = [c for c in channels if c not in self._channels]
+        if not new:
+            return
+        self._channels.update(new)
+        if self._pubsub is not None:
+            await self._pubsub.subscribe(*new)
+        self._wake.set()
+
+    async def unsubscribe(self, *channels: str) -> None:
+        gone = [c for c in channels if c in self._channels]
+        if not gone:
+            return
+        self._channels.difference_update(gone)
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(*gone)
+
+    # ── main loop ─────────────────────────────────────────────────────────── #
+
+    async def run(self) -> None:
+        """Long-running coroutine; cancel it to shut down."""
+        workers = [asyncio.create_task(self._worker(i)) for i in range(len(self._queues))]
+        backoff = 0.5
+        try:
+            while True:
+                try:
+                    await self._listen()
+                    backoff = 0.5
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    log.error("redis_subscriber_disconnected", subscriber=self.name,
+                              error=str(exc), retry_in=backoff)
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 10)
+        finally:
+            for w in workers:
+                w.cancel()
+            log.info("redis_subscriber_stopped", subscriber=self.name)
+
+    async def _listen(self) -> None:
+        while not (self._channels or self._patterns):
+            self._wake.clear()
+            await self._wake.wait()
+
+        pubsub = get_async_redis_client().pubsub(ignore_subscribe_messages=True)
+        try:
+            channels, patterns = set(self._channels), set(self._patterns)
+            if channels:
+                await pubsub.subscribe(*channels)
+            if patterns:
+                await pubsub.psubscribe(*patterns)
+            self._pubsub = pubsub
+            # Anything added while we were connecting
+            if self._channels - channels:
+                await pubsub.subscribe(*(self._channels - channels))
+            log.info("redis_subscriber_listening", subscriber=self.name,
+                     channels=len(self._channels), patterns=sorted(self._patterns))
+
+            # listen() returns once nothing is subscribed any more
+            async for msg in pubsub.listen():
+                channel = msg["channel"]
+                queue = self._queues[zlib.crc32(channel.encode()) % len(self._queues)]
+                await queue.put((time.perf_counter(), channel, msg["data"]))
+        finally:
+            self._pubsub = None
+            await pubsub.reset()
+
+    async def _worker(self, index: int) -> None:
+        queue = self._queues[index]
+        while True:
+            received_at, channel, data = await queue.get()
+            redis_subscriber_lag_seconds.labels(subscriber=self.name).observe(
+                time.perf_counter() - received_at)
+            redis_subscriber_queue_depth.labels(subscriber=self.name, worker=index).set(queue.qsize())
+            try:
+                await self._handler(channel, data)
+            except Exception as exc:
+                redis_subscriber_errors.labels(subscriber=self.name).inc()
+                log.error("redis_subscriber_handler_failed", subscriber=self.name,
+                          channel=channel, error=str(exc))
+            redis_subscriber_messages.labels(subscriber=self.name).inc()
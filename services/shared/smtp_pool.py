@@ -0,0 +1,138 @@
+"""
+Pooled SMTP sending — shared by notification-service and the backend.
+
+    SmtpPool.send(msg)
+        → rate limiter (token bucket, `rate` messages/s toward the relay)
+        → ≤ `size` concurrent sends, each on a reused session
+          (STARTTLS + login once per session)
+
+Sessions are kept in a LIFO idle stack, so the hot ones stay hot, and are
+recycled after `max_per_session` messages (most relays cap this). A
+session idle for longer than `idle_check_s` is probed with NOOP before
+reuse, and a send that hits a dropped connection is retried once on a
+fresh session. A session whose send fails is closed, never returned.
+
+Credentials and limits are constructor arguments: the two callers read
+them from different environment variables.
+"""
+
+import queue
+import smtplib
+import threading
+import time
+from email.message import Message
+
+
+class _RateLimiter:
+    """
+    Thread-safe token bucket. Tokens may go negative: each caller reserves
+    its slot under the lock and sleeps off its own debt outside it.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class _Session:
+    def __init__(self, pool: "SmtpPool"):
+        self._idle_check_s = pool.idle_check_s
+        self.smtp = smtplib.SMTP(pool.host, pool.port, timeout=pool.timeout_s)
+        try:
+            if pool.starttls:
+                self.smtp.starttls()
+            if pool.user:
+                self.smtp.login(pool.user, pool.password)
+        except Exception:
+            self.smtp.close()
+            raise
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def alive(self) -> bool:
+        if time.monotonic() - self.last_used < self._idle_check_s:
+            return True
+        try:
+            return self.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def close(self) -> None:
+        try:
+            self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+
+
+class SmtpPool:
+    """At most `size` concurrent sends, each on a reused authenticated session."""
+
+    def __init__(self, host: str, port: int, user: str = "", password: str = "", *,
+                 starttls: bool = True, size: int = 4, rate: float = 10,
+                 max_per_session: int = 100, idle_check_s: float = 30,
+                 timeout_s: float = 10):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.max_per_session = max_per_session
+        self.idle_check_s = idle_check_s
+        self.timeout_s = timeout_s
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._limiter = _RateLimiter(rate, burst=max(1.0, rate))
+
+    def send(self, msg: Message) -> None:
+        with self._slots:
+            self._limiter.acquire()
+            session = self._checkout()
+            try:
+                try:
+                    session.smtp.send_message(msg)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    session.close()
+                    session = _Session(self)
+                    session.smtp.send_message(msg)
+            except Exception:
+                session.close()
+                raise
+            session.sent += 1
+            session.last_used = time.monotonic()
+            self._checkin(session)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _checkout(self) -> _Session:
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                return _Session(self)
+            if session.alive():
+                return session
+            session.close()
+
+    def _checkin(self, session: _Session) -> None:
+        if session.sent >= self.max_per_session:
+            session.close()
+        else:
+            self._idle.put(session)